@@ -6,13 +6,18 @@ from PySide6.QtWidgets import QApplication, QMainWindow
 import scrcpy
 from model.config import *
 from model.device import *
+from model.event import use_qt
 from view.cc_com import resource_path
+from view.cc_frame import CustomEvent
 from view.cc_ui import *
 from view.dialog import DeviceNameModifyDialog
 
 # cc
 from view.settings import DeviceNameSettings
 
+# model 中的事件经 Qt 信号转到 UI 线程
+use_qt()
+
 
 def map_code(code):
     """
@@ -113,6 +118,9 @@ class CCScrcpy(QMainWindow):
         # 初始化菜单
         self.ui.menu_bar.add_device_col_menu(self.__device_screen_col)
         self.ui.menu_bar.add_device_scale_ratio_menu(self.__device_screen_scale_ratio)
+        self.ui.menu_bar.add_record_all_menu(self.__record_all)
+        self.ui.menu_bar.add_snapshot_all_menu(self.__snapshot_all)
+        self.ui.menu_bar.add_publish_menu(self.__publish_all, device_publish_frames)
         # self.ui.menu_bar.add_request_screen_resize_menu(self.__request_screen_resize)
         # self.ui.menu_bar.add_modify_device_name_menu(self.__modify_device_name)
 
@@ -133,8 +141,21 @@ class CCScrcpy(QMainWindow):
             self.__on_post,
             self.__on_devices_changed,
             self.__device_name_get,
+            device_max_size=self.device_max_size,
+            on_bringup_progress=self.ui.left_view.update_bringup_progress,
+            on_bitrate_decision=self.__on_bitrate_decision,
         )
 
+        # 截图在后台线程完成，结果转到 UI 线程显示
+        self.snapshot_event = CustomEvent()
+        self.snapshot_event.set_connect(self.__on_snapshot_done)
+
+        # 每秒刷新投屏标题上的帧率
+        if ui_config_show_fps:
+            self.frame_rates_timer = QTimer(self)
+            self.frame_rates_timer.timeout.connect(self.__update_frame_rates)
+            self.frame_rates_timer.start(1000)
+
         if ui_config_show_log:
             self.device_manager.set_print_log(
                 lambda msg: self.ui.right_view.set_log(msg)
@@ -148,9 +169,11 @@ class CCScrcpy(QMainWindow):
         self.ui.right_view.update_title(device)
         self.ui.left_view.update_device_name(device)
 
+    def __on_bitrate_decision(self, msg):
+        self.ui.statusbar.showMessage(f"码率调整 {msg}", 10000)
+
     def __on_frame(self, device: Device, frame):
         # print(f"__on_frame {device.serial}")
-        self.app.processEvents()
         if self.stop_render_screen:
             return
         device.post_frame(frame)
@@ -171,6 +194,14 @@ class CCScrcpy(QMainWindow):
                     # print(f'mouse index {device.index}')
                     self.ui.right_view.update_focused_status(device, self.cur_devices)
                     self.ui.left_view.update_cur_device(device)
+                    if self.focused_device is not device:
+                        # 选中设备完整解码，其余设备使用缩略图解码模式
+                        if self.focused_device is not None:
+                            self.focused_device.set_decode_mode(
+                                device_thumbnail_decode_mode
+                            )
+                        device.set_decode_mode(scrcpy.DECODE_MODE_FULL)
+                        device.bringup_first()
                     self.focused_device = device
                     self.focused_device.on_click_screen()
 
@@ -280,6 +311,34 @@ class CCScrcpy(QMainWindow):
         self.stop_render_screen = False
         self.device_manager.refresh_device_screen_on()
     
+    def __record_all(self, enabled):
+        self.device_manager.record_all(enabled)
+        for d in self.device_manager.get_devices_info():
+            self.ui.right_view.update_title(d)
+
+    def __update_frame_rates(self):
+        for d in self.device_manager.get_devices_info():
+            d.update_frame_rates()
+            self.ui.right_view.update_title(d)
+
+    def __snapshot_all(self):
+        def run():
+            start = time.perf_counter()
+            try:
+                infos = self.device_manager.snapshot_all()
+                msg = f"截图 {len(infos)} 台设备 {(time.perf_counter() - start) * 1000:.0f}ms -> {device_snapshot_dir}"
+            except Exception as e:
+                msg = f"截图失败 {e}"
+            self.snapshot_event.post(msg)
+
+        Thread(target=run, name="snapshot_all", daemon=True).start()
+
+    def __on_snapshot_done(self, msg):
+        self.ui.statusbar.showMessage(msg, 10000)
+
+    def __publish_all(self, enabled):
+        self.device_manager.publish_all(enabled)
+
     def __on_global_ctrl(self, action):
         if action == ui_global_ctrl_resize:
             self.resize(1, 1)
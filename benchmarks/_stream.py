@@ -0,0 +1,194 @@
+"""
+Helpers shared by the benchmarks: synthetic h264 streams and clients driven by
+a local socket instead of an adb device
+"""
+
+import os
+import socket
+import struct
+import sys
+from fractions import Fraction
+from typing import List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import av  # noqa: E402
+import numpy as np  # noqa: E402
+from av.codec import CodecContext  # noqa: E402
+
+import scrcpy  # noqa: E402
+
+
+# Realtime encoders of each codec, first available is used: (name, options)
+ENCODERS = {
+    "h264": (
+        ("libx264", {"preset": "ultrafast", "tune": "zerolatency"}),
+        ("h264", {}),
+    ),
+    "h265": (
+        ("libx265", {"preset": "ultrafast", "tune": "zerolatency"}),
+        ("hevc", {}),
+    ),
+    "av1": (
+        ("libsvtav1", {"preset": "12"}),
+        ("libaom-av1", {"cpu-used": "8", "usage": "realtime"}),
+        ("librav1e", {"speed": "10"}),
+    ),
+}
+
+
+def test_pattern(i: int, width: int, height: int) -> np.ndarray:
+    """
+    Frame i of a moving bgr24 test pattern
+    """
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[..., 0] = (x + i * 4) % 256
+    image[..., 1] = (y + i * 2) % 256
+    image[..., 2] = (x + y + i) % 256
+    return image
+
+
+def encode_video(
+    codec: str = "h264",
+    frames: int = 300,
+    width: int = 720,
+    height: int = 1600,
+    fps: int = 30,
+    bitrate: int = 4000000,
+    gop: int = 300,
+) -> List[bytes]:
+    """
+    Encode a moving test pattern to access units, Annex B for h264/h265, OBUs for av1
+
+    Args:
+        codec: h264, h265 or av1
+        frames: number of frames
+        width: frame width
+        height: frame height
+        fps: frame rate
+        bitrate: target bitrate
+        gop: key frame interval in frames
+    """
+    for name, options in ENCODERS[codec]:
+        try:
+            encoder = CodecContext.create(name, "w")
+            break
+        except Exception:
+            continue
+    else:
+        raise RuntimeError(f"No {codec} encoder available in PyAV")
+
+    encoder.width = width
+    encoder.height = height
+    encoder.pix_fmt = "yuv420p"
+    encoder.time_base = Fraction(1, fps)
+    encoder.framerate = fps
+    encoder.bit_rate = bitrate
+    encoder.gop_size = gop
+    encoder.max_b_frames = 0
+    encoder.options = dict(options)
+
+    units = []
+    for i in range(frames):
+        frame = av.VideoFrame.from_ndarray(
+            test_pattern(i, width, height), format="bgr24"
+        ).reformat(format="yuv420p")
+        frame.pts = i
+        units.extend(bytes(p) for p in encoder.encode(frame))
+    units.extend(bytes(p) for p in encoder.encode(None))
+    return units
+
+
+def encode_h264(
+    frames: int = 300,
+    width: int = 720,
+    height: int = 1600,
+    fps: int = 30,
+    bitrate: int = 4000000,
+    gop: int = 300,
+) -> List[bytes]:
+    """
+    Encode a moving test pattern to h264 Annex B access units
+    """
+    return encode_video("h264", frames, width, height, fps, bitrate, gop)
+
+
+def with_frame_meta(units: List[bytes], fps: int = 30) -> List[bytes]:
+    """
+    Prefix access units with scrcpy frame meta headers (pts in us and size),
+    the leading SPS/PPS are sent as a config packet like the device does
+    """
+    out = []
+    for i, unit in enumerate(units):
+        if i == 0:
+            idr = unit.find(b"\x00\x00\x01\x65")
+            if idr > 0:
+                start = idr - 1 if unit[idr - 1] == 0 else idr
+                out.append(struct.pack(">qI", -1, start) + unit[:start])
+                unit = unit[start:]
+        out.append(struct.pack(">qI", i * 1000000 // fps, len(unit)) + unit)
+    return out
+
+
+def write_capture(
+    path: str,
+    units: List[bytes],
+    fps: int = 30,
+    resolution=(720, 1600),
+    frame_meta: bool = False,
+) -> str:
+    """
+    Write access units as a capture file, one socket read per unit at the frame rate,
+    so replays need no device
+    """
+    if frame_meta:
+        units = with_frame_meta(units, fps)
+    writer = scrcpy.CaptureWriter(
+        path,
+        dict(
+            device_name="benchmark",
+            resolution=list(resolution),
+            server_version=scrcpy.SERVER_VERSION_BUNDLED,
+            video_codec=scrcpy.VIDEO_CODEC_H264,
+            frame_meta=frame_meta,
+        ),
+    )
+    for i, unit in enumerate(units):
+        writer.write(unit, i / fps)
+    writer.close()
+    return path
+
+
+def offline_client(**kwargs) -> scrcpy.Client:
+    """
+    Client that is never started, for benchmarks calling create_decoder or convert_frame
+    """
+    # No adb device is needed until start
+    return scrcpy.Client(device=object(), **kwargs)
+
+
+# client: (reader socket, resolution) until start_socket_client
+_sockets = {}
+
+
+def socket_client(resolution=(720, 1600), **kwargs) -> tuple:
+    """
+    Create a client whose video socket will be one end of a local socket pair
+
+    Returns:
+        (client, writer socket), call start_socket_client to start it
+    """
+    reader, writer = socket.socketpair()
+    client = offline_client(**kwargs)
+    _sockets[client] = (reader, resolution)
+    return client, writer
+
+
+def start_socket_client(client, reactor=None) -> None:
+    """
+    Start a client from socket_client, same as Client.start without adb
+    """
+    reader, resolution = _sockets.pop(client)
+    client.start_on_socket(reader, resolution, "benchmark", daemon_threaded=True, reactor=reactor)
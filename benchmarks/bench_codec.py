@@ -0,0 +1,86 @@
+"""
+Bandwidth, quality and decode cost of each video codec at the same target bitrates.
+
+Usage:
+    python benchmarks/bench_codec.py --bitrates 1000000 2000000 4000000
+"""
+
+import argparse
+import time
+
+import av
+import cv2
+
+from _stream import encode_video, offline_client, test_pattern
+
+import scrcpy
+
+CODECS = (scrcpy.VIDEO_CODEC_H264, scrcpy.VIDEO_CODEC_H265, scrcpy.VIDEO_CODEC_AV1)
+
+
+def decode(units: list, codec: str, width: int, height: int) -> tuple:
+    """
+    Decode with the client decoder of the codec
+
+    Returns:
+        (wall ms per frame, cpu ms per frame, mean psnr against the source)
+    """
+    client = offline_client(
+        server_version="2.4",
+        server_jar="scrcpy-server-v2.4",
+        video_codec=codec,
+    )
+    decoder = client.create_decoder()
+    frames = []
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    for unit in units:
+        frames.extend(decoder.decode(av.Packet(unit)))
+    frames.extend(decoder.decode(None))
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+
+    psnr = [
+        cv2.PSNR(test_pattern(i, width, height), frame.to_ndarray(format="bgr24"))
+        for i, frame in enumerate(frames)
+    ]
+    count = max(len(frames), 1)
+    return 1000 * wall / count, 1000 * cpu / count, sum(psnr) / max(len(psnr), 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--width", type=int, default=720)
+    parser.add_argument("--height", type=int, default=1600)
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--gop", type=int, default=60)
+    parser.add_argument(
+        "--bitrates", type=int, nargs="+", default=[1000000, 2000000, 4000000]
+    )
+    parser.add_argument("--codecs", nargs="+", default=list(CODECS))
+    args = parser.parse_args()
+
+    print(
+        f"{'codec':>6} {'target kb/s':>11} {'actual kb/s':>11} {'psnr dB':>8}"
+        f" {'decode ms':>10} {'cpu ms':>7}"
+    )
+    for codec in args.codecs:
+        for bitrate in args.bitrates:
+            try:
+                units = encode_video(
+                    codec, args.frames, args.width, args.height, args.fps, bitrate, args.gop
+                )
+                wall, cpu, psnr = decode(units, codec, args.width, args.height)
+            except RuntimeError as e:
+                print(f"{codec:>6} skipped: {e}")
+                break
+            actual = sum(len(u) for u in units) * 8 * args.fps / args.frames / 1000
+            print(
+                f"{codec:>6} {bitrate // 1000:>11} {actual:>11.0f} {psnr:>8.2f}"
+                f" {wall:>10.2f} {cpu:>7.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+bgr24 conversion cost per frame at device resolution against tile size output.
+
+Usage:
+    python benchmarks/bench_convert.py --width 1080 --height 2400 --scale 0.222
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from av.codec import CodecContext
+
+from _stream import encode_h264, offline_client
+
+
+def decode_all(units: list) -> list:
+    decoder = CodecContext.create("h264", "r")
+    frames = []
+    for unit in units:
+        for packet in decoder.parse(unit):
+            frames.extend(decoder.decode(packet))
+    return frames
+
+
+def run(frames: list, **kwargs) -> dict:
+    convert = offline_client(**kwargs).convert_frame
+    convert(frames[0])
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for frame in frames:
+        convert(frame)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return dict(ms=1000 * elapsed / len(frames), peak_kib=peak / 1024)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--width", type=int, default=1080)
+    parser.add_argument("--height", type=int, default=2400)
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--scale", type=float, default=240 / 1080)
+    args = parser.parse_args()
+
+    frames = decode_all(encode_h264(args.frames, args.width, args.height))
+    print(f"{'mode':>14} {'ms/frame':>9} {'peak KiB':>10}")
+    for name, kwargs in (
+        ("full", dict()),
+        ("tile", dict(output_scale=args.scale)),
+        ("tile+reuse", dict(output_scale=args.scale, reuse_frame_buffer=True)),
+    ):
+        r = run(frames, **kwargs)
+        print(f"{name:>14} {r['ms']:>9.2f} {r['peak_kib']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Decode cost and end-to-end delay of each decoder profile.
+
+Usage:
+    python benchmarks/bench_decoder.py --threads 4
+"""
+
+import argparse
+import collections
+import time
+
+import av
+import numpy as np
+from av.codec import CodecContext
+
+from _stream import encode_h264, offline_client, socket_client, start_socket_client
+
+import scrcpy
+
+PROFILES = (
+    scrcpy.DECODER_PROFILE_DEFAULT,
+    scrcpy.DECODER_PROFILE_LOW_LATENCY,
+    scrcpy.DECODER_PROFILE_THROUGHPUT,
+    scrcpy.DECODER_PROFILE_THUMBNAIL,
+)
+
+
+def split(units: list) -> list:
+    parser = CodecContext.create("h264", "r")
+    return [bytes(p) for unit in units for p in parser.parse(unit)]
+
+
+def decode_ms(packets: list, profile: str, threads: int) -> float:
+    client = offline_client(decoder_profile=profile, decoder_threads=threads)
+    decoder = client.create_decoder()
+    frames = 0
+    start = time.perf_counter()
+    for packet in packets:
+        frames += len(decoder.decode(av.Packet(packet)))
+    frames += len(decoder.decode(None))
+    return 1000 * (time.perf_counter() - start) / max(frames, 1)
+
+
+def end_to_end(units: list, profile: str, threads: int, fps: int) -> tuple:
+    client, writer = socket_client(decoder_profile=profile, decoder_threads=threads)
+    times = collections.deque()
+    delays = []
+
+    def on_frame(frame):
+        if frame is not None and times:
+            delays.append(time.perf_counter() - times.popleft())
+
+    client.add_listener(scrcpy.EVENT_FRAME, on_frame)
+    start_socket_client(client)
+    start = time.perf_counter()
+    for i, unit in enumerate(units):
+        times.append(time.perf_counter())
+        writer.sendall(unit)
+        delay = start + (i + 1) / fps - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    time.sleep(0.5)
+    client.stop()
+    client.stream_loop_thread.join()
+    writer.close()
+    values = np.array(delays or [0.0]) * 1000
+    return float(np.percentile(values, 50)), float(np.percentile(values, 99))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--width", type=int, default=1080)
+    parser.add_argument("--height", type=int, default=2400)
+    parser.add_argument("--frames", type=int, default=180)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--threads", type=int, default=0)
+    args = parser.parse_args()
+
+    units = encode_h264(args.frames, args.width, args.height, args.fps)
+    packets = split(units)
+    print(f"{'profile':>12} {'decode ms':>10} {'e2e p50':>8} {'e2e p99':>8}")
+    for profile in PROFILES:
+        ms = decode_ms(packets, profile, args.threads)
+        p50, p99 = end_to_end(units, profile, args.threads, args.fps)
+        print(f"{profile:>12} {ms:>10.2f} {p50:>8.1f} {p99:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
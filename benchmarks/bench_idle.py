@@ -0,0 +1,107 @@
+"""
+CPU cost of idle video sockets: the old 10 ms sleep-polling loop against the
+selector based Client stream loop.
+
+Usage:
+    python benchmarks/bench_idle.py --devices 1 10 40 --seconds 5
+"""
+
+import argparse
+import socket
+import threading
+import time
+
+from _stream import socket_client, start_socket_client
+
+import scrcpy
+
+
+def polling_loop(sock: socket.socket, alive: threading.Event, counter: list) -> None:
+    """
+    Copy of the previous stream loop idle path: non-blocking recv + 10 ms sleep
+    """
+    sock.setblocking(False)
+    while alive.is_set():
+        try:
+            data = sock.recv(0x10000)
+            if data == b"":
+                return
+        except BlockingIOError:
+            time.sleep(0.01)
+            counter[0] += 1
+        except OSError:
+            return
+
+
+def run_polling(devices: int, seconds: float) -> dict:
+    alive = threading.Event()
+    alive.set()
+    counter = [0]
+    pairs = [socket.socketpair() for _ in range(devices)]
+    threads = [
+        threading.Thread(target=polling_loop, args=(a, alive, counter), daemon=True)
+        for a, _ in pairs
+    ]
+    cpu, wall = time.process_time(), time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    alive.clear()
+    for t in threads:
+        t.join()
+    result = _result(cpu, wall, counter[0])
+    for a, b in pairs:
+        a.close()
+        b.close()
+    return result
+
+
+def run_selector(devices: int, seconds: float, idle_interval: float) -> dict:
+    counter = [0]
+    sessions = []
+
+    def on_idle():
+        counter[0] += 1
+
+    cpu, wall = time.process_time(), time.perf_counter()
+    for _ in range(devices):
+        client, writer = socket_client(idle_interval=idle_interval)
+        client.add_listener(scrcpy.EVENT_IDLE, on_idle)
+        start_socket_client(client)
+        sessions.append((client, writer))
+    time.sleep(seconds)
+    for client, _ in sessions:
+        client.stop()
+        client.stream_loop_thread.join()
+    result = _result(cpu, wall, counter[0])
+    for _, writer in sessions:
+        writer.close()
+    return result
+
+
+def _result(cpu: float, wall: float, wakeups: int) -> dict:
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+    return dict(cpu_percent=100 * cpu / wall, wakeups_per_s=wakeups / wall)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--devices", type=int, nargs="+", default=[1, 10, 40])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--idle-interval", type=float, default=1.0)
+    args = parser.parse_args()
+
+    print(f"{'devices':>8} {'mode':>9} {'cpu %':>8} {'wakeups/s':>10}")
+    for n in args.devices:
+        for mode, result in (
+            ("polling", run_polling(n, args.seconds)),
+            ("selector", run_selector(n, args.seconds, args.idle_interval)),
+        ):
+            print(
+                f"{n:>8} {mode:>9} {result['cpu_percent']:>8.2f} {result['wakeups_per_s']:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Video socket ingest throughput: recv() allocating a bytes object per read
+against Client._recv_video with recv_into and an adaptive chunk size.
+
+Usage:
+    python benchmarks/bench_ingest.py --megabytes 512
+"""
+
+import argparse
+import socket
+import threading
+import time
+
+from av.codec import CodecContext
+
+from _stream import encode_h264, offline_client
+
+import scrcpy
+
+
+def feed(writer, payload: bytes, total: int) -> None:
+    sent = 0
+    while sent < total:
+        writer.sendall(payload)
+        sent += len(payload)
+    writer.close()
+
+
+def run(mode: str, payload: bytes, total: int, parse: bool) -> float:
+    reader, writer = socket.socketpair()
+    client = offline_client()
+    if mode != "recv":
+        # A reactor that is never started owns the socket without reading it,
+        # this loop calls _recv_video itself
+        client.start_on_socket(reader, (720, 1600), reactor=scrcpy.Reactor())
+    reader.setblocking(True)
+    parser = CodecContext.create("h264", "r")
+    feeder = threading.Thread(target=feed, args=(writer, payload, total))
+
+    received = 0
+    cpu = time.process_time()
+    feeder.start()
+    while True:
+        if mode == "recv":
+            data = reader.recv(0x10000)
+            if data == b"":
+                break
+        else:
+            try:
+                data = client._recv_video()
+            except ConnectionError:
+                break
+        received += len(data)
+        if parse:
+            parser.parse(data)
+    feeder.join()
+    cpu = time.process_time() - cpu
+    reader.close()
+    # CPU time covers the feeder too, both modes pay the same for it
+    return received / cpu
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--megabytes", type=int, default=512)
+    args = parser.parse_args()
+
+    payload = b"".join(encode_h264(frames=60, width=720, height=1600))
+    total = args.megabytes << 20
+    print(f"{'mode':>10} {'parse':>6} {'MB/s per core':>14}")
+    for parse in (False, True):
+        for mode in ("recv", "recv_into"):
+            rate = run(mode, payload, total, parse)
+            print(f"{mode:>10} {str(parse):>6} {rate / 1e6:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
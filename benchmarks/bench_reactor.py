@@ -0,0 +1,106 @@
+"""
+Throughput and frame latency of thread-per-device against the shared reactor
+as the number of simulated devices grows.
+
+Usage:
+    python benchmarks/bench_reactor.py --devices 1 10 30 60 --seconds 10
+"""
+
+import argparse
+import collections
+import threading
+import time
+
+import numpy as np
+
+from _stream import encode_h264, socket_client, start_socket_client
+
+import scrcpy
+
+
+def run(mode: str, devices: int, units: list, fps: int, seconds: float, workers: int):
+    reactor = None
+    if mode == "reactor":
+        reactor = scrcpy.Reactor(decode_workers=workers)
+        reactor.start()
+
+    latencies = []
+    frames = [0]
+    lock = threading.Lock()
+    sent = []
+    sessions = []
+    for _ in range(devices):
+        client, writer = socket_client()
+        times = collections.deque()
+
+        def on_frame(frame, times=times):
+            if frame is None:
+                return
+            now = time.perf_counter()
+            with lock:
+                frames[0] += 1
+                if times:
+                    latencies.append(now - times.popleft())
+
+        client.add_listener(scrcpy.EVENT_FRAME, on_frame)
+        start_socket_client(client, reactor)
+        sessions.append((client, writer, times))
+        sent.append(0)
+
+    # One feeder paces every device at fps
+    start = time.perf_counter()
+    tick = 0
+    while time.perf_counter() - start < seconds:
+        for i, (_, writer, times) in enumerate(sessions):
+            unit = units[sent[i] % len(units)]
+            times.append(time.perf_counter())
+            writer.sendall(unit)
+            sent[i] += 1
+        tick += 1
+        delay = start + tick / fps - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    elapsed = time.perf_counter() - start
+
+    for client, writer, _ in sessions:
+        client.stop()
+        writer.close()
+        if client.stream_loop_thread is not None:
+            client.stream_loop_thread.join()
+    if reactor is not None:
+        reactor.stop()
+
+    values = np.array(latencies or [0.0]) * 1000
+    return dict(
+        fps=frames[0] / elapsed,
+        expected_fps=sum(sent) / elapsed,
+        p50_ms=float(np.percentile(values, 50)),
+        p99_ms=float(np.percentile(values, 99)),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--devices", type=int, nargs="+", default=[1, 10, 30, 60])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--width", type=int, default=360)
+    parser.add_argument("--height", type=int, default=800)
+    args = parser.parse_args()
+
+    units = encode_h264(frames=args.fps * 10, width=args.width, height=args.height)
+    print(
+        f"{'devices':>8} {'mode':>8} {'fps':>8} {'sent fps':>9} {'p50 ms':>8} {'p99 ms':>8}"
+    )
+    for n in args.devices:
+        for mode in ("thread", "reactor"):
+            r = run(mode, n, units, args.fps, args.seconds, args.workers)
+            print(
+                f"{n:>8} {mode:>8} {r['fps']:>8.1f} {r['expected_fps']:>9.1f} "
+                f"{r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
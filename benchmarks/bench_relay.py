@@ -0,0 +1,127 @@
+"""
+Fan a replayed stream out through the WebSocket relay to stand-in viewers and report
+per viewer delivery, drops and join time, runs without devices or a browser.
+Some viewers are slow on purpose, they must skip to key frames without slowing the others.
+
+Usage:
+    python benchmarks/bench_relay.py --viewers 50 --slow 5
+    python benchmarks/bench_relay.py --capture records/<serial>.capture
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import struct
+import tempfile
+import time
+
+from _stream import encode_h264, write_capture
+
+import scrcpy
+
+
+async def read_message(reader: asyncio.StreamReader) -> tuple:
+    """
+    One unfragmented server frame: (opcode, payload)
+    """
+    head = await reader.readexactly(2)
+    size = head[1] & 0x7F
+    if size == 126:
+        size = struct.unpack(">H", await reader.readexactly(2))[0]
+    elif size == 127:
+        size = struct.unpack(">Q", await reader.readexactly(8))[0]
+    return head[0] & 0x0F, await reader.readexactly(size)
+
+
+async def viewer(port: int, name: str, seconds: float, delay: float) -> dict:
+    """
+    Stand-in viewer: WebSocket handshake, then read access units like the browser page,
+    sleeping delay seconds per message to simulate a slow link
+    """
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    key = base64.b64encode(os.urandom(16)).decode("ascii")
+    writer.write(
+        (
+            f"GET /{name} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\nUpgrade: websocket\r\n"
+            f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+        ).encode("ascii")
+    )
+    await reader.readuntil(b"\r\n\r\n")
+
+    result = dict(delay_ms=delay * 1000, units=0, keyframes=0, bytes=0, first_keyframe_ms=None)
+    meta = None
+    deadline = start + seconds
+    try:
+        while time.perf_counter() < deadline:
+            opcode, payload = await asyncio.wait_for(
+                read_message(reader), deadline - time.perf_counter()
+            )
+            if opcode == 0x1:
+                meta = json.loads(payload)
+                continue
+            result["units"] += 1
+            result["bytes"] += len(payload)
+            if payload[0] & 1:
+                result["keyframes"] += 1
+                if result["first_keyframe_ms"] is None:
+                    result["first_keyframe_ms"] = (time.perf_counter() - start) * 1000
+            if delay:
+                await asyncio.sleep(delay)
+    except asyncio.TimeoutError:
+        pass
+    writer.close()
+    result["codec_string"] = meta and meta.get("codec_string")
+    return result
+
+
+async def watch(port: int, viewers: int, slow: int, seconds: float, slow_delay: float) -> list:
+    tasks = [
+        viewer(port, "replay", seconds, slow_delay if i < slow else 0) for i in range(viewers)
+    ]
+    return await asyncio.gather(*tasks)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--capture", help="capture file, a synthetic 720x1600 stream if omitted")
+    parser.add_argument("--viewers", type=int, default=20)
+    parser.add_argument("--slow", type=int, default=2, help="viewers that read slowly")
+    parser.add_argument("--slow-delay", type=float, default=0.2, help="seconds per message of slow viewers")
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    path = args.capture
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "synthetic.capture")
+        write_capture(path, encode_h264(300, 720, 1600), resolution=(720, 1600))
+    reader = scrcpy.CaptureReader(path)
+    reader.load()
+
+    relay = scrcpy.Relay("127.0.0.1", 0)
+    relay.start()
+    # Stand-in device: the capture replayed at recorded speed through a real client
+    client = scrcpy.Client(replay=reader, replay_loop=True, block_frame=True)
+    relay.add_client("replay", client)
+    client.start(daemon_threaded=True)
+
+    results = asyncio.run(watch(relay.port, args.viewers, args.slow, args.seconds, args.slow_delay))
+    stats = relay.stats()["replay"]
+    client.stop()
+    relay.stop()
+
+    print(
+        f"packets:{stats['packets']} viewers:{args.viewers} slow:{args.slow} "
+        f"dropped for all viewers:{stats['dropped']}"
+    )
+    for i, r in enumerate(results):
+        print(
+            f"viewer {i:3d} delay:{r['delay_ms']:.0f}ms units:{r['units']} keyframes:{r['keyframes']} "
+            f"first_keyframe:{r['first_keyframe_ms'] or 0:.1f}ms codec:{r['codec_string']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
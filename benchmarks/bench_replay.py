@@ -0,0 +1,87 @@
+"""
+Replay a capture through the real client pipeline and report decode throughput,
+runs without devices.
+
+Usage:
+    python benchmarks/bench_replay.py --capture records/<serial>.capture --speed 0
+    python benchmarks/bench_replay.py --clients 8
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from _stream import encode_h264, write_capture
+
+import scrcpy
+
+
+def run(reader, clients: int, speed: float, seconds: float, reactor) -> tuple:
+    counts = [0] * clients
+
+    def counter(i):
+        def on_frame(frame):
+            if frame is not None:
+                counts[i] += 1
+
+        return on_frame
+
+    instances = []
+    for i in range(clients):
+        client = scrcpy.Client(
+            replay=reader, replay_speed=speed, replay_loop=True, block_frame=True
+        )
+        client.add_listener(scrcpy.EVENT_FRAME, counter(i))
+        instances.append(client)
+
+    start = time.perf_counter()
+    cpu = time.process_time()
+    for client in instances:
+        if reactor is not None:
+            client.start(reactor=reactor)
+        else:
+            client.start(daemon_threaded=True)
+    time.sleep(seconds)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu
+    for client in instances:
+        client.stop()
+    return sum(counts), elapsed, cpu
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--capture", help="capture file, a synthetic one is made if omitted")
+    parser.add_argument("--clients", type=int, default=1)
+    parser.add_argument("--speed", type=float, default=0, help="0 is as fast as possible")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--reactor", type=int, default=0, help="decode workers, 0 is one thread per client")
+    args = parser.parse_args()
+
+    path = args.capture
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "synthetic.capture")
+        write_capture(path, encode_h264(300, 720, 1600))
+    reader = scrcpy.CaptureReader(path)
+    reader.load()
+
+    reactor = None
+    if args.reactor:
+        reactor = scrcpy.Reactor(decode_workers=args.reactor)
+        reactor.start()
+    frames, elapsed, cpu = run(
+        reader, args.clients, args.speed, args.seconds, reactor
+    )
+    if reactor is not None:
+        reactor.stop()
+
+    print(f"capture: {path} {reader.device_name} {reader.resolution}")
+    print(
+        f"clients: {args.clients} frames: {frames} wall: {elapsed:.2f}s "
+        f"fps: {frames / elapsed:.0f} cpu: {cpu:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
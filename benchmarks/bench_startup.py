@@ -0,0 +1,93 @@
+"""
+Time-to-first-frame of every connected device with the bring-up scheduler.
+Needs real devices on adb.
+
+Usage:
+    python benchmarks/bench_startup.py --concurrency 1 4 8
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from adbutils import adb  # noqa: E402
+
+import scrcpy  # noqa: E402
+from model.bringup import BringUpScheduler  # noqa: E402
+
+
+def run(serials: list, concurrency: int, timeout: float) -> dict:
+    scheduler = BringUpScheduler(concurrency)
+    start = time.perf_counter()
+    first_frame = {}
+    clients = []
+    done = threading.Event()
+
+    def bring_up(index: int, serial: str):
+        client = scrcpy.Client(device=serial)
+        clients.append(client)
+
+        def on_init():
+            scheduler.release(serial)
+
+        def on_frame(frame):
+            if frame is not None and serial not in first_frame:
+                first_frame[serial] = time.perf_counter() - start
+                if len(first_frame) == len(serials):
+                    done.set()
+
+        client.add_listener(scrcpy.EVENT_INIT, on_init)
+        client.add_listener(scrcpy.EVENT_FRAME, on_frame)
+        scheduler.acquire(serial, index)
+        try:
+            client.start(daemon_threaded=True)
+        finally:
+            scheduler.release(serial)
+
+    threads = [
+        threading.Thread(target=bring_up, args=(i, s), daemon=True)
+        for i, s in enumerate(serials)
+    ]
+    for t in threads:
+        t.start()
+    done.wait(timeout)
+    for client in clients:
+        client.stop()
+    values = sorted(first_frame.values())
+    return dict(
+        started=len(values),
+        first=values[0] if values else None,
+        median=values[len(values) // 2] if values else None,
+        last=values[-1] if values else None,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    serials = [d.serial for d in adb.device_list()]
+    if not serials:
+        sys.exit("No adb devices connected")
+
+    print(f"{len(serials)} devices")
+    print(f"{'concurrency':>11} {'started':>8} {'first s':>8} {'median s':>9} {'last s':>8}")
+    for concurrency in args.concurrency:
+        r = run(serials, concurrency, args.timeout)
+        fmt = lambda v: f"{v:.2f}" if v is not None else "-"  # noqa: E731
+        print(
+            f"{concurrency:>11} {r['started']:>8} {fmt(r['first']):>8} "
+            f"{fmt(r['median']):>9} {fmt(r['last']):>8}"
+        )
+        # Let the servers exit before the next round
+        time.sleep(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Compare two suite.py results, one line per metric with the relative change.
+
+Usage:
+    python benchmarks/compare.py results/base.json results/head.json
+"""
+
+import argparse
+import json
+
+
+def flatten(value, prefix: str = "") -> dict:
+    """
+    Numeric leaves keyed by their path, device runs are keyed by count and mode
+    """
+    if isinstance(value, dict):
+        out = {}
+        for key, item in value.items():
+            out.update(flatten(item, f"{prefix}{key}."))
+        return out
+    if isinstance(value, list) and value and isinstance(value[0], dict):
+        out = {}
+        for item in value:
+            key = f"{item.get('devices', '')}{item.get('mode', '')}"
+            out.update(flatten(item, f"{prefix}{key}."))
+        return out
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix[:-1]: value}
+    return {}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("head")
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+    print(f"base {base['meta']['commit'][:10]}  head {head['meta']['commit'][:10]}")
+
+    old = flatten(base["results"])
+    new = flatten(head["results"])
+    width = max(map(len, new), default=10)
+    for key in new:
+        if key not in old:
+            print(f"{key:<{width}} {'':>12} {new[key]:>12.2f}")
+            continue
+        delta = (new[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+        print(f"{key:<{width}} {old[key]:>12.2f} {new[key]:>12.2f} {delta:>+8.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+Benchmark suite of the streaming and render pipeline, writes JSON so runs can be compared
+across commits with compare.py. Streams come from a capture or are synthesized, Qt runs
+on the offscreen platform, no device or display is needed.
+
+Usage:
+    python benchmarks/suite.py --output results/$(git rev-parse --short HEAD).json
+    python benchmarks/suite.py --capture records/<serial>.capture --devices 1 10 50 100
+"""
+
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import platform  # noqa: E402
+import subprocess  # noqa: E402
+import sys  # noqa: E402
+import tempfile  # noqa: E402
+import threading  # noqa: E402
+import time  # noqa: E402
+
+import av  # noqa: E402
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+
+from _stream import encode_h264, write_capture  # noqa: E402
+
+import scrcpy  # noqa: E402
+
+
+class _TileDevice:
+    """
+    The attributes of model.device.Device a tile reads, without adb
+    """
+
+    def __init__(self, index: int):
+        self.index = index
+        self.name = f"replay-{index}"
+        self.frame_rates_text = None
+
+    def recording(self):
+        return False
+
+
+def meta() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return dict(
+        commit=commit,
+        time=time.strftime("%Y-%m-%dT%H:%M:%S"),
+        python=platform.python_version(),
+        platform=platform.platform(),
+        cpu_count=os.cpu_count(),
+        av=av.__version__,
+        numpy=np.__version__,
+        opencv=cv2.__version__,
+    )
+
+
+def rss_kib() -> float:
+    """
+    Resident memory of this process
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return float(line.split()[1])
+    except OSError:
+        pass
+    import resource
+
+    return float(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def percentiles(values: list) -> dict:
+    values = np.array(values or [0.0]) * 1000
+    return dict(
+        p50_ms=float(np.percentile(values, 50)),
+        p95_ms=float(np.percentile(values, 95)),
+        p99_ms=float(np.percentile(values, 99)),
+    )
+
+
+def packets_of(reader: scrcpy.CaptureReader) -> list:
+    """
+    Access units of a capture, split like the client does
+    """
+    client = scrcpy.Client(replay=reader)
+    packets = []
+    for _, data in reader.load():
+        packets.extend(bytes(p) for p in client._parse_video(data))
+    return packets
+
+
+def bench_decode(reader: scrcpy.CaptureReader) -> tuple:
+    """
+    Decoded frames per second on one core (single threaded decoder)
+
+    Returns:
+        (result, decoded frames)
+    """
+    packets = packets_of(reader)
+    client = scrcpy.Client(
+        replay=reader, decoder_profile=scrcpy.DECODER_PROFILE_LOW_LATENCY
+    )
+    decoder = client.create_decoder()
+    frames = []
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    for packet in packets:
+        frames.extend(decoder.decode(av.Packet(packet)))
+    frames.extend(decoder.decode(None))
+    wall = time.perf_counter() - wall
+    cpu = time.process_time() - cpu
+    result = dict(
+        frames=len(frames),
+        fps_per_core=len(frames) / max(cpu, 1e-9),
+        fps_wall=len(frames) / max(wall, 1e-9),
+        ms_per_frame=1000 * wall / max(len(frames), 1),
+    )
+    return result, frames
+
+
+def bench_convert(reader: scrcpy.CaptureReader, frames: list, tile: int) -> dict:
+    """
+    bgr24 conversion cost at device resolution and at tile size
+    """
+    scale = min(tile / max(reader.resolution), 1)
+    result = {}
+    for name, kwargs in (
+        ("full", dict()),
+        ("tile", dict(output_scale=scale)),
+        ("tile_reuse", dict(output_scale=scale, reuse_frame_buffer=True)),
+    ):
+        client = scrcpy.Client(replay=reader, **kwargs)
+        convert = client.convert_frame
+        convert(frames[0])
+        start = time.perf_counter()
+        for frame in frames:
+            convert(frame)
+        result[name] = dict(ms_per_frame=1000 * (time.perf_counter() - start) / len(frames))
+    return result
+
+
+def bench_render(reader: scrcpy.CaptureReader, frames: list, tile: int, app) -> dict:
+    """
+    _DeviceScreen.render_frame cost of tile size frames
+    """
+    from view.cc_right_view import _DeviceScreen
+
+    scale = min(tile / max(reader.resolution), 1)
+    client = scrcpy.Client(replay=reader, output_scale=scale)
+    images = [client.convert_frame(f) for f in frames]
+    screen = _DeviceScreen(_TileDevice(0), *([lambda d: lambda e: None] * 5))
+    screen.show()
+    screen.render_frame(1, images[0])
+    app.processEvents()
+
+    start = time.perf_counter()
+    for image in images:
+        screen.render_frame(1, image)
+        app.processEvents()
+    elapsed = time.perf_counter() - start
+    screen.close()
+    return dict(
+        ms_per_frame=1000 * elapsed / len(images),
+        tile=[int(images[0].shape[1]), int(images[0].shape[0])],
+    )
+
+
+def bench_devices(
+    reader: scrcpy.CaptureReader,
+    devices: int,
+    seconds: float,
+    tile: int,
+    reactor_workers: int,
+    app,
+) -> dict:
+    """
+    Simulated devices replaying the capture at recorded speed through the client,
+    the Qt mailbox and render_frame. Latency is from the socket read to the end of paint
+    """
+    from view.cc_frame import Frame
+    from view.cc_right_view import _DeviceScreen
+
+    reactor = None
+    if reactor_workers:
+        reactor = scrcpy.Reactor(decode_workers=reactor_workers)
+        reactor.start()
+
+    scale = min(tile / max(reader.resolution), 1)
+    lock = threading.Lock()
+    latencies = []
+    painted = [0]
+    decoded = [0]
+    sessions = []
+
+    rss_before = rss_kib()
+    for i in range(devices):
+        client = scrcpy.Client(
+            replay=reader,
+            replay_loop=True,
+            output_scale=scale,
+            block_frame=True,
+        )
+        client.enable_latency_stats()
+        screen = _DeviceScreen(_TileDevice(i), *([lambda d: lambda e: None] * 5))
+        mailbox = Frame()
+
+        def on_post(item, screen=screen):
+            frame, received_at = item
+            screen.render_frame(1, frame)
+            now = time.perf_counter()
+            painted[0] += 1
+            if received_at is not None:
+                latencies.append(now - received_at)
+
+        def on_frame(frame, client=client, mailbox=mailbox):
+            with lock:
+                decoded[0] += 1
+            mailbox.post((frame, client.last_frame_received_at))
+
+        mailbox.set_connect(on_post)
+        client.add_listener(scrcpy.EVENT_FRAME, on_frame)
+        sessions.append((client, screen, mailbox))
+
+    start = time.perf_counter()
+    cpu = time.process_time()
+    for client, _, _ in sessions:
+        if reactor is not None:
+            client.start(reactor=reactor)
+        else:
+            client.start(daemon_threaded=True)
+    while time.perf_counter() - start < seconds:
+        app.processEvents()
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu
+    rss_after = rss_kib()
+
+    dropped = sum(mailbox.dropped for _, _, mailbox in sessions)
+    for client, screen, _ in sessions:
+        client.stop()
+        screen.close()
+    if reactor is not None:
+        reactor.stop()
+
+    result = dict(
+        devices=devices,
+        mode="reactor" if reactor_workers else "thread",
+        decoded_fps=decoded[0] / elapsed,
+        painted_fps=painted[0] / elapsed,
+        dropped_frames=dropped,
+        cpu_percent=100 * cpu / elapsed,
+        rss_kib_per_device=(rss_after - rss_before) / devices,
+    )
+    result.update(percentiles(latencies))
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--capture", help="capture file, a synthetic 720x1600 stream if omitted")
+    parser.add_argument("--devices", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--tile", type=int, default=240, help="long side of a tile")
+    parser.add_argument("--workers", type=int, default=0, help="reactor decode workers, 0 is thread mode")
+    parser.add_argument("--output", help="JSON file, stdout if omitted")
+    args = parser.parse_args()
+
+    from PySide6.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    path = args.capture
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), "synthetic.capture")
+        write_capture(path, encode_h264(300, 720, 1600), resolution=(720, 1600))
+    reader = scrcpy.CaptureReader(path)
+    reader.load()
+
+    decode, frames = bench_decode(reader)
+    results = dict(
+        capture=dict(
+            path=args.capture or "synthetic",
+            device_name=reader.device_name,
+            resolution=list(reader.resolution),
+            video_codec=reader.header["video_codec"],
+        ),
+        decode=decode,
+        convert=bench_convert(reader, frames, args.tile),
+        render=bench_render(reader, frames, args.tile, app),
+        devices=[
+            bench_devices(reader, n, args.seconds, args.tile, args.workers, app)
+            for n in args.devices
+        ],
+    )
+    output = json.dumps(dict(meta=meta(), results=results), indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
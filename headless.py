@@ -0,0 +1,229 @@
+"""
+无界面投屏：设备监控、投屏解码、控制、录制、截图和共享内存发布，不加载 PySide6，
+适合没有显示器的 Linux 机器。
+
+用法：
+    python headless.py                        # 交互命令行，输入 help 查看命令
+    python headless.py --list                 # 列出 adb 设备后退出
+    python headless.py --publish --mode process
+    python headless.py --wait 5 -c "snapshot" -c "list"   # 连接 5 秒后执行命令并退出
+"""
+
+import argparse
+import cmd
+import shlex
+import sys
+import time
+
+_start = time.perf_counter()
+
+import scrcpy  # noqa: E402
+from adbutils import adb  # noqa: E402
+
+from model import config  # noqa: E402
+from model.device import DeviceManager  # noqa: E402
+from model.event import default_loop  # noqa: E402
+
+_KEYS = {
+    "home": scrcpy.KEYCODE_HOME,
+    "back": scrcpy.KEYCODE_BACK,
+    "recent": scrcpy.KEYCODE_APP_SWITCH,
+    "power": scrcpy.KEYCODE_POWER,
+    "enter": scrcpy.KEYCODE_ENTER,
+}
+
+
+def rss_mib():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class FarmShell(cmd.Cmd):
+    intro = "输入 help 查看命令，设备可用序号(从 1 开始)、序列号或 all 指定"
+    prompt = "ccscrcpy> "
+
+    def __init__(self, manager: DeviceManager):
+        super().__init__()
+        self.manager = manager
+
+    def __targets(self, target):
+        devices = self.manager.get_devices_info()
+        if target == "all":
+            return devices
+        for d in devices:
+            if d.serial == target or str(d.index + 1) == target:
+                return [d]
+        print(f"no device {target}")
+        return []
+
+    def __split(self, arg, count):
+        args = shlex.split(arg)
+        if len(args) < count:
+            print("missing arguments, see help")
+            return None
+        return args
+
+    def emptyline(self):
+        pass
+
+    def do_list(self, _):
+        """list: 设备序号、序列号、分辨率、帧率、码率、录制状态"""
+        for d in self.manager.get_devices_info():
+            client = d.client
+            rates = d.update_frame_rates()
+            recording = " 录制" if d.recording() else ""
+            print(
+                f"{d.index + 1:02d} {d.serial} {d.name} {client.resolution} "
+                f"{rates} bitrate:{client.bitrate} fps:{client.max_fps}{recording}"
+            )
+
+    def do_key(self, arg):
+        """key <设备> <home|back|recent|power|enter|键值>: 按键"""
+        args = self.__split(arg, 2)
+        if args is None:
+            return
+        code = _KEYS.get(args[1])
+        if code is None:
+            try:
+                code = int(args[1])
+            except ValueError:
+                print(f"unknown key {args[1]}")
+                return
+        for d in self.__targets(args[0]):
+            d.keycode(code, scrcpy.ACTION_DOWN)
+            d.keycode(code, scrcpy.ACTION_UP)
+
+    def do_tap(self, arg):
+        """tap <设备> <x> <y>: 点击，坐标为投屏分辨率下的像素"""
+        args = self.__split(arg, 3)
+        if args is None:
+            return
+        x, y = float(args[1]), float(args[2])
+        for d in self.__targets(args[0]):
+            d.touch(x, y, scrcpy.ACTION_DOWN)
+            d.touch(x, y, scrcpy.ACTION_UP)
+
+    def do_text(self, arg):
+        """text <设备> <文字>: 输入文字"""
+        args = self.__split(arg, 2)
+        if args is None:
+            return
+        for d in self.__targets(args[0]):
+            d.on_send_text(" ".join(args[1:]))
+
+    def do_record(self, arg):
+        """record <设备> <on|off>: 开始/停止录制"""
+        args = self.__split(arg, 2)
+        if args is None:
+            return
+        for d in self.__targets(args[0]):
+            if args[1] == "on":
+                d.start_recording()
+            else:
+                d.stop_recording()
+
+    def do_snapshot(self, arg):
+        """snapshot [目录]: 所有设备截图"""
+        args = shlex.split(arg)
+        directory = args[0] if args else config.device_snapshot_dir
+        self.manager.snapshot_all(directory)
+
+    def do_publish(self, arg):
+        """publish <on|off>: 画面发布到共享内存"""
+        self.manager.publish_all(arg.strip() == "on")
+
+    def do_stats(self, _):
+        """stats: 进程内存和码流转发观看情况"""
+        print(f"rss:{rss_mib():.1f}MiB devices:{len(self.manager.get_devices_info())}")
+        if self.manager.relay is not None:
+            for name, stats in self.manager.relay.stats().items():
+                print(f"relay {name} {stats}")
+
+    def do_quit(self, _):
+        """quit: 退出"""
+        return True
+
+    do_exit = do_quit
+    do_EOF = do_quit
+
+
+def main():
+    parser = argparse.ArgumentParser(description="无界面投屏")
+    parser.add_argument("--list", action="store_true", help="列出 adb 设备后退出")
+    parser.add_argument(
+        "--mode",
+        choices=[
+            config.device_stream_mode_thread,
+            config.device_stream_mode_reactor,
+            config.device_stream_mode_process,
+        ],
+        default=config.device_stream_mode,
+        help="投屏模式",
+    )
+    parser.add_argument("--max-size", type=int, default=720, help="投屏短边像素，服务端按设备宽高比编码，0 不限制")
+    parser.add_argument("--record", action="store_true", help="设备连接后开始录制")
+    parser.add_argument("--publish", action="store_true", help="画面发布到共享内存")
+    parser.add_argument("--relay-port", type=int, default=config.device_relay_port, help="码流转发端口，0 关闭")
+    parser.add_argument("-c", "--command", action="append", help="执行命令后退出，可重复")
+    parser.add_argument("--wait", type=float, default=3, help="执行 --command 前等待设备连接的秒数")
+    args = parser.parse_args()
+
+    if args.list:
+        for d in adb.device_list():
+            print(d.serial)
+        return
+
+    default_loop.run_in_thread()
+
+    manager = None
+
+    def on_init(device):
+        if args.record:
+            device.start_recording()
+
+    def on_devices_changed(devices):
+        manager.update_renders(devices)
+
+    manager = DeviceManager(
+        on_init,
+        None,
+        None,
+        on_devices_changed,
+        lambda serial: None,
+        stream_mode=args.mode,
+        device_max_size=args.max_size,
+        on_bringup_progress=None,
+        on_bitrate_decision=lambda msg: print(f"bitrate {msg}"),
+        publish=args.publish,
+        relay_port=args.relay_port,
+    )
+    print(
+        f"headless ready in {(time.perf_counter() - _start) * 1000:.0f}ms "
+        f"rss:{rss_mib():.1f}MiB qt:{'PySide6' in sys.modules}"
+    )
+
+    shell = FarmShell(manager)
+    try:
+        if args.command:
+            time.sleep(args.wait)
+            for command in args.command:
+                shell.onecmd(command)
+        else:
+            shell.cmdloop()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        manager.stop()
+        default_loop.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import time
+from threading import Event, Thread
+from typing import Any, Callable, Optional
+
+# 画面落后设备时钟超过该值(秒)视为卡顿
+STALL_LAG = 0.25
+
+
+def stream_frame_meta(frame_meta, adaptive):
+    # 卡顿检测用服务端帧头中的 pts 计算 stream_lag，开启自适应码率时设备必须带帧头
+    return frame_meta or adaptive
+
+
+def hub_of(devpath):
+    # usb:1-1.2 -> usb:1-1，同一个 hub 下的设备共享带宽；网络设备各自独立
+    if not devpath or not devpath.startswith("usb:"):
+        return devpath or "unknown"
+    port = devpath[len("usb:"):]
+    for sep in (".", "-"):
+        if sep in port:
+            return "usb:" + port.rsplit(sep, 1)[0]
+    return devpath
+
+
+class _RateState:
+    def __init__(self, hub, bytes_received):
+        self.hub = hub
+        self.bytes = bytes_received
+        # 实测 bit/s (平滑后)
+        self.bps = 0.0
+        self.stalled = False
+        # 调整后冷却，等新码率生效后再评估
+        self.cooldown_until = 0.0
+        self.last_stall = 0.0
+
+
+class BitrateController:
+    """
+    自适应码率：按 USB hub 分组统计实测带宽和卡顿，超出预算或卡顿时降低最占带宽设备的码率/帧率，
+    有余量时逐步恢复
+    """
+
+    def __init__(
+        self,
+        get_devices: Callable[[], list],
+        budget: int,
+        min_bitrate: int,
+        max_bitrate: int,
+        min_fps: int,
+        interval: float = 2.0,
+        on_decision: Optional[Callable[..., Any]] = None,
+    ):
+        self.get_devices = get_devices
+        self.budget = budget
+        self.min_bitrate = min_bitrate
+        self.max_bitrate = max_bitrate
+        self.min_fps = min_fps
+        self.interval = interval
+        self.on_decision = on_decision
+
+        # 降低后的冷却时间、卡顿后多久才允许提升
+        self.cooldown = 3 * interval
+        self.raise_after = 10 * interval
+
+        # serial:_RateState
+        self.states = {}
+        self.stop_event = Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = Thread(target=self.__run, name="bitrate_controller", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def __run(self):
+        last = time.monotonic()
+        while not self.stop_event.wait(self.interval):
+            now = time.monotonic()
+            try:
+                self.sample(now - last, now)
+            except Exception as e:
+                print(f"bitrate controller error:{e}")
+            last = now
+
+    def sample(self, elapsed, now):
+        groups = {}
+        for device in self.get_devices():
+            client = device.client
+            if not (device.online and device.started and client.alive):
+                self.states.pop(device.serial, None)
+                continue
+            state = self.states.get(device.serial)
+            if state is None or client.bytes_received < state.bytes:
+                # 新连接或重启后计数清零
+                state = self.states[device.serial] = _RateState(
+                    hub_of(device.devpath()), client.bytes_received
+                )
+                state.cooldown_until = max(state.cooldown_until, now + self.cooldown)
+                continue
+            bps = 8 * (client.bytes_received - state.bytes) / max(elapsed, 1e-3)
+            state.bytes = client.bytes_received
+            state.bps = bps if state.bps == 0 else 0.5 * state.bps + 0.5 * bps
+            state.stalled = client.stream_lag > STALL_LAG
+            if state.stalled:
+                state.last_stall = now
+            groups.setdefault(state.hub, []).append((device, state))
+
+        for hub, members in groups.items():
+            self.__balance(hub, members, now)
+
+    def __balance(self, hub, members, now):
+        total = sum(state.bps for _, state in members)
+        stalled = [m for m in members if m[1].stalled]
+        ready = [m for m in members if now >= m[1].cooldown_until]
+
+        if stalled or total > self.budget:
+            # 先处理卡顿的设备，其次是占用带宽最多的
+            candidates = [m for m in stalled if m in ready] or ready
+            candidates.sort(key=lambda m: m[1].bps, reverse=True)
+            count = max(1, len(stalled) // 2)
+            for device, state in candidates[:count]:
+                if self.__lower(device, state, hub, total, now):
+                    total -= state.bps / 2
+            return
+
+        if total > 0.7 * self.budget:
+            return
+        # 有余量：一次只恢复一台，码率最低的优先
+        candidates = [
+            m for m in ready if now - m[1].last_stall > self.raise_after
+        ]
+        candidates.sort(key=lambda m: (m[0].client.bitrate, m[0].index))
+        for device, state in candidates:
+            if self.__raise(device, state, hub, total, now):
+                return
+
+    def __lower(self, device, state, hub, total, now):
+        client = device.client
+        bitrate, max_fps = client.bitrate, client.max_fps
+        if bitrate > self.min_bitrate:
+            bitrate = max(self.min_bitrate, int(bitrate * 0.7))
+        elif max_fps == 0 or max_fps > self.min_fps:
+            max_fps = self.min_fps
+        else:
+            return False
+        reason = "卡顿" if state.stalled else "超出预算"
+        self.__apply(device, state, hub, total, bitrate, max_fps, reason, now)
+        return True
+
+    def __raise(self, device, state, hub, total, now):
+        client = device.client
+        bitrate, max_fps = client.bitrate, client.max_fps
+        if max_fps != 0:
+            # 先恢复帧率
+            max_fps = 0
+        elif bitrate < self.max_bitrate:
+            bitrate = min(self.max_bitrate, int(bitrate * 1.25))
+        else:
+            return False
+        if total + (bitrate - client.bitrate) > 0.9 * self.budget:
+            return False
+        self.__apply(device, state, hub, total, bitrate, max_fps, "带宽有余量", now)
+        return True
+
+    def __apply(self, device, state, hub, total, bitrate, max_fps, reason, now):
+        state.cooldown_until = now + self.cooldown
+        fps = max_fps if max_fps else "不限"
+        msg = (
+            f"{device.name} {reason}: 码率 {device.client.bitrate // 1000}k -> {bitrate // 1000}k, "
+            f"帧率 {fps} (hub {hub} 实测 {total / 1e6:.1f}/{self.budget / 1e6:.0f} Mbps)"
+        )
+        print(f"bitrate {msg}")
+        if self.on_decision is not None:
+            self.on_decision(msg)
+        device.restart_stream(bitrate=bitrate, max_fps=max_fps)
@@ -0,0 +1,87 @@
+from threading import Condition
+from typing import Any, Callable, Optional
+
+
+class BringUpScheduler:
+    """
+    设备启动调度：限制同时部署/连接的设备数量，按优先级(值越小越先)依次放行
+    """
+
+    def __init__(self, concurrency: int, on_progress: Optional[Callable[..., Any]] = None):
+        assert concurrency > 0, "concurrency must be greater than 0"
+        self.concurrency = concurrency
+        self.on_progress = on_progress
+
+        self.cond = Condition()
+        self.seq = 0
+        # key:(priority, seq)
+        self.waiting = {}
+        self.running = set()
+        self.done = 0
+        self.failed = 0
+
+    def acquire(self, key, priority=0):
+        # 阻塞直到轮到该设备启动
+        with self.cond:
+            if not self.waiting and not self.running:
+                # 新一轮启动，重新计数
+                self.done = 0
+                self.failed = 0
+            self.seq += 1
+            self.waiting[key] = (priority, self.seq)
+            self.__notify_progress()
+            while key in self.waiting and not (
+                len(self.running) < self.concurrency
+                and min(self.waiting, key=self.waiting.get) == key
+            ):
+                self.cond.wait()
+            if key not in self.waiting:
+                # 等待期间被取消
+                return False
+            del self.waiting[key]
+            self.running.add(key)
+            self.__notify_progress()
+            return True
+
+    def release(self, key, ok=True):
+        # 连接成功或失败后释放名额，可重复调用
+        with self.cond:
+            if key not in self.running:
+                return
+            self.running.remove(key)
+            if ok:
+                self.done += 1
+            else:
+                self.failed += 1
+            self.cond.notify_all()
+            self.__notify_progress()
+
+    def cancel(self, key):
+        # 设备在等待期间下线
+        with self.cond:
+            if self.waiting.pop(key, None) is not None:
+                self.cond.notify_all()
+                self.__notify_progress()
+
+    def set_priority(self, key, priority):
+        with self.cond:
+            if key in self.waiting:
+                self.waiting[key] = (priority, self.waiting[key][1])
+                self.cond.notify_all()
+
+    def progress(self):
+        with self.cond:
+            return self.__progress()
+
+    def __progress(self):
+        return dict(
+            done=self.done,
+            failed=self.failed,
+            running=len(self.running),
+            waiting=len(self.waiting),
+            total=self.done + self.failed + len(self.running) + len(self.waiting),
+        )
+
+    def __notify_progress(self):
+        if self.on_progress is not None:
+            self.on_progress(self.__progress())
@@ -1,4 +1,84 @@
 ui_config_show_log:bool = False
+# 在每个投屏上显示延迟统计
+ui_config_show_latency:bool = False
+# 在每个投屏标题上显示实际绘制帧率和跳过的未变化帧率
+ui_config_show_fps:bool = True
 
 ui_global_ctrl_resize = 0
-ui_global_ctrl_rename = 1
\ No newline at end of file
+ui_global_ctrl_rename = 1
+
+# 投屏模式: thread 每台设备一个解码线程, reactor 共享 IO 线程和固定大小的解码线程池,
+# process 设备分散到多个解码进程，画面经共享内存传回
+device_stream_mode_thread = "thread"
+device_stream_mode_reactor = "reactor"
+device_stream_mode_process = "process"
+device_stream_mode:str = device_stream_mode_thread
+device_decode_workers:int = 4
+# process 模式的解码进程数
+device_process_workers:int = 4
+
+# 全部截图的目录、格式(png/jpg/webp)、质量(0-100)，按设备分辨率截图，并生成总览图
+device_snapshot_dir:str = "snapshots"
+device_snapshot_format:str = "jpg"
+device_snapshot_quality:int = 90
+device_snapshot_full_resolution:bool = True
+device_snapshot_sheet:bool = True
+
+# 码流转发给浏览器观看(http://<本机>:<端口>/)，不解码不重新编码，0 表示关闭
+# 没有鉴权，默认只监听本机，局域网观看时改为 0.0.0.0
+device_relay_host:str = "127.0.0.1"
+device_relay_port:int = 0
+
+# 每台设备的最新画面发布到共享内存(ccscrcpy_<序列号>)，其他进程可零拷贝读取
+device_publish_frames:bool = False
+# 共享内存中保留的帧数，读取方有 slots - 1 帧的时间处理一帧
+device_publish_slots:int = 3
+
+# 画面未变化(采样亮度校验和相同)的帧不转换也不绘制
+device_skip_unchanged:bool = False
+
+# 解码时直接缩放到投屏显示尺寸
+device_decode_to_tile:bool = True
+
+# 服务端按投屏显示尺寸编码，未知设备宽高比时按该值估算长边
+device_stream_follow_tile:bool = True
+device_stream_default_aspect:float = 2.5
+
+# 非选中设备的解码模式: full 全部解码, nonref 跳过非参考帧, keyframe 只解码关键帧
+device_thumbnail_decode_mode:str = "full"
+# keyframe 模式下服务端的编码参数(android MediaFormat)，默认约 10 秒一个关键帧，缩短间隔让缩略图及时更新
+device_keyframe_codec_options:str = "i-frame-interval=2"
+
+# 解码参数: default, low_latency 低延迟, throughput 多线程吞吐, thumbnail 吞吐且跳过去块滤波
+device_decoder_profile:str = "default"
+device_decoder_threads:int = 0
+
+# 服务端发送帧头(pts 和长度)，跳过 h264 parser 直接解码；开启自适应码率时自动开启，卡顿检测需要帧头
+device_frame_meta:bool = False
+
+# 同时部署/连接的设备数量上限
+device_bringup_concurrency:int = 4
+
+# 连接方式: True adb forward 主动连接并重试, False adb reverse 由服务端回连到本机单一监听线程，
+# adb reverse 失败时自动改用 forward
+device_tunnel_forward:bool = True
+
+# 服务端版本和 jar 路径，空路径使用自带的 1.20；h265/av1 需要 2.4-2.7 服务端
+device_server_version:str = "1.20"
+device_server_jar:str = ""
+# 视频编码: h264, h265, av1
+device_video_codec:str = "h264"
+
+# 自适应码率: 按 USB hub 分组限制总带宽(bit/s)，卡顿或超出时降低码率/帧率，有余量时恢复
+device_bitrate_adaptive:bool = False
+device_bitrate_budget:int = 160000000
+device_bitrate_min:int = 1000000
+device_bitrate_max:int = 8000000
+device_fps_min:int = 15
+
+# 录制: 不解码直接封装原始码流，格式 mkv 或 mp4
+device_record_dir:str = "records"
+device_record_format:str = "mkv"
+
+# 抓包目录: 非空时把每台设备的原始视频流(含到达时间)保存为 <serial>.capture，可脱离设备回放
+device_capture_dir:str = ""
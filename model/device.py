@@ -1,10 +1,18 @@
-from threading import Thread
+import math
+import os
+import re
+import time
+from threading import Lock, Thread
 from typing import Any, Callable, Optional
 
 import scrcpy
 from adbutils import adb
+from scrcpy.stats import STAGE_DECODE, STAGE_PAINT, STAGE_SIGNAL, STAGE_TOTAL
 
-from view.cc_frame import CustomEvent, Frame
+from model.bitrate import BitrateController, stream_frame_meta
+from model.bringup import BringUpScheduler
+from model.event import create_event, create_frame
+from model.snapshot import snapshot_devices
 from model.config import *
 
 
@@ -21,6 +29,11 @@ class Device:
         on_init: Callable[..., Any],
         on_frame: Callable[..., Any],
         on_post: Callable[..., Any],
+        reactor: Optional[scrcpy.Reactor] = None,
+        max_width: int = 0,
+        bringup: Optional[BringUpScheduler] = None,
+        pool: Optional[scrcpy.ProcessPool] = None,
+        publish: bool = False,
     ) -> None:
         self.index = index
         self.serial = serial
@@ -37,41 +50,180 @@ class Device:
 
         # 设置 client
         self.device = adb.device(serial=self.serial)
-        self.client = scrcpy.Client(device=self.device)
+        # process 模式下 client 在解码进程中运行，这里是它的代理
+        create_client = scrcpy.Client if pool is None else pool.client
+        self.remote = pool is not None
+        self.client = create_client(
+            device=self.device if pool is None else self.serial,
+            max_width=max_width,
+            bitrate=device_bitrate_max,
+            decode_mode=device_thumbnail_decode_mode,
+            codec_options=(
+                device_keyframe_codec_options
+                if device_thumbnail_decode_mode == scrcpy.DECODE_MODE_KEYFRAME
+                else None
+            ),
+            decoder_profile=device_decoder_profile,
+            decoder_threads=device_decoder_threads,
+            frame_meta=stream_frame_meta(device_frame_meta, device_bitrate_adaptive),
+            tunnel_forward=device_tunnel_forward,
+            server_version=device_server_version,
+            server_jar=device_server_jar or None,
+            video_codec=device_video_codec,
+            capture=self.__capture_path(),
+            skip_unchanged=device_skip_unchanged,
+        )
 
         self.client.add_listener(scrcpy.EVENT_INIT, self.__on_init)
         self.client.add_listener(scrcpy.EVENT_FRAME, self.__on_frame)
+        self.client.add_listener(scrcpy.EVENT_DISCONNECT, self.__on_disconnect)
+
+        # reactor 模式下解码由共享线程池完成，线程只负责部署和连接
+        self.reactor = reactor
+        # 启动调度，按 index 顺序(网格中靠前的投屏)优先
+        self.bringup = bringup
 
         self.started = False
         self.thread = None
+        self.restart_lock = Lock()
 
         self.ratio = 1
         self.online = True
+        self.usb_devpath = None
+        self.recorder = None
+
+        # 发布模式下每帧写入以序列号命名的共享内存环，供其他进程读取
+        self.publish = publish
+        self.publisher = None
+        self.publish_lock = Lock()
+
+        # 实际绘制帧数，标题上的帧率每秒按差值统计
+        self.painted_frames = 0
+        self.rate_time = time.monotonic()
+        self.rate_painted = 0
+        self.rate_skipped = 0
+        self.frame_rates_text = None
+
+        self.latency_overlay_time = 0
+        self.latency_overlay_text = None
+        if ui_config_show_latency:
+            self.enable_latency_stats()
+
+    def __capture_path(self):
+        if not device_capture_dir:
+            return None
+        os.makedirs(device_capture_dir, exist_ok=True)
+        serial = re.sub(r"[^\w.-]", "_", self.serial)
+        return os.path.join(device_capture_dir, f"{serial}.capture")
 
     def bind_frame_event(self):
         if self.frame is None:
-            self.frame = Frame()
+            self.frame = create_frame()
             self.frame.set_connect(self.__on_post)
 
-    def __on_post(self, frame):
+    def __on_post(self, item):
+        frame, slot, received_at, posted_at = item
+        if slot is not None:
+            # 取出时解码进程可能已复用该槽位，复制后校验序号，被覆盖的帧不绘制
+            frame = self.client.copy_frame(frame, slot)
+            if frame is None:
+                return
+        self.painted_frames += 1
+        stats = self.client.latency_stats
+        if stats is None or posted_at is None:
+            self.on_post_listener(self, frame)
+            return
+
+        start = time.perf_counter()
+        stats.record(STAGE_SIGNAL, start - posted_at)
         self.on_post_listener(self, frame)
+        end = time.perf_counter()
+        stats.record(STAGE_PAINT, end - start)
+        if received_at is not None:
+            stats.record(STAGE_TOTAL, end - received_at)
 
     def __on_init(self):
         print(
             f"device:{self.client.device_name}, name:{self.name},  resolution:{self.client.resolution}"
         )
+        if self.bringup is not None:
+            self.bringup.release(self.serial)
+        # 连接各阶段耗时，重连时可看出是否跳过了 jar 推送
+        timings = " ".join(f"{k}:{v * 1000:.0f}ms" for k, v in self.client.timings.items())
+        print(f"device:{self.serial} start {timings}")
         if self.on_init_listener is not None:
             self.on_init_listener(self)
 
     def __on_frame(self, frame):
+        if frame is not None and self.publish:
+            self.__publish_frame(frame)
         if frame is not None and self.on_frame_listener is not None:
             self.on_frame_listener(self, frame)
 
+    def __publish_frame(self, frame):
+        with self.publish_lock:
+            if not self.publish:
+                return
+            ring = self.publisher
+            if ring is None or frame.nbytes > ring.capacity:
+                # 按设备分辨率分配，缩放投屏尺寸时不必重建；重建后读取方看到 closed 重新 attach
+                if ring is not None:
+                    ring.close()
+                capacity = frame.nbytes
+                if self.client.resolution is not None:
+                    capacity = max(capacity, self.client.resolution[0] * self.client.resolution[1] * 3)
+                ring = self.publisher = scrcpy.FrameRing.create_or_replace(
+                    capacity, device_publish_slots, scrcpy.ring_name(self.serial)
+                )
+                print(f"device:{self.serial} publish {ring.name}")
+            pts = self.client.last_frame_pts
+            ring.write(frame, -1 if pts is None else pts)
+
+    def set_publish(self, enabled):
+        with self.publish_lock:
+            self.publish = enabled
+            if not enabled and self.publisher is not None:
+                self.publisher.close()
+                self.publisher = None
+
+    def __on_disconnect(self):
+        # reactor 模式下断线后重新连接
+        if self.reactor is not None and self.started and self.online:
+            self.thread = Thread(
+                target=self.__run, name=f"device_thread_{self.serial}"
+            )
+            self.thread.start()
+
+    def __start_client(self, **kwargs):
+        # 等待启动调度放行后再部署和连接，连接成功(__on_init)时释放名额
+        if self.bringup is not None and not self.bringup.acquire(
+            self.serial, self.index
+        ):
+            return False
+        try:
+            self.client.start(**kwargs)
+        except Exception:
+            if self.bringup is not None:
+                self.bringup.release(self.serial, ok=False)
+            raise
+        finally:
+            if self.bringup is not None:
+                self.bringup.release(self.serial)
+        return True
+
     def __run(self):
         print(f"{self.thread.name} start")
-        self.client.start()
-        while self.started:
-            self.client.start()
+        if self.reactor is not None:
+            try:
+                self.__start_client(reactor=self.reactor)
+            except Exception as e:
+                print(f"{self.thread.name} error:{e}")
+            print(f"{self.thread.name} end")
+            return
+
+        started = self.__start_client()
+        while started and self.started:
+            started = self.__start_client()
         print(f"{self.thread.name} end")
 
     def set_online(self, online):
@@ -79,7 +231,67 @@ class Device:
 
     def post_frame(self, frame):
         if self.online and self.frame is not None:
-            self.frame.post(frame)
+            # process 模式下 frame 是共享内存的零拷贝视图，记下所在槽位
+            slot = self.client.last_frame_slot if self.remote and frame is not None else None
+            if self.client.latency_stats is not None:
+                self.frame.post(
+                    (frame, slot, self.client.last_frame_received_at, time.perf_counter())
+                )
+            else:
+                self.frame.post((frame, slot, None, None))
+
+    def enable_latency_stats(self):
+        self.client.enable_latency_stats()
+
+    def latency_summary(self):
+        # 各阶段 p50/p95/p99 (ms)，未开启时为 None
+        return self.client.latency_summary()
+
+    def latency_overlay(self):
+        # 投屏上显示的延迟文字，最多每 0.5 秒重新统计一次
+        now = time.monotonic()
+        if now - self.latency_overlay_time > 0.5:
+            self.latency_overlay_time = now
+            summary = self.latency_summary()
+            if summary is None:
+                self.latency_overlay_text = None
+            else:
+                total = summary[STAGE_TOTAL]
+                decode = summary[STAGE_DECODE]
+                self.latency_overlay_text = (
+                    f"e2e {total['p50']:.0f}/{total['p95']:.0f}/{total['p99']:.0f}ms\n"
+                    f"dec {decode['p50']:.1f}/{decode['p99']:.1f}ms"
+                )
+        return self.latency_overlay_text
+
+    def update_frame_rates(self):
+        # 距上次调用的平均绘制帧率和未变化跳过的帧率，UI 定时调用
+        now = time.monotonic()
+        elapsed = now - self.rate_time
+        if elapsed <= 0:
+            return self.frame_rates_text
+        skipped = self.client.frames_skipped
+        painted_fps = max(self.painted_frames - self.rate_painted, 0) / elapsed
+        skipped_fps = max(skipped - self.rate_skipped, 0) / elapsed
+        self.rate_time = now
+        self.rate_painted = self.painted_frames
+        self.rate_skipped = skipped
+        self.frame_rates_text = f"{painted_fps:.0f}fps"
+        if skipped_fps >= 0.5:
+            self.frame_rates_text += f" 跳过{skipped_fps:.0f}"
+        return self.frame_rates_text
+
+    def dropped_frames(self):
+        # UI 来不及显示而被新帧覆盖的帧数
+        if self.frame is None:
+            return 0
+        return self.frame.dropped
+
+    def set_decode_mode(self, decode_mode):
+        self.client.set_decode_mode(decode_mode)
+
+    def set_decoder_profile(self, decoder_profile, decoder_threads=None):
+        self.client.set_decoder_profile(decoder_profile, decoder_threads)
 
     def update_ratio(self, device_max_size):
         if self.online:
@@ -91,6 +303,55 @@ class Device:
         else:
             self.ratio = 1
 
+        # 解码输出直接缩放到显示尺寸，放大时仍按设备分辨率解码
+        if device_decode_to_tile:
+            self.client.set_output_scale(min(self.ratio, 1))
+
+    def aspect(self):
+        # 长边/短边，未连接时为 None
+        if self.client.resolution is None:
+            return None
+        return max(self.client.resolution) / min(self.client.resolution)
+
+    def restart_frame(self, max_width):
+        # 按新的分辨率重启投屏
+        self.restart_stream(max_width=max_width)
+
+    def restart_stream(self, **params):
+        # 后台修改 client 参数(max_width, bitrate, max_fps)后重启投屏，不阻塞 UI 线程
+        def run():
+            with self.restart_lock:
+                changed = {
+                    k: v for k, v in params.items() if getattr(self.client, k) != v
+                }
+                if not changed:
+                    return
+                if not self.started:
+                    for k, v in changed.items():
+                        setattr(self.client, k, v)
+                    return
+                print(f"device:{self.serial} restart {changed}")
+                self.stop_frame()
+                for k, v in changed.items():
+                    setattr(self.client, k, v)
+                if self.online:
+                    self.start_frame()
+
+        Thread(target=run, name=f"device_restart_{self.serial}", daemon=True).start()
+
+    def devpath(self):
+        # USB 路径，用于按 hub 分组，查询一次后缓存
+        if self.usb_devpath is None:
+            try:
+                self.usb_devpath = self.device.get_devpath()
+            except Exception:
+                self.usb_devpath = ""
+        return self.usb_devpath
+
+    def display_ratio(self, frame):
+        # frame 可能已按 output_scale 缩放，换算成相对 frame 的显示比例
+        return self.ratio * max(self.client.resolution) / max(frame.shape[:2])
+
     def start_frame(self):
         if self.started:
             # print(f"device:{self.client.device_name} already start")
@@ -104,8 +365,46 @@ class Device:
             # print(f"device:{self.client.device_name} already exit")
             return
         self.started = False
+        if self.bringup is not None:
+            self.bringup.cancel(self.serial)
         self.client.stop()
-        self.thread.join()
+        if self.thread is not None:
+            self.thread.join()
+
+    def start_recording(self):
+        # 录制到 device_record_dir，文件在下一个关键帧时创建
+        if self.recorder is not None:
+            return
+        # process 模式下码流留在解码进程中，不支持录制
+        if scrcpy.EVENT_PACKET not in self.client.listeners:
+            print(f"device:{self.serial} record is not supported in {device_stream_mode} mode")
+            return
+        os.makedirs(device_record_dir, exist_ok=True)
+        serial = re.sub(r"[^\w.-]", "_", self.serial)
+        path = os.path.join(
+            device_record_dir,
+            f"{serial}_{time.strftime('%Y%m%d_%H%M%S')}.{device_record_format}",
+        )
+        recorder = scrcpy.Recorder(self.client, path)
+        try:
+            recorder.start()
+        except RuntimeError as e:
+            print(f"device:{self.serial} record failed: {e}")
+            return
+        self.recorder = recorder
+        print(f"device:{self.serial} record start {path}")
+
+    def stop_recording(self):
+        if self.recorder is None:
+            return
+        recorder, self.recorder = self.recorder, None
+        recorder.stop()
+        print(
+            f"device:{self.serial} record stop {recorder.path} packets:{recorder.packets} bytes:{recorder.bytes}"
+        )
+
+    def recording(self):
+        return self.recorder is not None
 
     def on_click_home(self):
         self.client.control.keycode(scrcpy.KEYCODE_HOME, scrcpy.ACTION_DOWN)
@@ -131,6 +430,11 @@ class Device:
     def set_clipboard(self, text, paste=True):
         self.client.control.set_clipboard(text, paste)
 
+    def bringup_first(self):
+        # 还在等待启动的设备被选中时排到最前，其余仍按 index 顺序
+        if self.bringup is not None:
+            self.bringup.set_priority(self.serial, -1)
+
     def on_click_screen(self):
         self.client.control.back_or_turn_screen_on()
 
@@ -146,6 +450,12 @@ class DeviceManager:
         on_post: Callable[..., Any],
         on_devices_changed: Callable[..., Any],
         on_device_name_get: Callable[..., Any],
+        stream_mode: str = device_stream_mode,
+        device_max_size: int = 240,
+        on_bringup_progress: Optional[Callable[..., Any]] = None,
+        on_bitrate_decision: Optional[Callable[..., Any]] = None,
+        publish: bool = device_publish_frames,
+        relay_port: int = device_relay_port,
     ) -> None:
         self.on_init = on_init
         self.on_frame = on_frame
@@ -154,15 +464,62 @@ class DeviceManager:
         self.on_device_name_get = on_device_name_get
 
         self.index = -1
-
-        self.event = CustomEvent()
+        self.device_max_size = device_max_size
+        # 画面发布到共享内存
+        self.publish = publish
+
+        # 投屏模式在启动时确定
+        self.stream_mode = stream_mode
+        self.reactor = None
+        if self.stream_mode == device_stream_mode_reactor:
+            self.reactor = scrcpy.Reactor(decode_workers=device_decode_workers)
+            self.reactor.start()
+        self.pool = None
+        if self.stream_mode == device_stream_mode_process:
+            self.pool = scrcpy.ProcessPool(workers=device_process_workers)
+            self.pool.start()
+
+        # 码流转发，设备创建时加入
+        self.relay = None
+        if relay_port:
+            self.relay = scrcpy.Relay(device_relay_host, relay_port)
+            self.relay.start()
+            print(f"relay http://{device_relay_host}:{self.relay.port}/")
+
+        self.event = create_event()
         self.event.set_connect(self.__on_devices_changed)
 
-        self.device_bind_event = CustomEvent()
+        # 启动进度在设备线程中产生，转到 UI 线程通知
+        self.on_bringup_progress = on_bringup_progress
+        self.bringup_event = create_event()
+        self.bringup_event.set_connect(self.__on_bringup_progress)
+        self.bringup = BringUpScheduler(
+            device_bringup_concurrency, self.bringup_event.post
+        )
+
+        # 码率调整在控制线程中产生，转到 UI 线程显示
+        self.on_bitrate_decision = on_bitrate_decision
+        self.bitrate_event = create_event()
+        self.bitrate_event.set_connect(self.__on_bitrate_decision)
+        self.bitrate_controller = None
+        if device_bitrate_adaptive:
+            if not device_frame_meta:
+                print("bitrate adaptive needs frame meta for stall detection, enabled for all devices")
+            self.bitrate_controller = BitrateController(
+                lambda: self.devices,
+                device_bitrate_budget,
+                device_bitrate_min,
+                device_bitrate_max,
+                device_fps_min,
+                on_decision=self.bitrate_event.post,
+            )
+            self.bitrate_controller.start()
+
+        self.device_bind_event = create_event()
         self.device_bind_event.set_connect(self.__on_device_bind)
 
         if ui_config_show_log:
-            self.log_event = CustomEvent()
+            self.log_event = create_event()
             self.log_event.set_connect(self.__print_log)
 
         # serial:Device
@@ -184,6 +541,14 @@ class DeviceManager:
     def __on_devices_changed(self, devices: list[Device]):
         self.on_devices_changed(devices)
 
+    def __on_bringup_progress(self, progress):
+        if self.on_bringup_progress is not None:
+            self.on_bringup_progress(progress)
+
+    def __on_bitrate_decision(self, msg):
+        if self.on_bitrate_decision is not None:
+            self.on_bitrate_decision(msg)
+
     def __on_device_bind(self, device: Device):
         device.bind_frame_event()
 
@@ -238,6 +603,9 @@ class DeviceManager:
             )
             self.devices_map[serial] = device
             self.device_bind_event.post(device)
+            # process 模式下码流留在解码进程中，不转发
+            if self.relay is not None and scrcpy.EVENT_PACKET in device.client.listeners:
+                self.relay.add_client(serial, device.client)
             changed = True
 
         # 通知外部
@@ -257,14 +625,42 @@ class DeviceManager:
             on_init=self.on_init,
             on_frame=self.on_frame,
             on_post=self.on_post,
+            reactor=self.reactor,
+            max_width=self.__stream_max_width(None),
+            bringup=self.bringup,
+            pool=self.pool,
+            publish=self.publish,
         )
 
+    # 服务端编码的长边，0 表示不限制
+    def __stream_max_width(self, device: Optional[Device]):
+        if not device_stream_follow_tile:
+            return 0
+        aspect = device.aspect() if device is not None else None
+        if aspect is None:
+            aspect = device_stream_default_aspect
+        return int(math.ceil(self.device_max_size * aspect / 8) * 8)
+
+    def set_decoder_profile(self, device: Device, decoder_profile, decoder_threads=None):
+        device.set_decoder_profile(decoder_profile, decoder_threads)
+
     def update_ratio(self, device: Device, device_max_size):
+        self.device_max_size = device_max_size
         device.update_ratio(device_max_size)
 
+        # 估算的宽高比偏小导致画面不够大时重新投屏
+        max_width = self.__stream_max_width(device)
+        if 0 < device.client.max_width < max_width:
+            device.restart_frame(max_width)
+
     def update_ratios(self, device_max_size):
+        self.device_max_size = device_max_size
         for d in self.devices:
             d.update_ratio(device_max_size)
+            # 只重启分辨率需要改变的设备
+            max_width = self.__stream_max_width(d)
+            if d.online and max_width != d.client.max_width:
+                d.restart_frame(max_width)
 
     def refresh_device_screen_on(self):
         for d in self.devices:
@@ -277,9 +673,46 @@ class DeviceManager:
             else:
                 device.stop_frame()
 
+    def record_all(self, enabled):
+        # 所有在线设备开始/停止录制
+        for d in self.devices:
+            if enabled and d.online:
+                d.start_recording()
+            elif not enabled:
+                d.stop_recording()
+
+    def snapshot_all(
+        self,
+        directory=device_snapshot_dir,
+        fmt=device_snapshot_format,
+        quality=device_snapshot_quality,
+        full_resolution=device_snapshot_full_resolution,
+        sheet=device_snapshot_sheet,
+    ):
+        # 从解码器中的最新画面截图，不经过 adb screencap，返回每台设备的文件和时间戳
+        return snapshot_devices(
+            self.get_devices_info(), directory, fmt, quality, full_resolution, sheet
+        )
+
+    def publish_all(self, enabled):
+        # 开启/关闭所有设备的共享内存发布，读取方用 scrcpy.FrameRing.attach_device(serial)
+        self.publish = enabled
+        for d in self.devices_map.values():
+            d.set_publish(enabled)
+
     def stop(self):
+        if self.bitrate_controller is not None:
+            self.bitrate_controller.stop()
         for device in self.devices:
+            device.stop_recording()
             device.stop_frame()
+            device.set_publish(False)
+        if self.reactor is not None:
+            self.reactor.stop()
+        if self.pool is not None:
+            self.pool.stop()
+        if self.relay is not None:
+            self.relay.stop()
 
     def get_devices_info(self):
         devices = [device for device in self.devices_map.values()]
@@ -0,0 +1,130 @@
+"""
+事件总线：设备、监控和控制线程产生的事件统一转到一个线程处理。
+界面版使用 Qt 信号(view/cc_frame.py)，无界面版使用这里的纯 Python 事件循环，
+model 通过 create_event / create_frame 创建事件，不直接导入 PySide6
+"""
+
+import queue
+import threading
+import traceback
+from threading import Lock
+
+
+class EventLoop:
+    """
+    在 run 所在线程依次执行投递的回调，相当于 Qt 的 UI 线程
+    """
+
+    def __init__(self) -> None:
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+
+    def call(self, fn, *args):
+        self.queue.put((fn, args))
+
+    def run(self):
+        self.thread = threading.current_thread()
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            fn, args = item
+            try:
+                fn(*args)
+            except Exception:
+                traceback.print_exc()
+
+    def run_in_thread(self):
+        thread = threading.Thread(target=self.run, name="event_loop", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.queue.put(None)
+
+
+default_loop = EventLoop()
+
+
+class CustomEvent:
+    """
+    与 view.cc_frame.CustomEvent 接口相同，post 的数据在事件循环线程中交给 slot
+    """
+
+    def __init__(self, loop: EventLoop = None) -> None:
+        self.loop = loop or default_loop
+        self.slots = []
+
+    def set_connect(self, slot):
+        self.slots.append(slot)
+
+    def post(self, data):
+        for slot in self.slots:
+            self.loop.call(slot, data)
+
+
+class Frame:
+    """
+    与 view.cc_frame.Frame 接口相同的单帧信箱，事件循环中最多排队一次取帧
+    """
+
+    def __init__(self, loop: EventLoop = None) -> None:
+        self.loop = loop or default_loop
+        self.lock = Lock()
+        self.latest = None
+        self.pending = False
+        self.dropped = 0
+        self.slot = None
+
+    def set_connect(self, slot):
+        self.slot = slot
+
+    def post(self, frame):
+        with self.lock:
+            if self.pending:
+                self.dropped += 1
+            self.latest = frame
+            notify = not self.pending
+            self.pending = True
+
+        if notify:
+            self.loop.call(self.__on_frame_signal)
+
+    def take(self):
+        with self.lock:
+            frame = self.latest
+            self.latest = None
+            self.pending = False
+        return frame
+
+    def __on_frame_signal(self):
+        frame = self.take()
+        if frame is not None and self.slot is not None:
+            self.slot(frame)
+
+
+# 当前使用的实现，默认纯 Python，界面版启动时调用 use_qt
+_event_class = CustomEvent
+_frame_class = Frame
+
+
+def set_backend(event_class, frame_class):
+    global _event_class, _frame_class
+    _event_class = event_class
+    _frame_class = frame_class
+
+
+def use_qt():
+    # 延迟导入，无界面版不加载 PySide6
+    from view.cc_frame import CustomEvent as QtCustomEvent
+    from view.cc_frame import Frame as QtFrame
+
+    set_backend(QtCustomEvent, QtFrame)
+
+
+def create_event():
+    return _event_class()
+
+
+def create_frame():
+    return _frame_class()
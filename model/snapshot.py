@@ -0,0 +1,165 @@
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import cv2
+import numpy as np
+
+# 截图格式: 扩展名, OpenCV 质量参数
+_FORMATS = {
+    "png": (".png", cv2.IMWRITE_PNG_COMPRESSION),
+    "jpg": (".jpg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY),
+}
+
+
+def encode_params(fmt, quality):
+    # png 的 quality 按压缩级别理解，0-100 映射到 9-0，越高越快
+    ext, flag = _FORMATS[fmt]
+    if fmt == "png":
+        return ext, [flag, max(0, min(9, 9 - quality * 9 // 100))]
+    return ext, [flag, quality]
+
+
+def encode(image, fmt="jpg", quality=90):
+    # 编码为图片字节，cv2.imencode 期间释放 GIL，可在线程池中并行
+    ext, params = encode_params(fmt, quality)
+    ok, data = cv2.imencode(ext, image, params)
+    if not ok:
+        raise ValueError(f"encode {fmt} failed")
+    return data.tobytes()
+
+
+def contact_sheet(images, labels=None, cols=10, tile=320):
+    """
+    把所有截图拼成一张总览图，每张按长边 tile 等比缩放后居中放入相同大小的格子
+
+    Args:
+        images: bgr24 图片列表
+        labels: 每格左上角的文字
+        cols: 每行格子数
+        tile: 格子长边
+    """
+    count = len(images)
+    cols = max(1, min(cols, count))
+    rows = (count + cols - 1) // cols
+    # 格子按多数设备的竖屏比例
+    aspects = [img.shape[0] / img.shape[1] for img in images]
+    aspect = float(np.median(aspects)) if aspects else 2.0
+    if aspect >= 1:
+        cell_h, cell_w = tile, max(1, int(tile / aspect))
+    else:
+        cell_h, cell_w = max(1, int(tile * aspect)), tile
+
+    cells = np.zeros((rows * cols, cell_h, cell_w, 3), np.uint8)
+    for i, img in enumerate(images):
+        h, w = img.shape[:2]
+        scale = min(cell_h / h, cell_w / w)
+        sh, sw = max(1, int(h * scale)), max(1, int(w * scale))
+        y, x = (cell_h - sh) // 2, (cell_w - sw) // 2
+        cells[i, y : y + sh, x : x + sw] = cv2.resize(img, (sw, sh), interpolation=cv2.INTER_AREA)
+        if labels is not None:
+            cv2.putText(cells[i], labels[i], (4, 14), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 0), 1)
+
+    # (rows, cols, h, w, 3) -> (rows * h, cols * w, 3)，一次 reshape 完成拼接
+    return (
+        cells.reshape(rows, cols, cell_h, cell_w, 3)
+        .transpose(0, 2, 1, 3, 4)
+        .reshape(rows * cell_h, cols * cell_w, 3)
+    )
+
+
+def _thumbnail(image, tile):
+    # 总览图只需要小图，在线程中先缩小，避免同时持有所有原图
+    h, w = image.shape[:2]
+    scale = tile / max(h, w)
+    if scale >= 1:
+        return image
+    size = (max(1, int(w * scale)), max(1, int(h * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def _file_name(serial, at):
+    serial = re.sub(r"[^\w.-]", "_", serial)
+    stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(at))
+    return f"{serial}_{stamp}_{int(at * 1000) % 1000:03d}"
+
+
+def snapshot_devices(
+    devices,
+    directory,
+    fmt="jpg",
+    quality=90,
+    full_resolution=True,
+    sheet=True,
+    sheet_tile=320,
+    workers: Optional[int] = None,
+):
+    """
+    截取所有设备当前画面，转换和编码在线程池中并行，每张图带设备和主机时间戳
+
+    Args:
+        devices: Device 列表
+        directory: 输出目录，每次截图一个子目录
+        fmt: png / jpg / webp
+        quality: 0-100
+        full_resolution: 按设备分辨率截图，否则使用投屏显示尺寸的画面
+        sheet: 额外生成总览图 sheet
+        sheet_tile: 总览图中每格的长边
+        workers: 线程数，默认 CPU 数
+
+    Returns:
+        每台设备的信息列表，与 index.json 相同
+    """
+    assert fmt in _FORMATS, f"format must be one of {list(_FORMATS)}"
+    start = time.time()
+    out_dir = os.path.join(directory, time.strftime("%Y%m%d_%H%M%S", time.localtime(start)))
+    os.makedirs(out_dir, exist_ok=True)
+    ext, _ = encode_params(fmt, quality)
+
+    def take(device):
+        # 画面和它的 pts、时间一起取出，不会对应到其他帧
+        shot = device.client.timed_snapshot(full_resolution)
+        if shot is None:
+            return None
+        image, pts, at = shot
+        name = _file_name(device.serial, at) + ext
+        with open(os.path.join(out_dir, name), "wb") as f:
+            f.write(encode(image, fmt, quality))
+        info = dict(
+            serial=device.serial,
+            name=device.name,
+            index=device.index,
+            file=name,
+            time=at,
+            pts=pts,
+            resolution=[int(image.shape[1]), int(image.shape[0])],
+        )
+        return info, _thumbnail(image, sheet_tile) if sheet else None
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        results = [r for r in pool.map(take, devices) if r is not None]
+
+    infos = [info for info, _ in results]
+    if sheet and results:
+        labels = [
+            f"{info['index'] + 1:02d} {time.strftime('%H:%M:%S', time.localtime(info['time']))}."
+            f"{int(info['time'] * 1000) % 1000:03d}"
+            for info in infos
+        ]
+        image = contact_sheet([img for _, img in results], labels, tile=sheet_tile)
+        with open(os.path.join(out_dir, "sheet" + ext), "wb") as f:
+            f.write(encode(image, fmt, quality))
+
+    with open(os.path.join(out_dir, "index.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            dict(time=start, elapsed=time.time() - start, devices=infos),
+            f,
+            ensure_ascii=False,
+            indent=2,
+        )
+    print(f"snapshot {len(infos)} devices to {out_dir} in {(time.time() - start) * 1000:.0f}ms")
+    return infos
@@ -2,5 +2,12 @@
 Python Scrcpy Client's core module
 """
 
+from .capture import CaptureReader, CaptureWriter
 from .const import *
 from .core import Client
+from .pool import ProcessPool, RemoteClient
+from .reactor import Reactor
+from .recorder import Recorder
+from .relay import Relay
+from .shm import FrameRing, ring_name
+from .stats import LatencyStats
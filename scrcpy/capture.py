@@ -0,0 +1,183 @@
+"""
+Capture the raw video socket byte stream of a client and replay it without a device.
+
+File layout: magic line, one JSON header line (device name, resolution and the stream
+settings the bytes depend on), then chunks of arrival time (double, s since the first
+chunk), size (uint32) and the bytes as read from the socket
+"""
+
+import json
+import socket
+import struct
+import threading
+from time import perf_counter, sleep
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+
+MAGIC = b"CCSCRCPY-CAPTURE 1\n"
+_CHUNK = struct.Struct(">dI")
+
+
+class CaptureWriter:
+    def __init__(self, path: str, header: Dict[str, Any]):
+        """
+        Create a capture file
+
+        Args:
+            path: output file
+            header: device_name, resolution, server_version, video_codec, frame_meta
+        """
+        self.path = path
+        self.header = header
+        self.__file: Optional[BinaryIO] = open(path, "wb")
+        self.__file.write(MAGIC)
+        self.__file.write(json.dumps(header).encode("utf-8") + b"\n")
+        self.__start: Optional[float] = None
+        self.__lock = threading.Lock()
+
+    def write(self, data: Any, received_at: Optional[float] = None) -> None:
+        """
+        Append one socket read
+
+        Args:
+            data: bytes or memoryview read from the video socket
+            received_at: perf_counter of the read, default is now
+        """
+        if received_at is None:
+            received_at = perf_counter()
+        with self.__lock:
+            if self.__file is None:
+                return
+            if self.__start is None:
+                self.__start = received_at
+            self.__file.write(_CHUNK.pack(received_at - self.__start, len(data)))
+            self.__file.write(data)
+
+    def close(self) -> None:
+        with self.__lock:
+            if self.__file is not None:
+                self.__file.close()
+                self.__file = None
+
+
+class CaptureReader:
+    def __init__(self, path: str):
+        """
+        Open a capture file, chunks are read lazily by iterating the reader
+
+        Args:
+            path: capture file
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            if f.readline() != MAGIC:
+                raise ValueError(f"{path} is not a capture file")
+            self.header: Dict[str, Any] = json.loads(f.readline())
+            self.__offset = f.tell()
+        # Set by load, replays then don't touch the disk
+        self.chunks: Optional[list] = None
+
+    @property
+    def device_name(self) -> str:
+        return self.header["device_name"]
+
+    @property
+    def resolution(self) -> Tuple[int, int]:
+        return tuple(self.header["resolution"])
+
+    def __iter__(self) -> Iterator[Tuple[float, bytes]]:
+        """
+        Yield (seconds since the first chunk, bytes)
+        """
+        with open(self.path, "rb") as f:
+            f.seek(self.__offset)
+            while True:
+                head = f.read(_CHUNK.size)
+                if len(head) < _CHUNK.size:
+                    return
+                at, size = _CHUNK.unpack(head)
+                data = f.read(size)
+                if len(data) < size:
+                    return
+                yield at, data
+
+    def load(self) -> list:
+        """
+        Keep all chunks in memory, shared by every replay of this reader
+        """
+        if self.chunks is None:
+            self.chunks = list(self)
+        return self.chunks
+
+
+class ReplaySource:
+    def __init__(
+        self,
+        reader: CaptureReader,
+        speed: float = 1.0,
+        loop: bool = False,
+    ):
+        """
+        Feed a capture into one end of a socket pair, the client reads the other end
+        like a video socket
+
+        Args:
+            reader: capture to replay
+            speed: 1 is the recorded speed, 0 is as fast as the client reads
+            loop: start over at the end instead of closing the socket
+        """
+        assert speed >= 0, "speed must be greater than or equal to 0"
+        self.reader = reader
+        self.speed = speed
+        self.loop = loop
+        self.alive = False
+        self.__writer: Optional[socket.socket] = None
+        self.__thread: Optional[threading.Thread] = None
+
+    def open(self) -> socket.socket:
+        """
+        Start feeding
+
+        Returns:
+            non blocking socket to use as the video socket
+        """
+        assert self.alive is False
+        reader, self.__writer = socket.socketpair()
+        reader.setblocking(False)
+        self.alive = True
+        self.__thread = threading.Thread(
+            target=self.__feed, name="scrcpy_replay", daemon=True
+        )
+        self.__thread.start()
+        return reader
+
+    def stop(self) -> None:
+        self.alive = False
+        if self.__writer is not None:
+            try:
+                self.__writer.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self.__thread is not None and self.__thread is not threading.current_thread():
+            self.__thread.join()
+            self.__thread = None
+
+    def __feed(self) -> None:
+        writer = self.__writer
+        try:
+            while self.alive:
+                start = perf_counter()
+                chunks = self.reader.chunks if self.reader.chunks is not None else self.reader
+                for at, data in chunks:
+                    if not self.alive:
+                        return
+                    if self.speed > 0:
+                        delay = start + at / self.speed - perf_counter()
+                        if delay > 0:
+                            sleep(delay)
+                    writer.sendall(data)
+                if not self.loop:
+                    return
+        except OSError:
+            pass
+        finally:
+            writer.close()
@@ -298,6 +298,28 @@ KEYCODE_KEYCODE_THUMBS_DOWN = 287
 EVENT_INIT = "init"
 EVENT_FRAME = "frame"
 EVENT_DISCONNECT = "disconnect"
+EVENT_IDLE = "idle"
+# Access units before decoding, only sent when a listener is attached
+EVENT_PACKET = "packet"
+
+# Decode mode
+DECODE_MODE_FULL = "full"
+DECODE_MODE_NONREF = "nonref"
+DECODE_MODE_KEYFRAME = "keyframe"
+
+# Decoder profile
+DECODER_PROFILE_DEFAULT = "default"
+DECODER_PROFILE_LOW_LATENCY = "low_latency"
+DECODER_PROFILE_THROUGHPUT = "throughput"
+DECODER_PROFILE_THUMBNAIL = "thumbnail"
+
+# Video codec, h265 and av1 need a 2.x server
+VIDEO_CODEC_H264 = "h264"
+VIDEO_CODEC_H265 = "h265"
+VIDEO_CODEC_AV1 = "av1"
+
+# Server version of the bundled jar
+SERVER_VERSION_BUNDLED = "1.20"
 
 # Type
 TYPE_INJECT_KEYCODE = 0
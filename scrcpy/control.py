@@ -73,16 +73,13 @@ class ControlSender:
             touch_id: Default using virtual id -1, you can specify it to emulate multi finger touch
         """
         x, y = max(x, 0), max(y, 0)
-        return struct.pack(
-            ">BqiiHHHi",
+        return self.parent.protocol.touch(
             action,
             touch_id,
             int(x),
             int(y),
             int(self.parent.resolution[0]),
             int(self.parent.resolution[1]),
-            0xFFFF,
-            1,
         )
 
     @inject(const.TYPE_INJECT_SCROLL_EVENT)
@@ -98,8 +95,7 @@ class ControlSender:
         """
 
         x, y = max(x, 0), max(y, 0)
-        return struct.pack(
-            ">iiHHii",
+        return self.parent.protocol.scroll(
             int(x),
             int(y),
             int(self.parent.resolution[0]),
@@ -157,7 +153,9 @@ class ControlSender:
             s.setblocking(True)
 
             # Read package
-            package = struct.pack(">B", const.TYPE_GET_CLIPBOARD)
+            package = struct.pack(
+                ">B", const.TYPE_GET_CLIPBOARD
+            ) + self.parent.protocol.get_clipboard()
             s.send(package)
             (code,) = struct.unpack(">B", s.recv(1))
             assert code == 0
@@ -174,8 +172,7 @@ class ControlSender:
             text: the string you want to set
             paste: paste now
         """
-        buffer = text.encode("utf-8")
-        return struct.pack(">?i", paste, len(buffer)) + buffer
+        return self.parent.protocol.set_clipboard(text, paste)
 
     @inject(const.TYPE_SET_SCREEN_POWER_MODE)
     def set_screen_power_mode(self, mode: int = scrcpy.POWER_MODE_NORMAL) -> bytes:
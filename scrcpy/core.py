@@ -1,24 +1,134 @@
+import hashlib
+import logging
 import os
+import selectors
 import socket
 import struct
 import threading
-import time
-from time import sleep
-from typing import Any, Callable, Optional, Tuple, Union
+import zlib
+from fractions import Fraction
+from time import perf_counter, sleep, time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple, Union
 
 import cv2
 import numpy as np
 from adbutils import AdbConnection, AdbDevice, AdbError, Network, adb
+from av import Packet
 from av.codec import CodecContext
 from av.error import InvalidDataError
+from av.video.reformatter import VideoReformatter
 
 from .const import (
+    DECODE_MODE_FULL,
+    DECODE_MODE_KEYFRAME,
+    DECODE_MODE_NONREF,
+    DECODER_PROFILE_DEFAULT,
+    DECODER_PROFILE_LOW_LATENCY,
+    DECODER_PROFILE_THROUGHPUT,
+    DECODER_PROFILE_THUMBNAIL,
     EVENT_DISCONNECT,
     EVENT_FRAME,
+    EVENT_IDLE,
     EVENT_INIT,
+    EVENT_PACKET,
     LOCK_SCREEN_ORIENTATION_UNLOCKED,
+    SERVER_VERSION_BUNDLED,
+    VIDEO_CODEC_AV1,
+    VIDEO_CODEC_H264,
+    VIDEO_CODEC_H265,
 )
+from .capture import CaptureReader, CaptureWriter, ReplaySource
 from .control import ControlSender
+from .nalu import config_units, is_keyframe
+from .protocol import ServerProtocol, get_protocol
+from .stats import (
+    STAGE_CONVERT,
+    STAGE_DECODE,
+    STAGE_DISPATCH,
+    STAGE_PARSE,
+    STAGE_RECV,
+    LatencyStats,
+)
+from .tunnel import (
+    PendingTunnel,
+    ReverseTunnelAcceptor,
+    adb_reverse,
+    adb_reverse_remove,
+    default_acceptor,
+)
+
+if TYPE_CHECKING:
+    from .reactor import Reactor
+
+# Server jar on the device, pushed only when its md5 differs from the local one
+_SERVER_JAR_NAME = "scrcpy-server.jar"
+_SERVER_JAR_REMOTE = f"/data/local/tmp/{_SERVER_JAR_NAME}"
+# local jar path: md5
+_server_jar_md5: Dict[str, str] = {}
+# serial: md5 of the jar known to be on the device
+_deployed_servers: Dict[str, str] = {}
+_deployed_servers_lock = threading.Lock()
+
+# Device side socket name of the 1.20 server
+_SOCKET_NAME = "scrcpy"
+
+# Connect retry backoff, unit is s
+_CONNECT_INITIAL_DELAY = 0.005
+_CONNECT_MAX_DELAY = 0.2
+
+_logger = logging.getLogger(__name__)
+
+# Video socket read chunk, adapted to the stream bitrate
+_RECV_MIN_SIZE = 0x4000
+_RECV_INITIAL_SIZE = 0x10000
+_RECV_MAX_SIZE = 0x100000
+
+# How fast the no lag offset may rise, unit is s per s, absorbs the drift between
+# the device and host clocks while a real lag still shows up
+_LAG_BASE_DRIFT = 0.001
+
+# Frame meta header: pts (int64, config packets are flagged by the protocol) and packet size (uint32)
+_FRAME_META = struct.Struct(">qI")
+_PTS_TIME_BASE = Fraction(1, 1000000)
+
+# Unchanged frame detection: every 4th row and column of the luma plane is checksummed,
+# a frame is still sent after 1s of skipping so a change missed by the sampling doesn't stick
+_SKIP_SAMPLE_STEP = 4
+_SKIP_MAX_INTERVAL = 1.0
+
+# libavcodec parser and decoders (first available) of each video codec
+_PARSER_NAMES = {
+    VIDEO_CODEC_H264: "h264",
+    VIDEO_CODEC_H265: "hevc",
+    VIDEO_CODEC_AV1: "av1",
+}
+_DECODER_NAMES = {
+    VIDEO_CODEC_H264: ("h264",),
+    VIDEO_CODEC_H265: ("hevc",),
+    VIDEO_CODEC_AV1: ("libdav1d", "libaom-av1", "av1"),
+}
+
+# libavcodec AVDiscard used by each decode mode
+_SKIP_FRAME = {
+    DECODE_MODE_FULL: "DEFAULT",
+    DECODE_MODE_NONREF: "NONREF",
+    DECODE_MODE_KEYFRAME: "NONKEY",
+}
+
+# libavcodec options used by each decoder profile, threads is filled from decoder_threads
+_DECODER_PROFILES = {
+    DECODER_PROFILE_DEFAULT: {},
+    # No frame threading and no reordering delay, one packet in, one frame out
+    DECODER_PROFILE_LOW_LATENCY: {"flags": "+low_delay", "threads": "1"},
+    DECODER_PROFILE_THROUGHPUT: {"thread_type": "frame+slice", "threads": None},
+    # Throughput plus no deblocking, artifacts are invisible on small tiles
+    DECODER_PROFILE_THUMBNAIL: {
+        "thread_type": "frame+slice",
+        "threads": None,
+        "skip_loop_filter": "all",
+        "flags2": "+fast",
+    },
+}
 
 
 class Client:
@@ -34,6 +144,24 @@ class Client:
         lock_screen_orientation: int = LOCK_SCREEN_ORIENTATION_UNLOCKED,
         connection_timeout: int = 3000,
         encoder_name: Optional[str] = None,
+        idle_interval: float = 1.0,
+        output_scale: float = 1.0,
+        reuse_frame_buffer: bool = False,
+        decode_mode: str = DECODE_MODE_FULL,
+        codec_options: Optional[str] = None,
+        decoder_profile: str = DECODER_PROFILE_DEFAULT,
+        decoder_threads: int = 0,
+        frame_meta: bool = False,
+        tunnel_forward: bool = True,
+        tunnel_acceptor: Optional[ReverseTunnelAcceptor] = None,
+        server_version: str = SERVER_VERSION_BUNDLED,
+        server_jar: Optional[str] = None,
+        video_codec: str = VIDEO_CODEC_H264,
+        capture: Optional[str] = None,
+        replay: Optional[Union[str, CaptureReader]] = None,
+        replay_speed: float = 1.0,
+        replay_loop: bool = False,
+        skip_unchanged: bool = False,
     ):
         """
         Create a scrcpy client, this client won't be started until you call the start function
@@ -49,6 +177,30 @@ class Client:
             lock_screen_orientation: lock screen orientation, LOCK_SCREEN_ORIENTATION_*
             connection_timeout: timeout for connection, unit is ms
             encoder_name: encoder name, enum: [OMX.google.h264.encoder, OMX.qcom.video.encoder.avc, c2.qti.avc.encoder, c2.android.avc.encoder], default is None (Auto)
+            idle_interval: seconds without video data before an idle event is sent, unit is s
+            output_scale: scale of the bgr24 frames sent to listeners, converted and resized in one pass
+            reuse_frame_buffer: write every frame into the same ndarray, listeners must copy it if they keep it
+            decode_mode: DECODE_MODE_FULL, DECODE_MODE_NONREF skips non reference frames,
+                DECODE_MODE_KEYFRAME only decodes key frames
+            codec_options: android MediaFormat options, e.g. "i-frame-interval=2", default is None
+            decoder_profile: DECODER_PROFILE_*, libavcodec options for latency or throughput
+            decoder_threads: decode threads of the throughput profiles, 0 means auto
+            frame_meta: ask the server for packet headers, packets are decoded without the h264 parser
+                and last_frame_pts carries the device timestamp
+            tunnel_forward: connect to the server through adb forward, False makes the server
+                connect back through adb reverse, which skips the connect retries,
+                falls back to forward mode when adb reverse fails
+            tunnel_acceptor: host listener of reverse mode, default is one shared by all clients
+            server_version: version of the server jar, 1.20 or 2.4 to 2.7, selects the protocol
+            server_jar: local path of the server jar, default is the bundled 1.20 jar
+            video_codec: VIDEO_CODEC_*, h265 and av1 need a 2.x server
+            capture: write the video socket bytes with arrival times to this file, overwritten on every start
+            replay: capture file or reader to play instead of a device, no adb is used and
+                the stream settings come from the capture
+            replay_speed: 1 is the recorded speed, 0 is as fast as the client reads
+            replay_loop: start the replay over at its end instead of disconnecting
+            skip_unchanged: don't convert or send frames whose sampled luma matches the previous frame,
+                a static screen then costs only decoding
         """
         # Check Params
         assert max_width >= 0, "max_width must be greater than or equal to 0"
@@ -60,7 +212,21 @@ class Client:
         assert (
             connection_timeout >= 0
         ), "connection_timeout must be greater than or equal to 0"
-        assert encoder_name in [
+        assert idle_interval > 0, "idle_interval must be greater than 0"
+        assert 0 < output_scale <= 1, "output_scale must be in (0, 1]"
+        assert decode_mode in _SKIP_FRAME, "decode_mode must be DECODE_MODE_*"
+        assert (
+            decoder_profile in _DECODER_PROFILES
+        ), "decoder_profile must be DECODER_PROFILE_*"
+        assert decoder_threads >= 0, "decoder_threads must be greater than or equal to 0"
+        protocol = get_protocol(server_version)
+        assert (
+            video_codec in protocol.video_codecs
+        ), f"video_codec must be one of {protocol.video_codecs} with server {server_version}"
+        assert server_jar is not None or server_version == SERVER_VERSION_BUNDLED, (
+            "server_jar is required for a server other than the bundled one"
+        )
+        assert video_codec != VIDEO_CODEC_H264 or encoder_name in [
             None,
             "OMX.google.h264.encoder",
             "OMX.qcom.video.encoder.avc",
@@ -78,18 +244,63 @@ class Client:
         self.lock_screen_orientation = lock_screen_orientation
         self.connection_timeout = connection_timeout
         self.encoder_name = encoder_name
+        self.idle_interval = idle_interval
+        self.output_scale = output_scale
+        self.reuse_frame_buffer = reuse_frame_buffer
+        self.decode_mode = decode_mode
+        self.codec_options = codec_options
+        self.decoder_profile = decoder_profile
+        self.decoder_threads = decoder_threads
+        self.frame_meta = frame_meta
+        self.tunnel_forward = tunnel_forward
+        self.tunnel_acceptor = tunnel_acceptor
+        self.server_version = server_version
+        self.server_jar = server_jar
+        self.video_codec = video_codec
+        self.protocol: ServerProtocol = protocol
+        self.capture = capture
+        self.replay_speed = replay_speed
+        self.replay_loop = replay_loop
+        self.skip_unchanged = skip_unchanged
+
+        self.replay: Optional[CaptureReader] = None
+        if replay is not None:
+            self.replay = replay if isinstance(replay, CaptureReader) else CaptureReader(replay)
+            header = self.replay.header
+            self.frame_meta = header["frame_meta"]
+            self.video_codec = header["video_codec"]
+            self.server_version = header["server_version"]
+            self.protocol = get_protocol(self.server_version)
 
         # Connect to device
-        if device is None:
+        if self.replay is not None:
+            pass
+        elif device is None:
             device = adb.device_list()[0]
         elif isinstance(device, str):
             device = adb.device(serial=device)
 
         self.device = device
-        self.listeners = dict(frame=[], init=[], disconnect=[])
+        self.listeners = dict(frame=[], init=[], disconnect=[], idle=[], packet=[])
 
         # User accessible
         self.last_frame: Optional[np.ndarray] = None
+        # Device timestamp of last_frame in us, available with frame_meta
+        self.last_frame_pts: Optional[int] = None
+        # Host wall clock (time.time) when last_frame was decoded, aligns snapshots of several devices
+        self.last_frame_time: Optional[float] = None
+        # Pipeline latency, None until enable_latency_stats is called
+        self.latency_stats: Optional[LatencyStats] = None
+        # perf_counter when the bytes of last_frame were read, available with latency_stats
+        self.received_at: Optional[float] = None
+        self.last_frame_received_at: Optional[float] = None
+        # Last parameter sets (SPS/PPS) of the stream, needed to start a recording on a later key frame
+        self.codec_config: Optional[bytes] = None
+        # Decoded frames, and those of them not sent because the picture didn't change
+        self.frames_decoded = 0
+        self.frames_skipped = 0
+        # Bytes read from the video socket since start, for bitrate control
+        self.bytes_received = 0
         self.resolution: Optional[Tuple[int, int]] = None
         self.device_name: Optional[str] = None
         self.control = ControlSender(self)
@@ -100,98 +311,342 @@ class Client:
         self.__video_socket: Optional[socket.socket] = None
         self.control_socket: Optional[socket.socket] = None
         self.control_socket_lock = threading.Lock()
+        self.__tunnel: Optional[PendingTunnel] = None
+        self.__capture: Optional[CaptureWriter] = None
+        self.__replay_source: Optional[ReplaySource] = None
+
+        # Duration of each start phase of the last start, unit is s:
+        # push, launch, ready (server log seen), connect, handshake, total
+        self.timings: Dict[str, float] = {}
+        # Shell output of the server while connecting
+        self.server_output = ""
+
+        # Created here so _parse_video also works on a client that is not started
+        self.__parser: CodecContext = self.__create_parser()
+        self.__decoder: Optional[CodecContext] = None
+        self.__frame_buffer: Optional[np.ndarray] = None
+        self.__recv_buffer = bytearray(_RECV_INITIAL_SIZE)
+        self.__recv_view = memoryview(self.__recv_buffer)
+        self.__recv_size = _RECV_INITIAL_SIZE
+        self.__recv_average = 0.0
+        self.__meta_pending = bytearray()
+        self.__meta_config: Optional[bytes] = None
+        self.__applied_decode_mode = DECODE_MODE_FULL
+        self.__applied_decoder_profile = decoder_profile
+        self.__lag_base: Optional[float] = None
+        self.__lag_pts = 0.0
+        self.__lag_updated_at = 0.0
+        self.__frame_signature: Optional[tuple] = None
+        # (frame, pts, time) of the last decoded frame before conversion and of the last frame sent,
+        # replaced as a whole so snapshots never pair pixels with the time of another frame
+        self.__last_decoded: Optional[tuple] = None
+        self.__last_sent: Optional[tuple] = None
+        self.__frame_sent_at = 0.0
 
         # Available if start with threaded or daemon_threaded
         self.stream_loop_thread = None
+        # Available if start with reactor
+        self.reactor: Optional["Reactor"] = None
 
     def __init_server_connection(self) -> None:
         """
         Connect to android server, there will be two sockets, video and control socket.
         This method will set: video_socket, control_socket, resolution variables
         """
-        for _ in range(self.connection_timeout // 100):
+        if not self.tunnel_forward:
+            self.__accept_server_connection()
+            return
+
+        start = perf_counter()
+        deadline = start + self.connection_timeout / 1000
+        delay = _CONNECT_INITIAL_DELAY
+        ready = False
+        while True:
+            attempt = perf_counter()
+            if not ready:
+                # Wait for the server log instead of sleeping, retry on timeout as a fallback
+                ready = self.__wait_server_ready(min(delay, deadline - perf_counter()))
+                if ready:
+                    self.timings["ready"] = perf_counter() - start
             try:
                 self.__video_socket = self.device.create_connection(
-                    Network.LOCAL_ABSTRACT, "scrcpy"
+                    Network.LOCAL_ABSTRACT, _SOCKET_NAME
                 )
                 break
             except AdbError:
-                sleep(0.1)
-                pass
-        else:
-            raise ConnectionError("Failed to connect scrcpy-server after 3 seconds")
+                remaining = deadline - perf_counter()
+                if remaining <= 0:
+                    raise ConnectionError(
+                        f"Failed to connect scrcpy-server after {self.connection_timeout} ms"
+                    )
+                # The readiness wait may have spent the delay already, it returns at once
+                # when the shell stream can't be watched, sleep whatever is left of it
+                blocked = 0 if ready else perf_counter() - attempt
+                if delay > blocked:
+                    sleep(min(delay - blocked, remaining))
+                delay = min(delay * 2, _CONNECT_MAX_DELAY)
+        self.timings["connect"] = perf_counter() - start
 
+        start = perf_counter()
         dummy_byte = self.__video_socket.recv(1)
         if not len(dummy_byte) or dummy_byte != b"\x00":
             raise ConnectionError("Did not receive Dummy Byte!")
 
         self.control_socket = self.device.create_connection(
-            Network.LOCAL_ABSTRACT, "scrcpy"
+            Network.LOCAL_ABSTRACT, _SOCKET_NAME
+        )
+        self.device_name, self.resolution = self.protocol.read_device_meta(
+            self.__video_socket
         )
-        self.device_name = self.__video_socket.recv(64).decode("utf-8").rstrip("\x00")
-        if not len(self.device_name):
-            raise ConnectionError("Did not receive Device Name!")
+        self.__video_socket.setblocking(False)
+        self.timings["handshake"] = perf_counter() - start
 
-        res = self.__video_socket.recv(4)
-        self.resolution = struct.unpack(">HH", res)
+    def __accept_server_connection(self) -> None:
+        """
+        Reverse mode: the server connects video then control to the host listener,
+        there is no dummy byte
+        """
+        start = perf_counter()
+        tunnel, self.__tunnel = self.__tunnel, None
+        try:
+            self.__video_socket, self.control_socket = tunnel.wait(
+                self.connection_timeout / 1000
+            )
+        finally:
+            self.__close_tunnel(tunnel)
+        self.timings["connect"] = perf_counter() - start
+
+        start = perf_counter()
+        self.device_name, self.resolution = self.protocol.read_device_meta(
+            self.__video_socket
+        )
         self.__video_socket.setblocking(False)
+        self.timings["handshake"] = perf_counter() - start
+
+    def __close_tunnel(self, tunnel: Optional[PendingTunnel]) -> None:
+        """
+        Free the host port and the device side socket name, the next server may use forward mode
+
+        Args:
+            tunnel: tunnel opened by __deploy_server
+        """
+        if tunnel is None:
+            return
+        tunnel_acceptor = self.tunnel_acceptor or default_acceptor()
+        tunnel_acceptor.close(tunnel)
+        try:
+            adb_reverse_remove(self.device, f"localabstract:{_SOCKET_NAME}")
+        except (AdbError, OSError):
+            pass
+
+    def __wait_server_ready(self, timeout: float) -> bool:
+        """
+        Read the server shell output until it logs the device line, which is printed
+        right before the server socket starts listening
+
+        Args:
+            timeout: max seconds to wait for output
+
+        Returns:
+            True if the server reported it is ready
+        """
+        conn = getattr(self.__server_stream, "conn", None)
+        if conn is None:
+            return False
+        deadline = perf_counter() + max(timeout, 0)
+        with selectors.DefaultSelector() as selector:
+            selector.register(conn, selectors.EVENT_READ)
+            while True:
+                remaining = deadline - perf_counter()
+                if remaining <= 0 or not selector.select(remaining):
+                    return False
+                data = conn.recv(4096)
+                if data == b"":
+                    raise ConnectionError(
+                        f"scrcpy-server exited: {self.server_output.strip()}"
+                    )
+                self.server_output += data.decode("utf-8", errors="replace")
+                if (
+                    "ERROR" in self.server_output
+                    or "Exception in thread" in self.server_output
+                ):
+                    raise ConnectionError(
+                        f"scrcpy-server failed: {self.server_output.strip()}"
+                    )
+                if "Device:" in self.server_output:
+                    return True
 
     def __deploy_server(self) -> None:
         """
         Deploy server to android device
         """
-        jar_name = "scrcpy-server.jar"
-        server_file_path = os.path.join(
-            os.path.abspath(os.path.dirname(__file__)), jar_name
+        server_file_path = self.server_jar or os.path.join(
+            os.path.abspath(os.path.dirname(__file__)), _SERVER_JAR_NAME
         )
-        self.device.sync.push(server_file_path, f"/data/local/tmp/{jar_name}")
+        start = perf_counter()
+        if not self.__server_deployed(server_file_path):
+            self.device.sync.push(server_file_path, _SERVER_JAR_REMOTE)
+            with _deployed_servers_lock:
+                _deployed_servers[self.device.serial] = _local_md5(server_file_path)
+        self.timings["push"] = perf_counter() - start
+
+        start = perf_counter()
+        if not self.tunnel_forward:
+            # Listen before the server starts, it connects once and does not retry
+            tunnel_acceptor = self.tunnel_acceptor or default_acceptor()
+            self.__tunnel = tunnel_acceptor.open(self.device.serial)
+            try:
+                adb_reverse(
+                    self.device,
+                    f"localabstract:{_SOCKET_NAME}",
+                    f"tcp:{self.__tunnel.port}",
+                )
+            except AdbError as e:
+                # Like scrcpy, fall back to forward mode when adb reverse is not available
+                _logger.warning(
+                    "adb reverse failed on %s, falling back to adb forward: %s",
+                    self.device.serial,
+                    e,
+                )
+                tunnel, self.__tunnel = self.__tunnel, None
+                self.__close_tunnel(tunnel)
+                self.tunnel_forward = True
+
         commands = [
-            f"CLASSPATH=/data/local/tmp/{jar_name}",
+            f"CLASSPATH={_SERVER_JAR_REMOTE}",
             "app_process",
             "/",
             "com.genymobile.scrcpy.Server",
-            "1.20",  # Scrcpy server version
-            "info",  # Log level: info, verbose...
-            f"{self.max_width}",  # Max screen width (long side)
-            f"{self.bitrate}",  # Bitrate of video
-            f"{self.max_fps}",  # Max frame per second
-            f"{self.lock_screen_orientation}",  # Lock screen orientation: LOCK_SCREEN_ORIENTATION
-            "true",  # Tunnel forward
-            "-",  # Crop screen
-            "false",  # Send frame rate to client
-            "true",  # Control enabled
-            "0",  # Display id
-            "false",  # Show touches
-            "true" if self.stay_awake else "false",  # Stay awake
-            "-",  # Codec (video encoding) options
-            self.encoder_name or "-",  # Encoder name
-            "false",  # Power off screen after server closed
+            *self.protocol.server_args(self),
         ]
 
         self.__server_stream: AdbConnection = self.device.shell(
             commands,
             stream=True,
         )
+        self.server_output = ""
+        self.timings["launch"] = perf_counter() - start
 
-        # Wait for server to start
-        self.__server_stream.read(10)
+    def __server_deployed(self, server_file_path: str) -> bool:
+        """
+        Check the host side record first, then the md5 of the jar already on the device
 
-    def start(self, threaded: bool = False, daemon_threaded: bool = False) -> None:
+        Args:
+            server_file_path: local jar path
+        """
+        md5 = _local_md5(server_file_path)
+        serial = self.device.serial
+        with _deployed_servers_lock:
+            if _deployed_servers.get(serial) == md5:
+                return True
+
+        try:
+            output = self.device.shell(["md5sum", _SERVER_JAR_REMOTE])
+        except AdbError:
+            return False
+        if output.split()[:1] != [md5]:
+            return False
+        with _deployed_servers_lock:
+            _deployed_servers[serial] = md5
+        return True
+
+    def start(
+        self,
+        threaded: bool = False,
+        daemon_threaded: bool = False,
+        reactor: Optional["Reactor"] = None,
+    ) -> None:
         """
         Start listening video stream
 
         Args:
             threaded: Run stream loop in a different thread to avoid blocking
             daemon_threaded: Run stream loop in a daemon thread to avoid blocking
+            reactor: Hand the video socket to a shared reactor instead of running a stream loop,
+                returns as soon as the connection is established
         """
         assert self.alive is False
 
-        self.__deploy_server()
-        self.__init_server_connection()
+        self.timings = {}
+        start = perf_counter()
+        try:
+            if self.replay is not None:
+                self.__open_replay()
+            else:
+                self.__deploy_server()
+                self.__init_server_connection()
+        except Exception:
+            # The jar may have been removed from the device, push it next time
+            with _deployed_servers_lock:
+                _deployed_servers.pop(getattr(self.device, "serial", None), None)
+            tunnel, self.__tunnel = self.__tunnel, None
+            self.__close_tunnel(tunnel)
+            raise
+        self.timings["total"] = perf_counter() - start
+        self.__start_stream(threaded, daemon_threaded, reactor)
+
+    def start_on_socket(
+        self,
+        video_socket: socket.socket,
+        resolution: Tuple[int, int],
+        device_name: str = "",
+        threaded: bool = False,
+        daemon_threaded: bool = False,
+        reactor: Optional["Reactor"] = None,
+    ) -> None:
+        """
+        Start on a socket that already carries the video stream, no adb, server or handshake,
+        for benchmarks and tests writing the stream themselves
+
+        Args:
+            video_socket: stream source, the other end writes what the server would send
+            resolution: video resolution the server would report
+            device_name: device name the server would report
+            threaded: same as start
+            daemon_threaded: same as start
+            reactor: same as start
+        """
+        assert self.alive is False
+
+        self.timings = {}
+        video_socket.setblocking(False)
+        self.__video_socket = video_socket
+        self.resolution = resolution
+        self.device_name = device_name
+        self.__start_stream(threaded, daemon_threaded, reactor)
+
+    def __start_stream(
+        self, threaded: bool, daemon_threaded: bool, reactor: Optional["Reactor"]
+    ) -> None:
+        """
+        Reset the stream state once the video socket is connected, then read it
+        """
+        if self.capture is not None:
+            self.__capture = CaptureWriter(
+                self.capture,
+                dict(
+                    device_name=self.device_name,
+                    resolution=list(self.resolution),
+                    server_version=self.server_version,
+                    video_codec=self.video_codec,
+                    frame_meta=self.frame_meta,
+                ),
+            )
+        self.__parser = self.__create_parser()
+        self.__decoder = self.__create_decoder()
+        self.__meta_pending = bytearray()
+        self.__meta_config = None
+        self.__lag_base = None
+        self.__frame_signature = None
+        self.codec_config = None
+        self.bytes_received = 0
         self.alive = True
         self.__send_to_listeners(EVENT_INIT)
 
-        if threaded or daemon_threaded:
+        if reactor is not None:
+            self.reactor = reactor
+            reactor.register(self)
+        elif threaded or daemon_threaded:
             self.stream_loop_thread = threading.Thread(
                 target=self.__stream_loop, daemon=daemon_threaded
             )
@@ -199,11 +654,32 @@ class Client:
         else:
             self.__stream_loop()
 
+    def __open_replay(self) -> None:
+        """
+        Use a capture as the video socket, the handshake comes from its header
+        """
+        self.device_name = self.replay.device_name
+        self.resolution = self.replay.resolution
+        self.__replay_source = ReplaySource(self.replay, self.replay_speed, self.replay_loop)
+        self.__video_socket = self.__replay_source.open()
+
     def stop(self) -> None:
         """
         Stop listening (both threaded and blocked)
         """
         self.alive = False
+        if self.reactor is not None:
+            self.reactor.unregister(self)
+            self.reactor = None
+
+        if self.__replay_source is not None:
+            self.__replay_source.stop()
+            self.__replay_source = None
+
+        if self.__capture is not None:
+            self.__capture.close()
+            self.__capture = None
+
         if self.__server_stream is not None:
             try:
                 self.__server_stream.close()
@@ -217,6 +693,11 @@ class Client:
                 pass
 
         if self.__video_socket is not None:
+            try:
+                # Wake up the stream loop blocked on the selector
+                self.__video_socket.shutdown(socket.SHUT_RDWR)
+            except Exception:
+                pass
             try:
                 self.__video_socket.close()
             except Exception:
@@ -224,40 +705,456 @@ class Client:
 
     def __stream_loop(self) -> None:
         """
-        Core loop for video parsing
+        Core loop for video parsing, blocks on the video socket until data arrives
+        """
+        selector = selectors.DefaultSelector()
+        selector.register(self.__video_socket, selectors.EVENT_READ)
+        try:
+            while self.alive:
+                try:
+                    if not selector.select(self.idle_interval):
+                        self._on_idle()
+                        continue
+                    raw_h264 = self._recv_video()
+                    if raw_h264 is None:
+                        continue
+                    received_at = self.received_at
+                    for packet in self._parse_video(raw_h264):
+                        self._decode_video(packet, received_at)
+                except (ConnectionError, OSError, ValueError) as e:  # Socket Closed
+                    if self.alive:
+                        self._on_disconnect()
+                        raise e
+        finally:
+            selector.close()
+
+    @property
+    def stream_lag(self) -> float:
+        """
+        How far the stream is behind the device clock compared to the best seen so far, unit is s,
+        counted up to now so it keeps growing while no packet arrives, available with frame_meta
+        """
+        if self.__lag_base is None:
+            return 0.0
+        return max(0.0, perf_counter() - self.__lag_base - self.__lag_pts)
+
+    @property
+    def video_socket(self) -> Optional[socket.socket]:
+        """
+        Video socket, used by the reactor to wait for readiness
+        """
+        return self.__video_socket
+
+    def _recv_video(self) -> Optional[memoryview]:
+        """
+        Read available h264 bytes from the video socket into the reusable buffer,
+        the returned view is only valid until the next call
+
+        Returns:
+            raw h264 bytes, None if no data is ready yet
+        """
+        stats = self.latency_stats
+        if stats is not None:
+            start = perf_counter()
+        try:
+            size = self.__video_socket.recv_into(self.__recv_buffer, self.__recv_size)
+        except BlockingIOError:
+            return None
+        if size == 0:
+            raise ConnectionError("Video stream is disconnected")
+        self.bytes_received += size
+        if self.__capture is not None:
+            self.__capture.write(self.__recv_view[:size])
+        if stats is not None:
+            self.received_at = start
+            stats.record(STAGE_RECV, perf_counter() - start)
+        raw_h264 = self.__recv_view[:size]
+        self.__adapt_recv_size(size)
+        return raw_h264
+
+    def __adapt_recv_size(self, size: int) -> None:
+        """
+        Follow the observed bytes per read, a full buffer means the socket has
+        more pending data so the chunk grows, small reads let it shrink back
+
+        Args:
+            size: bytes returned by the last read
+        """
+        self.__recv_average += (size - self.__recv_average) / 8
+        if size == self.__recv_size:
+            target = self.__recv_size * 2
+        else:
+            target = 1 << int(2 * self.__recv_average).bit_length()
+        target = min(max(target, _RECV_MIN_SIZE), _RECV_MAX_SIZE)
+        if target > len(self.__recv_buffer):
+            self.__recv_buffer = bytearray(target)
+            self.__recv_view = memoryview(self.__recv_buffer)
+        self.__recv_size = target
+
+    def _parse_video(self, raw_h264: Union[bytes, memoryview]) -> list:
+        """
+        Split raw h264 bytes into complete access units
+
+        Args:
+            raw_h264: bytes read from the video socket
+        """
+        stats = self.latency_stats
+        if stats is not None:
+            start = perf_counter()
+        if self.frame_meta:
+            packets = self.__demux_frame_meta(raw_h264)
+        else:
+            try:
+                packets = self.__parser.parse(raw_h264)
+            except InvalidDataError:
+                packets = []
+            if self.codec_config is None and packets and self.video_codec != VIDEO_CODEC_AV1:
+                self.codec_config = config_units(bytes(packets[0]), self.video_codec) or None
+        if stats is not None:
+            stats.record(STAGE_PARSE, perf_counter() - start)
+        return packets
+
+    def __demux_frame_meta(self, raw_h264: Union[bytes, memoryview]) -> list:
+        """
+        Cut packets from the frame meta stream, each one is a 12 bytes header followed by the payload.
+        Config packets (SPS/PPS) are merged into the next packet like the scrcpy client does
+
+        Args:
+            raw_h264: bytes read from the video socket
+        """
+        if self.__meta_pending:
+            self.__meta_pending += raw_h264
+            data = memoryview(self.__meta_pending)
+        else:
+            data = memoryview(raw_h264)
+
+        packets = []
+        offset = 0
+        end = len(data)
+        while end - offset >= _FRAME_META.size:
+            pts, size = _FRAME_META.unpack_from(data, offset)
+            start = offset + _FRAME_META.size
+            if end - start < size:
+                break
+            offset = start + size
+            pts = self.protocol.frame_pts(pts)
+            if pts is None:
+                self.__meta_config = bytes(data[start:offset])
+                self.codec_config = self.__meta_config
+                continue
+            if self.__meta_config is not None:
+                packet = Packet(self.__meta_config + bytes(data[start:offset]))
+                self.__meta_config = None
+            else:
+                packet = Packet(data[start:offset])
+            packet.pts = pts
+            self.__update_lag(pts)
+            packet.dts = pts
+            packet.time_base = _PTS_TIME_BASE
+            packets.append(packet)
+
+        leftover = bytes(data[offset:])
+        data.release()
+        self.__meta_pending = bytearray(leftover)
+        return packets
+
+    def __update_lag(self, pts: int) -> None:
+        """
+        Compare the device clock with the arrival time, the smallest offset seen is taken as no lag,
+        it rises slowly so clock drift doesn't turn into a permanent lag
+
+        Args:
+            pts: device timestamp of the packet, unit is us
+        """
+        now = perf_counter()
+        self.__lag_pts = pts / 1000000
+        offset = now - self.__lag_pts
+        if self.__lag_base is None:
+            self.__lag_base = offset
+        else:
+            drift = (now - self.__lag_updated_at) * _LAG_BASE_DRIFT
+            self.__lag_base = min(offset, self.__lag_base + drift)
+        self.__lag_updated_at = now
+
+    def _decode_video(self, packet: Any, received_at: Optional[float] = None) -> None:
+        """
+        Send one access unit to packet listeners, then decode it and send the frames to listeners.
+        Runs on the decode thread, packet listeners never block the reactor selector thread
+
+        Args:
+            packet: packet from _parse_video
+            received_at: perf_counter when the packet bytes were read, for latency stats
+        """
+        if self.listeners[EVENT_PACKET]:
+            self.__send_to_listeners(EVENT_PACKET, packet)
+        if self.decoder_profile != self.__applied_decoder_profile and is_keyframe(
+            bytes(packet), self.video_codec
+        ):
+            self.__decoder = self.__create_decoder()
+        if self.decode_mode != self.__applied_decode_mode:
+            self.__apply_decode_mode(packet)
+
+        stats = self.latency_stats
+        if stats is not None:
+            start = perf_counter()
+        try:
+            frames = self.__decoder.decode(packet)
+        except InvalidDataError:
+            return
+        if stats is not None:
+            stats.record(STAGE_DECODE, perf_counter() - start)
+
+        for frame in frames:
+            self.resolution = (frame.width, frame.height)
+            pts = frame.pts
+            at = time()
+            self.frames_decoded += 1
+            self.__last_decoded = (frame, pts, at)
+            if self.skip_unchanged and self.__unchanged(frame):
+                self.frames_skipped += 1
+                continue
+            if stats is not None:
+                start = perf_counter()
+            frame = self.convert_frame(frame)
+            self.__last_sent = (frame, pts, at)
+            self.last_frame = frame
+            self.last_frame_pts = pts
+            self.last_frame_time = at
+            if stats is None:
+                self.__send_to_listeners(EVENT_FRAME, frame)
+                continue
+            self.last_frame_received_at = received_at
+            dispatch = perf_counter()
+            stats.record(STAGE_CONVERT, dispatch - start)
+            self.__send_to_listeners(EVENT_FRAME, frame)
+            stats.record(STAGE_DISPATCH, perf_counter() - dispatch)
+
+    def __unchanged(self, frame: Any) -> bool:
+        """
+        Whether a decoded frame shows the same picture as the last frame sent, static screens
+        keep producing frames from the encoder that decode to identical pixels
+
+        Args:
+            frame: av.VideoFrame
+        """
+        plane = frame.planes[0]
+        luma = np.frombuffer(plane, np.uint8, frame.height * plane.line_size).reshape(
+            frame.height, plane.line_size
+        )
+        sample = np.ascontiguousarray(
+            luma[::_SKIP_SAMPLE_STEP, : frame.width : _SKIP_SAMPLE_STEP]
+        )
+        # Output settings are part of the signature, a rescaled tile needs a new frame
+        signature = (zlib.crc32(sample), frame.width, frame.height, self.output_scale, self.flip)
+        now = perf_counter()
+        if signature == self.__frame_signature and now - self.__frame_sent_at < _SKIP_MAX_INTERVAL:
+            return True
+        self.__frame_signature = signature
+        self.__frame_sent_at = now
+        return False
+
+    def __create_parser(self) -> CodecContext:
+        """
+        Create the parser splitting the raw stream of video_codec
+        """
+        return CodecContext.create(_PARSER_NAMES[self.video_codec], "r")
+
+    def __create_decoder(self) -> CodecContext:
+        """
+        Create the stream decoder, decode mode and profile start over
         """
-        codec = CodecContext.create("h264", "r")
-        while self.alive:
+        decoder = self.create_decoder()
+        self.__applied_decoder_profile = self.decoder_profile
+        self.__applied_decode_mode = DECODE_MODE_FULL
+        return decoder
+
+    def create_decoder(self) -> CodecContext:
+        """
+        Create a decoder of video_codec configured by decoder_profile, the same the stream uses,
+        for benchmarks decoding packets themselves
+        """
+        for name in _DECODER_NAMES[self.video_codec]:
             try:
-                raw_h264 = self.__video_socket.recv(0x10000)
-                if raw_h264 == b"":
-                    raise ConnectionError("Video stream is disconnected")
-                packets = codec.parse(raw_h264)
-                for packet in packets:
-                    frames = codec.decode(packet)
-                    for frame in frames:
-                        frame = frame.to_ndarray(format="bgr24")
-                        if self.flip:
-                            frame = cv2.flip(frame, 1)
-                        self.last_frame = frame
-                        self.resolution = (frame.shape[1], frame.shape[0])
-                        self.__send_to_listeners(EVENT_FRAME, frame)
-            except (BlockingIOError, InvalidDataError):
-                time.sleep(0.01)
-                if not self.block_frame:
-                    self.__send_to_listeners(EVENT_FRAME, None)
-            except (ConnectionError, OSError) as e:  # Socket Closed
-                if self.alive:
-                    self.__send_to_listeners(EVENT_DISCONNECT)
-                    self.stop()
-                    raise e
+                decoder = CodecContext.create(name, "r")
+                break
+            except ValueError:
+                continue
+        else:
+            raise RuntimeError(f"No {self.video_codec} decoder available in PyAV")
+        options = dict(_DECODER_PROFILES[self.decoder_profile])
+        if "threads" in options and options["threads"] is None:
+            options["threads"] = str(self.decoder_threads or "auto")
+        decoder.options = options
+        return decoder
+
+    def __apply_decode_mode(self, packet: Any) -> None:
+        """
+        Switch libavcodec frame skipping, leaving key frame mode waits for the
+        next IDR so the decoder never references frames it skipped
+
+        Args:
+            packet: packet about to be decoded
+        """
+        if self.__applied_decode_mode == DECODE_MODE_KEYFRAME and not is_keyframe(
+            bytes(packet), self.video_codec
+        ):
+            return
+        self.__decoder.skip_frame = _SKIP_FRAME[self.decode_mode]
+        self.__applied_decode_mode = self.decode_mode
+
+    def convert_frame(self, frame: Any) -> np.ndarray:
+        """
+        Convert a decoded frame to bgr24 at output_scale, libswscale does the
+        colour conversion and the resize in the same pass.
+        The result is the reusable frame buffer when reuse_frame_buffer is set, benchmarks
+        call it directly, not while the client is streaming
+
+        Args:
+            frame: av.VideoFrame
+        """
+        width, height = frame.width, frame.height
+        if self.output_scale < 1:
+            width = max(1, round(width * self.output_scale))
+            height = max(1, round(height * self.output_scale))
+        frame = frame.reformat(width=width, height=height, format="bgr24")
+
+        if not self.reuse_frame_buffer:
+            image = frame.to_ndarray()
+            return cv2.flip(image, 1) if self.flip else image
+
+        # View on the swscale output, rows may be padded to line_size
+        plane = frame.planes[0]
+        image = np.ndarray(
+            (height, width, 3), np.uint8, plane, strides=(plane.line_size, 3, 1)
+        )
+        buffer = self.__frame_buffer
+        if buffer is None or buffer.shape != image.shape:
+            buffer = self.__frame_buffer = np.empty_like(image)
+        if self.flip:
+            cv2.flip(image, 1, dst=buffer)
+        else:
+            np.copyto(buffer, image)
+        return buffer
+
+    def snapshot(self, full_resolution: bool = False) -> Optional[np.ndarray]:
+        """
+        bgr24 copy of the current picture, safe to keep and to call from any thread
+
+        Args:
+            full_resolution: convert the last decoded frame at device resolution instead
+                of copying last_frame, which is at output_scale
+
+        Returns:
+            image, None before the first frame
+        """
+        shot = self.timed_snapshot(full_resolution)
+        return None if shot is None else shot[0]
+
+    def timed_snapshot(
+        self, full_resolution: bool = False
+    ) -> Optional[Tuple[np.ndarray, Optional[int], float]]:
+        """
+        Same as snapshot, with the device pts and host time of that picture
+
+        Args:
+            full_resolution: convert the last decoded frame at device resolution
+
+        Returns:
+            (image, pts, time), None before the first frame
+        """
+        latest = self.__last_decoded if full_resolution else self.__last_sent
+        if latest is None:
+            return None
+        frame, pts, at = latest
+        if not full_resolution:
+            return frame.copy(), pts, at
+        # The decode thread may be converting the same frame with the SwsContext cached on it,
+        # a reformatter of our own keeps the two conversions apart
+        image = VideoReformatter().reformat(frame, format="bgr24").to_ndarray()
+        return (cv2.flip(image, 1) if self.flip else image), pts, at
+
+    def enable_latency_stats(self, window: int = 512) -> LatencyStats:
+        """
+        Start timing every pipeline stage, see latency_summary
+
+        Args:
+            window: number of samples kept per stage
+        """
+        if self.latency_stats is None:
+            self.latency_stats = LatencyStats(window)
+        return self.latency_stats
+
+    def disable_latency_stats(self) -> None:
+        """
+        Stop timing, the decode path goes back to a single None check per stage
+        """
+        self.latency_stats = None
+
+    def latency_summary(self) -> Optional[dict]:
+        """
+        p50/p95/p99 in ms of every stage, None if latency stats are disabled
+        """
+        stats = self.latency_stats
+        return stats.summary() if stats is not None else None
+
+    def set_decode_mode(self, decode_mode: str) -> None:
+        """
+        Change decode mode at runtime, applied from the next packet
+
+        Args:
+            decode_mode: DECODE_MODE_FULL | DECODE_MODE_NONREF | DECODE_MODE_KEYFRAME
+        """
+        assert decode_mode in _SKIP_FRAME, "decode_mode must be DECODE_MODE_*"
+        self.decode_mode = decode_mode
+
+    def set_decoder_profile(self, decoder_profile: str, decoder_threads: Optional[int] = None) -> None:
+        """
+        Change decoder profile, a new decoder is created at the next IDR
+
+        Args:
+            decoder_profile: DECODER_PROFILE_*
+            decoder_threads: decode threads of the throughput profiles, None keeps the current value
+        """
+        assert (
+            decoder_profile in _DECODER_PROFILES
+        ), "decoder_profile must be DECODER_PROFILE_*"
+        if decoder_threads is not None:
+            assert decoder_threads >= 0, "decoder_threads must be greater than or equal to 0"
+            self.decoder_threads = decoder_threads
+        self.decoder_profile = decoder_profile
+        self.__applied_decoder_profile = None
+
+    def set_output_scale(self, output_scale: float) -> None:
+        """
+        Change the scale of the frames sent to listeners, applied from the next frame
+
+        Args:
+            output_scale: scale in (0, 1], 1 means device resolution
+        """
+        assert 0 < output_scale <= 1, "output_scale must be in (0, 1]"
+        self.output_scale = output_scale
+
+    def _on_idle(self) -> None:
+        """
+        No video data for idle_interval seconds
+        """
+        self.__send_to_listeners(EVENT_IDLE)
+        if not self.block_frame:
+            self.__send_to_listeners(EVENT_FRAME, None)
+
+    def _on_disconnect(self) -> None:
+        """
+        Video stream is closed by the device
+        """
+        self.stop()
+        self.__send_to_listeners(EVENT_DISCONNECT)
 
     def add_listener(self, cls: str, listener: Callable[..., Any]) -> None:
         """
         Add a video listener
 
         Args:
-            cls: Listener category, support: init, frame
+            cls: Listener category, support: init, frame, idle, disconnect
             listener: A function to receive frame np.ndarray
         """
         self.listeners[cls].append(listener)
@@ -267,7 +1164,7 @@ class Client:
         Remove a video listener
 
         Args:
-            cls: Listener category, support: init, frame
+            cls: Listener category, support: init, frame, idle, disconnect
             listener: A function to receive frame np.ndarray
         """
         self.listeners[cls].remove(listener)
@@ -283,3 +1180,17 @@ class Client:
         """
         for fun in self.listeners[cls]:
             fun(*args, **kwargs)
+
+
+def _local_md5(path: str) -> str:
+    """
+    md5 of a local server jar, computed once per path
+
+    Args:
+        path: local jar path
+    """
+    md5 = _server_jar_md5.get(path)
+    if md5 is None:
+        with open(path, "rb") as f:
+            md5 = _server_jar_md5[path] = hashlib.md5(f.read()).hexdigest()
+    return md5
@@ -0,0 +1,181 @@
+"""
+Minimal h264/h265 Annex B and AV1 OBU helpers, only looks at unit headers
+"""
+
+from typing import Iterator, Optional
+
+NAL_SLICE = 1
+NAL_IDR = 5
+NAL_SEI = 6
+NAL_SPS = 7
+NAL_PPS = 8
+NAL_AUD = 9
+
+# h265, IRAP pictures (BLA, IDR, CRA) are 16 to 21, VCL types are below 32
+HEVC_NAL_BLA_W_LP = 16
+HEVC_NAL_CRA = 21
+HEVC_NAL_VPS = 32
+HEVC_NAL_SPS = 33
+HEVC_NAL_PPS = 34
+
+# AV1, a key frame is always preceded by a sequence header in scrcpy streams
+OBU_SEQUENCE_HEADER = 1
+OBU_FRAME_HEADER = 3
+OBU_FRAME = 6
+
+
+def iter_nal_types(data: bytes) -> Iterator[int]:
+    """
+    Iterate NAL unit types of an Annex B buffer, start codes are 00 00 01 or 00 00 00 01
+
+    Args:
+        data: access unit bytes
+    """
+    pos = data.find(b"\x00\x00\x01")
+    while pos != -1 and pos + 3 < len(data):
+        yield data[pos + 3] & 0x1F
+        pos = data.find(b"\x00\x00\x01", pos + 3)
+
+
+def iter_hevc_nal_types(data: bytes) -> Iterator[int]:
+    """
+    Iterate h265 NAL unit types of an Annex B buffer
+
+    Args:
+        data: access unit bytes
+    """
+    pos = data.find(b"\x00\x00\x01")
+    while pos != -1 and pos + 3 < len(data):
+        yield (data[pos + 3] >> 1) & 0x3F
+        pos = data.find(b"\x00\x00\x01", pos + 3)
+
+
+def iter_obu_types(data: bytes) -> Iterator[int]:
+    """
+    Iterate OBU types of a low overhead AV1 buffer, stops at the first OBU without size field
+
+    Args:
+        data: temporal unit bytes
+    """
+    pos = 0
+    end = len(data)
+    while pos < end:
+        header = data[pos]
+        yield (header >> 3) & 0x0F
+        pos += 2 if header & 0x04 else 1
+        if not header & 0x02:
+            return
+        size = 0
+        for i in range(8):
+            if pos >= end:
+                return
+            byte = data[pos]
+            pos += 1
+            size |= (byte & 0x7F) << (7 * i)
+            if not byte & 0x80:
+                break
+        pos += size
+
+
+def is_idr(data: bytes) -> bool:
+    """
+    Whether the first picture slice of the access unit is an IDR slice
+
+    Args:
+        data: access unit bytes
+    """
+    for nal_type in iter_nal_types(data):
+        if nal_type == NAL_IDR:
+            return True
+        if nal_type == NAL_SLICE:
+            return False
+    return False
+
+
+def is_hevc_irap(data: bytes) -> bool:
+    """
+    Whether the first picture of the h265 access unit is a random access point
+
+    Args:
+        data: access unit bytes
+    """
+    for nal_type in iter_hevc_nal_types(data):
+        if nal_type < HEVC_NAL_VPS:
+            return HEVC_NAL_BLA_W_LP <= nal_type <= HEVC_NAL_CRA
+    return False
+
+
+def is_av1_keyframe(data: bytes) -> bool:
+    """
+    Whether the AV1 temporal unit starts a new sequence
+
+    Args:
+        data: temporal unit bytes
+    """
+    for obu_type in iter_obu_types(data):
+        if obu_type == OBU_SEQUENCE_HEADER:
+            return True
+        if obu_type in (OBU_FRAME_HEADER, OBU_FRAME):
+            return False
+    return False
+
+
+def config_units(data: bytes, codec: str = "h264") -> bytes:
+    """
+    Parameter sets (h264 SPS/PPS, h265 VPS/SPS/PPS) in front of the first picture,
+    empty if the access unit has no SPS. AV1 repeats its sequence header in key frames
+
+    Args:
+        data: access unit bytes
+        codec: VIDEO_CODEC_*
+    """
+    if codec == "av1":
+        return b""
+    hevc = codec == "h265"
+    sps = HEVC_NAL_SPS if hevc else NAL_SPS
+    has_sps = False
+    pos = data.find(b"\x00\x00\x01")
+    while pos != -1 and pos + 3 < len(data):
+        if hevc:
+            nal_type = (data[pos + 3] >> 1) & 0x3F
+            vcl = nal_type < HEVC_NAL_VPS
+        else:
+            nal_type = data[pos + 3] & 0x1F
+            vcl = NAL_SLICE <= nal_type <= NAL_IDR
+        if vcl:
+            start = pos - 1 if pos > 0 and data[pos - 1] == 0 else pos
+            return bytes(data[:start]) if has_sps else b""
+        has_sps = has_sps or nal_type == sps
+        pos = data.find(b"\x00\x00\x01", pos + 3)
+    return bytes(data) if has_sps else b""
+
+
+def is_keyframe(data: bytes, codec: str = "h264") -> bool:
+    """
+    Whether the decoder can start from this access unit
+
+    Args:
+        data: access unit bytes
+        codec: VIDEO_CODEC_*
+    """
+    if codec == "h265":
+        return is_hevc_irap(data)
+    if codec == "av1":
+        return is_av1_keyframe(data)
+    return is_idr(data)
+
+
+def avc_codec_string(data: bytes) -> Optional[str]:
+    """
+    RFC 6381 codec string (avc1.PPCCLL) from the first SPS of an Annex B buffer,
+    what WebCodecs and MSE expect
+
+    Args:
+        data: parameter sets or access unit bytes
+    """
+    pos = data.find(b"\x00\x00\x01")
+    while pos != -1 and pos + 6 < len(data):
+        if data[pos + 3] & 0x1F == NAL_SPS:
+            return "avc1." + data[pos + 4 : pos + 7].hex().upper()
+        pos = data.find(b"\x00\x00\x01", pos + 3)
+    return None
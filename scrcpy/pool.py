@@ -0,0 +1,585 @@
+"""
+Decode devices in worker processes: each worker runs ordinary clients and copies their
+frames into shared memory rings, the parent maps the rings and sees a Client-like proxy
+"""
+
+import itertools
+import multiprocessing
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .const import EVENT_DISCONNECT, EVENT_FRAME, EVENT_IDLE, EVENT_INIT, SERVER_VERSION_BUNDLED
+from .control import ControlSender
+from .protocol import get_protocol
+from .shm import FrameRing
+from .stats import LatencyStats
+
+# Frames kept per device ring
+_RING_SLOTS = 4
+# Counters are also sent on this interval, frames may be skipped or absent, unit is s
+_STATS_INTERVAL = 0.5
+# Longest wait for a worker to start a client: jar push, server launch and connect, unit is s
+_START_TIMEOUT = 30
+
+
+def _worker_main(conn) -> None:
+    """
+    Worker process entry, commands come from the parent pipe:
+    ("start", key, kwargs, attempt), ("stop", key), ("call", key, method, args),
+    ("control", key, data), ("request", key, request_id, op, args), None to exit
+    """
+    from .core import Client
+
+    send_lock = threading.Lock()
+    # key: [client, ring, starting]
+    sessions: Dict[int, list] = {}
+    # Hands a connected session from its start thread to stop
+    sessions_lock = threading.Lock()
+    running = threading.Event()
+    running.set()
+
+    def send(message: tuple) -> None:
+        with send_lock:
+            try:
+                conn.send(message)
+            except (OSError, EOFError):
+                pass
+
+    def on_frame(key: int, client: "Client"):
+        def listener(frame):
+            if frame is None:
+                return
+            session = sessions.get(key)
+            if session is None:
+                return
+            ring = session[1]
+            if ring is None or frame.nbytes > ring.capacity:
+                # First frame or bigger output, the parent maps the new ring
+                if ring is not None:
+                    ring.close()
+                ring = session[1] = FrameRing.create(frame.nbytes, _RING_SLOTS)
+                send(("ring", key, ring.name))
+            pts = client.last_frame_pts
+            number = ring.write(frame, -1 if pts is None else pts)
+            send(
+                (
+                    "frame",
+                    key,
+                    number,
+                    pts,
+                    client.last_frame_received_at,
+                    client.bytes_received,
+                    client.stream_lag,
+                    client.resolution,
+                )
+            )
+
+        return listener
+
+    def report() -> None:
+        while running.is_set():
+            for key, session in list(sessions.items()):
+                client = session[0]
+                send(
+                    (
+                        "stats",
+                        key,
+                        client.bytes_received,
+                        client.stream_lag,
+                        client.frames_decoded,
+                        client.frames_skipped,
+                    )
+                )
+            time.sleep(_STATS_INTERVAL)
+
+    def start(key: int, kwargs: dict, attempt: int) -> None:
+        client = Client(**kwargs)
+        session = sessions[key] = [client, None, True]
+        client.add_listener(EVENT_FRAME, on_frame(key, client))
+        client.add_listener(EVENT_IDLE, lambda: send(("idle", key)))
+        client.add_listener(EVENT_DISCONNECT, lambda: send(("disconnect", key)))
+        try:
+            client.start(daemon_threaded=True)
+        except Exception as e:
+            with sessions_lock:
+                if sessions.get(key) is session:
+                    sessions.pop(key)
+            send(("error", key, attempt, f"{type(e).__name__}: {e}"))
+            return
+        with sessions_lock:
+            session[2] = False
+            stopped = sessions.get(key) is not session
+        if stopped:
+            # Stopped while connecting, the parent no longer waits for this attempt
+            close(session)
+            send(("error", key, attempt, "Client was stopped while starting"))
+            return
+        send(("init", key, attempt, client.device_name, client.resolution, client.timings))
+
+    def close(session: list) -> None:
+        client, ring, _ = session
+        client.stop()
+        if ring is not None:
+            ring.close()
+
+    def stop(key: int) -> None:
+        with sessions_lock:
+            session = sessions.pop(key, None)
+            if session is None or session[2]:
+                # A client still connecting is closed by its start thread
+                return
+        close(session)
+
+    def request(key: int, request_id: int, op: str, args: tuple) -> None:
+        session = sessions.get(key)
+        try:
+            if session is None:
+                raise ConnectionError("Client is not started")
+            if op == "snapshot":
+                send(("reply", request_id, True, session[0].timed_snapshot(*args)))
+                return
+            sock = session[0].control_socket
+            if op == "recv":
+                size, blocking = args
+                sock.setblocking(blocking)
+                try:
+                    value = sock.recv(size)
+                finally:
+                    sock.setblocking(True)
+            else:
+                raise ValueError(f"Unknown request {op}")
+            send(("reply", request_id, True, value))
+        except Exception as e:
+            send(("reply", request_id, False, e))
+
+    threading.Thread(target=report, name="scrcpy_worker_stats", daemon=True).start()
+    try:
+        while True:
+            try:
+                command = conn.recv()
+            except (EOFError, OSError):
+                break
+            if command is None:
+                break
+            op, key = command[0], command[1]
+            if op == "start":
+                threading.Thread(target=start, args=(key, *command[2:]), daemon=True).start()
+            elif op == "stop":
+                stop(key)
+            elif op == "call" and key in sessions:
+                getattr(sessions[key][0], command[2])(*command[3])
+            elif op == "control" and key in sessions:
+                client = sessions[key][0]
+                if client.control_socket is not None:
+                    with client.control_socket_lock:
+                        client.control_socket.send(command[2])
+            elif op == "request":
+                threading.Thread(
+                    target=request, args=(key, *command[2:]), daemon=True
+                ).start()
+    finally:
+        running.clear()
+        for key in list(sessions):
+            stop(key)
+
+
+class _ControlRelay:
+    """
+    Stands in for the control socket of a remote client, so ControlSender works unchanged
+    """
+
+    def __init__(self, client: "RemoteClient"):
+        self.client = client
+        self.blocking = True
+
+    def send(self, data: bytes) -> int:
+        self.client._command("control", bytes(data))
+        return len(data)
+
+    def setblocking(self, flag: bool) -> None:
+        self.blocking = flag
+
+    def recv(self, size: int) -> bytes:
+        return self.client._request("recv", size, self.blocking)
+
+    def close(self) -> None:
+        pass
+
+
+class RemoteClient:
+    def __init__(self, pool: "ProcessPool", worker: "_Worker", key: int, **kwargs):
+        """
+        Proxy of a Client running in a worker process, created by ProcessPool.client.
+        Frames are zero copy views into the shared ring, valid until the worker laps the ring
+
+        Args:
+            kwargs: Client arguments, must be picklable
+        """
+        self.pool = pool
+        self.worker = worker
+        self.key = key
+        self.kwargs = kwargs
+
+        # Client attributes read by callers, restart parameters are sent on start
+        self.max_width = kwargs.get("max_width", 0)
+        self.bitrate = kwargs.get("bitrate", 8000000)
+        self.max_fps = kwargs.get("max_fps", 0)
+        self.video_codec = kwargs.get("video_codec", "h264")
+        self.block_frame = kwargs.get("block_frame", False)
+        self.protocol = get_protocol(kwargs.get("server_version", SERVER_VERSION_BUNDLED))
+
+        self.listeners = dict(frame=[], init=[], disconnect=[], idle=[])
+        self.last_frame = None
+        # (ring, number, sequence) of last_frame, the worker reuses the slot after _RING_SLOTS frames
+        self.last_frame_slot: Optional[tuple] = None
+        self.last_frame_pts: Optional[int] = None
+        self.last_frame_time: Optional[float] = None
+        self.last_frame_received_at: Optional[float] = None
+        self.latency_stats: Optional[LatencyStats] = None
+        self.resolution: Optional[Tuple[int, int]] = None
+        self.device_name: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+        self.bytes_received = 0
+        self.stream_lag = 0.0
+        self.frames_decoded = 0
+        self.frames_skipped = 0
+        self.codec_config: Optional[bytes] = None
+        self.control = ControlSender(self)
+        self.control_socket: Optional[_ControlRelay] = None
+        self.control_socket_lock = threading.Lock()
+        self.alive = False
+
+        self.ring: Optional[FrameRing] = None
+        # Rings replaced while views of them may still be painted
+        self.old_rings: List[FrameRing] = []
+        self.__state = threading.Condition()
+        self.__error: Optional[str] = None
+        self.__started = False
+        # Start attempt waited for, init and error of older attempts are ignored
+        self.__attempt = 0
+        self.__starting = False
+
+    def start(self, threaded: bool = False, daemon_threaded: bool = False, reactor: Any = None) -> None:
+        """
+        Start the client in its worker, blocks until disconnected unless threaded
+
+        Args:
+            threaded: return once connected
+            daemon_threaded: same as threaded, the worker owns the stream loop
+            reactor: not supported, the worker process decodes
+        """
+        assert self.alive is False and reactor is None
+        kwargs = dict(self.kwargs, max_width=self.max_width, bitrate=self.bitrate, max_fps=self.max_fps)
+        with self.__state:
+            self.__error = None
+            self.__started = False
+            self.__attempt += 1
+            self.__starting = True
+            try:
+                self.worker.send(("start", self.key, kwargs, self.__attempt))
+                deadline = time.monotonic() + _START_TIMEOUT
+                while not self.__started and self.__error is None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.__error = "Worker did not start the client in time"
+                        break
+                    self.__state.wait(remaining)
+            finally:
+                self.__starting = False
+            error = self.__error
+        if error is not None:
+            self.__send_stop()
+            raise ConnectionError(error)
+
+        self.__send_to_listeners(EVENT_INIT)
+        if threaded or daemon_threaded:
+            return
+        with self.__state:
+            while self.alive:
+                self.__state.wait()
+
+    def stop(self) -> None:
+        """
+        Stop the client, also cancels a start still waiting for the worker
+        """
+        with self.__state:
+            self.alive = False
+            if self.__starting and self.__error is None:
+                self.__error = "Client was stopped while starting"
+            self.__state.notify_all()
+        self.__send_stop()
+        self.control_socket = None
+
+    def __send_stop(self) -> None:
+        # Always sent, the worker ignores keys it doesn't run and closes clients still connecting
+        try:
+            self.worker.send(("stop", self.key))
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        """
+        Stop and unmap the rings
+        """
+        self.stop()
+        for ring in self.old_rings + ([self.ring] if self.ring else []):
+            ring.close()
+        self.old_rings = []
+        self.ring = None
+
+    def _command(self, op: str, *args) -> None:
+        self.worker.send((op, self.key, *args))
+
+    def _request(self, op: str, *args) -> Any:
+        return self.pool._request(self.worker, self.key, op, args)
+
+    def _on_message(self, message: tuple) -> None:
+        """
+        Messages of this client from the worker pipe, called by the pool reader thread
+        """
+        kind = message[0]
+        if kind == "frame":
+            _, _, number, pts, received_at, self.bytes_received, self.stream_lag, resolution = message
+            if self.ring is None:
+                return
+            info = self.ring.info(number)
+            frame = self.ring.view(number)
+            if info is None or frame is None:
+                return
+            self.resolution = resolution
+            self.last_frame = frame
+            self.last_frame_slot = (self.ring, number, info[0])
+            self.last_frame_pts = pts
+            self.last_frame_time = time.time()
+            self.last_frame_received_at = received_at
+            self.__send_to_listeners(EVENT_FRAME, frame)
+        elif kind == "stats":
+            _, _, self.bytes_received, self.stream_lag, self.frames_decoded, self.frames_skipped = message
+        elif kind == "ring":
+            if self.ring is not None:
+                self.old_rings.append(self.ring)
+            self.ring = FrameRing.attach(message[2])
+        elif kind == "init":
+            with self.__state:
+                if not self.__starting or message[2] != self.__attempt:
+                    return
+                _, _, _, self.device_name, self.resolution, self.timings = message
+                self.control_socket = _ControlRelay(self)
+                self.alive = True
+                self.__started = True
+                self.__state.notify_all()
+        elif kind == "error":
+            with self.__state:
+                if self.__starting and message[2] == self.__attempt:
+                    self.__error = message[3]
+                    self.__state.notify_all()
+        elif kind == "exit":
+            # The worker process is gone, fail a waiting start and disconnect
+            with self.__state:
+                was_alive = self.alive
+                self.alive = False
+                if self.__starting and self.__error is None:
+                    self.__error = "Worker process exited"
+                self.__state.notify_all()
+            self.control_socket = None
+            if was_alive:
+                self.__send_to_listeners(EVENT_DISCONNECT)
+        elif kind == "idle":
+            self.__send_to_listeners(EVENT_IDLE)
+            if not self.block_frame:
+                self.__send_to_listeners(EVENT_FRAME, None)
+        elif kind == "disconnect":
+            if not self.alive:
+                return
+            self.stop()
+            self.__send_to_listeners(EVENT_DISCONNECT)
+
+    def copy_frame(self, frame: np.ndarray, slot: tuple) -> Optional[np.ndarray]:
+        """
+        Consistent copy of a dispatched frame view, for frames used after the dispatch returns
+
+        Args:
+            frame: zero copy view from EVENT_FRAME
+            slot: last_frame_slot read while the frame was dispatched
+
+        Returns:
+            bgr24 image, None if the worker has reused the slot since
+        """
+        ring, number, sequence = slot
+        if not ring.valid(number, sequence):
+            return None
+        frame = frame.copy()
+        if not ring.valid(number, sequence):
+            return None
+        return frame
+
+    def snapshot(self, full_resolution: bool = False) -> Optional[np.ndarray]:
+        """
+        bgr24 copy of the current picture, converted in the worker
+        """
+        shot = self.timed_snapshot(full_resolution)
+        return None if shot is None else shot[0]
+
+    def timed_snapshot(
+        self, full_resolution: bool = False
+    ) -> Optional[Tuple[np.ndarray, Optional[int], float]]:
+        """
+        (image, pts, time) of the current picture, read together in the worker
+        """
+        return self._request("snapshot", full_resolution)
+
+    def enable_latency_stats(self, window: int = 512) -> LatencyStats:
+        """
+        Only the stages after the frame reaches this process are recorded
+        """
+        if self.latency_stats is None:
+            self.latency_stats = LatencyStats(window)
+        return self.latency_stats
+
+    def disable_latency_stats(self) -> None:
+        self.latency_stats = None
+
+    def latency_summary(self) -> Optional[dict]:
+        if self.latency_stats is None:
+            return None
+        return self.latency_stats.summary()
+
+    def set_decode_mode(self, decode_mode: str) -> None:
+        self.kwargs["decode_mode"] = decode_mode
+        self._command("call", "set_decode_mode", (decode_mode,))
+
+    def set_decoder_profile(self, decoder_profile: str, decoder_threads: Optional[int] = None) -> None:
+        self.kwargs["decoder_profile"] = decoder_profile
+        if decoder_threads is not None:
+            self.kwargs["decoder_threads"] = decoder_threads
+        self._command("call", "set_decoder_profile", (decoder_profile, decoder_threads))
+
+    def set_output_scale(self, output_scale: float) -> None:
+        self.kwargs["output_scale"] = output_scale
+        self._command("call", "set_output_scale", (output_scale,))
+
+    def add_listener(self, cls: str, listener: Callable[..., Any]) -> None:
+        self.listeners[cls].append(listener)
+
+    def remove_listener(self, cls: str, listener: Callable[..., Any]) -> None:
+        self.listeners[cls].remove(listener)
+
+    def __send_to_listeners(self, cls: str, *args, **kwargs) -> None:
+        for fun in self.listeners[cls]:
+            fun(*args, **kwargs)
+
+
+class _Worker:
+    def __init__(self, context, index: int, on_message: Callable[["_Worker", tuple], None]):
+        self.conn, child = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child,), name=f"scrcpy_worker_{index}", daemon=True
+        )
+        self.process.start()
+        child.close()
+        self.clients = 0
+        self.send_lock = threading.Lock()
+        self.thread = threading.Thread(
+            target=self.__read, args=(on_message,), name=f"scrcpy_worker_{index}_reader", daemon=True
+        )
+        self.thread.start()
+
+    def send(self, message: Optional[tuple]) -> None:
+        with self.send_lock:
+            self.conn.send(message)
+
+    def __read(self, on_message: Callable[["_Worker", tuple], None]) -> None:
+        while True:
+            try:
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                # Crashed or stopped, the clients pinned to this worker are told once
+                on_message(self, ("exit", None))
+                return
+            on_message(self, message)
+
+
+class ProcessPool:
+    def __init__(self, workers: int = 2):
+        """
+        Worker processes shared by all remote clients, each client is pinned to the least
+        loaded worker
+
+        Args:
+            workers: number of decode processes
+        """
+        assert workers > 0, "workers must be greater than 0"
+        self.size = workers
+        self.workers: List[_Worker] = []
+        self.__context = multiprocessing.get_context("spawn")
+        self.__keys = itertools.count(1)
+        self.__clients: Dict[int, RemoteClient] = {}
+        self.__requests: Dict[int, list] = {}
+        self.__request_ids = itertools.count(1)
+        self.__lock = threading.Lock()
+
+    def start(self) -> None:
+        self.workers = [
+            _Worker(self.__context, i, self.__on_message) for i in range(self.size)
+        ]
+
+    def stop(self) -> None:
+        for client in list(self.__clients.values()):
+            client.close()
+        for worker in self.workers:
+            try:
+                worker.send(None)
+            except OSError:
+                pass
+            worker.process.join(timeout=5)
+            worker.conn.close()
+        self.workers = []
+
+    def client(self, **kwargs) -> RemoteClient:
+        """
+        Create a remote client, same arguments as Client, device must be a serial
+
+        Args:
+            kwargs: Client arguments
+        """
+        worker = min(self.workers, key=lambda w: w.clients)
+        worker.clients += 1
+        key = next(self.__keys)
+        client = RemoteClient(self, worker, key, **kwargs)
+        self.__clients[key] = client
+        return client
+
+    def _request(self, worker: _Worker, key: int, op: str, args: tuple) -> Any:
+        request_id = next(self.__request_ids)
+        pending = [threading.Event(), None, None]
+        with self.__lock:
+            self.__requests[request_id] = pending
+        worker.send(("request", key, request_id, op, args))
+        if not pending[0].wait(5):
+            with self.__lock:
+                self.__requests.pop(request_id, None)
+            raise TimeoutError(f"Worker did not answer {op}")
+        if not pending[1]:
+            raise pending[2]
+        return pending[2]
+
+    def __on_message(self, worker: _Worker, message: tuple) -> None:
+        if message[0] == "reply":
+            _, request_id, ok, value = message
+            with self.__lock:
+                pending = self.__requests.pop(request_id, None)
+            if pending is not None:
+                pending[1], pending[2] = ok, value
+                pending[0].set()
+            return
+        if message[0] == "exit":
+            for client in list(self.__clients.values()):
+                if client.worker is worker:
+                    client._on_message(message)
+            return
+        client = self.__clients.get(message[1])
+        if client is not None:
+            client._on_message(message)
@@ -0,0 +1,232 @@
+"""
+Server protocol generations: launch arguments, handshake and the control messages
+whose layout changed between the bundled 1.20 server and 2.x servers
+"""
+
+import socket
+import struct
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from .const import (
+    LOCK_SCREEN_ORIENTATION_UNLOCKED,
+    VIDEO_CODEC_AV1,
+    VIDEO_CODEC_H264,
+    VIDEO_CODEC_H265,
+)
+
+if TYPE_CHECKING:
+    from .core import Client
+
+# Codec id sent in the 2.x codec meta
+_CODEC_IDS = {
+    VIDEO_CODEC_H264: 0x68323634,
+    VIDEO_CODEC_H265: 0x68323635,
+    VIDEO_CODEC_AV1: 0x00617631,
+}
+
+_PTS_MASK = (1 << 62) - 1
+
+# 2.x servers whose launch arguments and control layouts ProtocolV2 follows,
+# 3.x dropped lock_video_orientation
+V2_VERSIONS = ("2.4", "2.5", "2.6", "2.6.1", "2.7")
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Video stream closed during handshake")
+        data += chunk
+    return data
+
+
+def _bool(value: bool) -> str:
+    return "true" if value else "false"
+
+
+class ServerProtocol:
+    # Codecs the server generation can encode
+    video_codecs: Tuple[str, ...] = (VIDEO_CODEC_H264,)
+
+    def __init__(self, version: str):
+        """
+        Args:
+            version: exact version of the server jar, the server refuses any other
+        """
+        self.version = version
+
+    def server_args(self, client: "Client") -> List[str]:
+        """
+        Arguments after the server class name
+
+        Args:
+            client: client launching the server
+        """
+        raise NotImplementedError
+
+    def read_device_meta(self, video_socket: socket.socket) -> Tuple[str, Tuple[int, int]]:
+        """
+        Read the handshake that follows the dummy byte on the video socket
+
+        Returns:
+            (device name, resolution)
+        """
+        device_name = _recv_exact(video_socket, 64).decode("utf-8").rstrip("\x00")
+        if not len(device_name):
+            raise ConnectionError("Did not receive Device Name!")
+        return device_name, self._read_video_meta(video_socket)
+
+    def _read_video_meta(self, video_socket: socket.socket) -> Tuple[int, int]:
+        raise NotImplementedError
+
+    def frame_pts(self, value: int) -> Optional[int]:
+        """
+        pts of a frame meta header, None for config packets
+
+        Args:
+            value: first field of the header read as int64
+        """
+        raise NotImplementedError
+
+    def touch(self, action: int, touch_id: int, x: int, y: int, width: int, height: int) -> bytes:
+        raise NotImplementedError
+
+    def scroll(self, x: int, y: int, width: int, height: int, h: int, v: int) -> bytes:
+        raise NotImplementedError
+
+    def get_clipboard(self) -> bytes:
+        raise NotImplementedError
+
+    def set_clipboard(self, text: str, paste: bool) -> bytes:
+        raise NotImplementedError
+
+
+class ProtocolV1(ServerProtocol):
+    """
+    Positional arguments, resolution handshake, h264 only
+    """
+
+    def server_args(self, client: "Client") -> List[str]:
+        return [
+            self.version,  # Scrcpy server version
+            "info",  # Log level: info, verbose...
+            f"{client.max_width}",  # Max screen width (long side)
+            f"{client.bitrate}",  # Bitrate of video
+            f"{client.max_fps}",  # Max frame per second
+            f"{client.lock_screen_orientation}",  # Lock screen orientation: LOCK_SCREEN_ORIENTATION
+            _bool(client.tunnel_forward),  # Tunnel forward
+            "-",  # Crop screen
+            _bool(client.frame_meta),  # Send frame meta (pts and size) to client
+            "true",  # Control enabled
+            "0",  # Display id
+            "false",  # Show touches
+            _bool(client.stay_awake),  # Stay awake
+            client.codec_options or "-",  # Codec (video encoding) options
+            client.encoder_name or "-",  # Encoder name
+            "false",  # Power off screen after server closed
+        ]
+
+    def _read_video_meta(self, video_socket: socket.socket) -> Tuple[int, int]:
+        return struct.unpack(">HH", _recv_exact(video_socket, 4))
+
+    def frame_pts(self, value: int) -> Optional[int]:
+        return None if value == -1 else value
+
+    def touch(self, action: int, touch_id: int, x: int, y: int, width: int, height: int) -> bytes:
+        return struct.pack(">BqiiHHHi", action, touch_id, x, y, width, height, 0xFFFF, 1)
+
+    def scroll(self, x: int, y: int, width: int, height: int, h: int, v: int) -> bytes:
+        return struct.pack(">iiHHii", x, y, width, height, h, v)
+
+    def get_clipboard(self) -> bytes:
+        return b""
+
+    def set_clipboard(self, text: str, paste: bool) -> bytes:
+        buffer = text.encode("utf-8")
+        return struct.pack(">?i", paste, len(buffer)) + buffer
+
+
+class ProtocolV2(ServerProtocol):
+    """
+    key=value arguments, codec meta handshake, flags in the frame meta pts,
+    audio is turned off so the sockets are still video then control
+    """
+
+    video_codecs = (VIDEO_CODEC_H264, VIDEO_CODEC_H265, VIDEO_CODEC_AV1)
+
+    def __init__(self, version: str):
+        super().__init__(version)
+        self.video_codec = VIDEO_CODEC_H264
+
+    def server_args(self, client: "Client") -> List[str]:
+        self.video_codec = client.video_codec
+        args = [
+            self.version,
+            "log_level=info",
+            f"video_codec={client.video_codec}",
+            f"max_size={client.max_width}",
+            f"video_bit_rate={client.bitrate}",
+            f"tunnel_forward={_bool(client.tunnel_forward)}",
+            "audio=false",
+            "control=true",
+            f"send_frame_meta={_bool(client.frame_meta)}",
+            f"stay_awake={_bool(client.stay_awake)}",
+            "power_off_on_close=false",
+            "clipboard_autosync=false",
+        ]
+        if client.max_fps:
+            args.append(f"max_fps={client.max_fps}")
+        if client.lock_screen_orientation != LOCK_SCREEN_ORIENTATION_UNLOCKED:
+            args.append(f"lock_video_orientation={client.lock_screen_orientation}")
+        if client.codec_options:
+            args.append(f"video_codec_options={client.codec_options}")
+        if client.encoder_name:
+            args.append(f"video_encoder={client.encoder_name}")
+        return args
+
+    def _read_video_meta(self, video_socket: socket.socket) -> Tuple[int, int]:
+        codec_id, width, height = struct.unpack(">III", _recv_exact(video_socket, 12))
+        if codec_id != _CODEC_IDS[self.video_codec]:
+            raise ConnectionError(f"Server sent codec {codec_id:#x}, expected {self.video_codec}")
+        return width, height
+
+    def frame_pts(self, value: int) -> Optional[int]:
+        # bit 63 config packet, bit 62 key frame
+        return None if value < 0 else value & _PTS_MASK
+
+    def touch(self, action: int, touch_id: int, x: int, y: int, width: int, height: int) -> bytes:
+        # action button then buttons, primary button while pressed
+        return struct.pack(">BqiiHHHii", action, touch_id, x, y, width, height, 0xFFFF, 1, 1)
+
+    def scroll(self, x: int, y: int, width: int, height: int, h: int, v: int) -> bytes:
+        # Scroll amounts are signed 16 bits fixed point in [-1, 1], one unit is 1/16
+        def fixed(value: int) -> int:
+            value = min(max(value / 16, -1.0), 1.0)
+            return min(int(value * 0x8000), 0x7FFF)
+
+        return struct.pack(">iiHHhhi", x, y, width, height, fixed(h), fixed(v), 0)
+
+    def get_clipboard(self) -> bytes:
+        # Copy key: none
+        return b"\x00"
+
+    def set_clipboard(self, text: str, paste: bool) -> bytes:
+        # Sequence 0: no acknowledgement requested
+        buffer = text.encode("utf-8")
+        return struct.pack(">q?i", 0, paste, len(buffer)) + buffer
+
+
+def get_protocol(version: str) -> ServerProtocol:
+    """
+    Protocol of a server version
+
+    Args:
+        version: server jar version, 1.20 or one of V2_VERSIONS
+    """
+    major = int(version.split(".")[0])
+    if major < 2:
+        assert version == "1.20", "only the 1.20 server of the 1.x line is supported"
+        return ProtocolV1(version)
+    assert version in V2_VERSIONS, f"supported 2.x servers are {', '.join(V2_VERSIONS)}"
+    return ProtocolV2(version)
@@ -0,0 +1,232 @@
+"""
+Shared reactor: one selector thread reads every video socket and hands complete
+access units to a fixed-size pool of decode workers
+"""
+
+import queue
+import selectors
+import socket
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from .nalu import is_keyframe
+
+if TYPE_CHECKING:
+    from .core import Client
+
+# Socket reads waiting for a decode worker, beyond this the worker can't keep up
+# and the client skips to its next key frame instead of falling further behind
+_QUEUE_SIZE = 64
+
+
+class _DecodeWorker:
+    def __init__(self, name: str):
+        self.queue: "queue.Queue" = queue.Queue(_QUEUE_SIZE)
+        self.clients = 0
+        # Packets dropped because the queue was full, and the clients waiting for a key frame,
+        # only touched by the selector thread
+        self.dropped = 0
+        self.__skipping: set = set()
+        self.thread = threading.Thread(target=self.__run, name=name, daemon=True)
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def stop(self) -> None:
+        # Blocks while the queue is full, the worker keeps draining it
+        self.queue.put(None)
+        self.thread.join()
+
+    def submit(self, client: "Client", packets: list, received_at=None) -> None:
+        """
+        Queue packets without blocking the selector thread, when the queue is full the client's
+        packets are dropped until the next key frame so the decoder never misses a reference
+        """
+        if client in self.__skipping:
+            for i, packet in enumerate(packets):
+                if is_keyframe(bytes(packet), client.video_codec):
+                    self.dropped += i
+                    packets = packets[i:]
+                    break
+            else:
+                self.dropped += len(packets)
+                return
+        try:
+            self.queue.put_nowait((client, packets, received_at))
+        except queue.Full:
+            self.dropped += len(packets)
+            self.__skipping.add(client)
+            return
+        self.__skipping.discard(client)
+
+    def forget(self, client: "Client") -> None:
+        self.__skipping.discard(client)
+
+    def __run(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            client, packets, received_at = item
+            for packet in packets:
+                if not client.alive:
+                    break
+                client._decode_video(packet, received_at)
+
+
+class Reactor:
+    def __init__(self, decode_workers: int = 2, name: str = "scrcpy_reactor"):
+        """
+        Create a reactor, clients are attached with Client.start(reactor=...)
+
+        Args:
+            decode_workers: number of decode threads shared by all clients
+            name: thread name prefix
+        """
+        assert decode_workers > 0, "decode_workers must be greater than 0"
+
+        self.name = name
+        self.alive = False
+        self.workers = [
+            _DecodeWorker(f"{name}_decode_{i}") for i in range(decode_workers)
+        ]
+
+        self.__selector = selectors.DefaultSelector()
+        self.__lock = threading.Lock()
+        self.__pending: List[tuple] = []
+        # Client: (worker, last read time)
+        self.__clients: Dict["Client", list] = {}
+        self.__wakeup_r, self.__wakeup_w = socket.socketpair()
+        self.__wakeup_r.setblocking(False)
+        self.__wakeup_w.setblocking(False)
+        self.__thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Start the selector thread and decode workers
+        """
+        assert self.alive is False
+        self.alive = True
+        for worker in self.workers:
+            worker.start()
+        self.__selector.register(self.__wakeup_r, selectors.EVENT_READ)
+        self.__thread = threading.Thread(
+            target=self.__io_loop, name=f"{self.name}_io", daemon=True
+        )
+        self.__thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the reactor, attached clients are not stopped
+        """
+        if not self.alive:
+            return
+        self.alive = False
+        self.__wakeup()
+        self.__thread.join()
+        for worker in self.workers:
+            worker.stop()
+        self.__selector.close()
+        self.__wakeup_r.close()
+        self.__wakeup_w.close()
+
+    def register(self, client: "Client") -> None:
+        """
+        Attach a started client, it is pinned to the least loaded decode worker
+        so its access units are always decoded in order
+
+        Args:
+            client: client with a connected video socket
+        """
+        with self.__lock:
+            self.__pending.append(("register", client))
+        self.__wakeup()
+
+    def unregister(self, client: "Client") -> None:
+        """
+        Detach a client, safe to call from any thread
+
+        Args:
+            client: attached client
+        """
+        with self.__lock:
+            self.__pending.append(("unregister", client))
+        self.__wakeup()
+
+    def __wakeup(self) -> None:
+        try:
+            self.__wakeup_w.send(b"\x00")
+        except (BlockingIOError, OSError):
+            pass
+
+    def __apply_pending(self) -> None:
+        with self.__lock:
+            pending, self.__pending = self.__pending, []
+        for action, client in pending:
+            if action == "register" and client not in self.__clients:
+                if not client.alive:
+                    continue
+                try:
+                    self.__selector.register(
+                        client.video_socket, selectors.EVENT_READ, client
+                    )
+                except (KeyError, ValueError):
+                    continue
+                worker = min(self.workers, key=lambda w: w.clients)
+                worker.clients += 1
+                self.__clients[client] = [worker, time.monotonic()]
+            elif action == "unregister" and client in self.__clients:
+                self.__drop(client)
+
+    def __drop(self, client: "Client") -> None:
+        worker, _ = self.__clients.pop(client)
+        worker.clients -= 1
+        worker.forget(client)
+        try:
+            self.__selector.unregister(client.video_socket)
+        except (KeyError, ValueError):
+            pass
+
+    def __io_loop(self) -> None:
+        while self.alive:
+            timeout = min(
+                (c.idle_interval for c in self.__clients), default=None
+            )
+            for key, _ in self.__selector.select(timeout):
+                if key.fileobj is self.__wakeup_r:
+                    try:
+                        while self.__wakeup_r.recv(1024):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                self.__read(key.data)
+            self.__apply_pending()
+            self.__check_idle()
+
+    def __read(self, client: "Client") -> None:
+        state = self.__clients.get(client)
+        if state is None:
+            return
+        try:
+            raw_h264 = client._recv_video()
+        except (ConnectionError, OSError, ValueError):
+            self.__drop(client)
+            if client.alive:
+                client._on_disconnect()
+            return
+        if raw_h264 is None:
+            return
+        state[1] = time.monotonic()
+        received_at = client.received_at
+        packets = client._parse_video(raw_h264)
+        if packets:
+            state[0].submit(client, packets, received_at)
+
+    def __check_idle(self) -> None:
+        now = time.monotonic()
+        for client, state in list(self.__clients.items()):
+            if now - state[1] >= client.idle_interval:
+                state[1] = now
+                client._on_idle()
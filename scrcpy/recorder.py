@@ -0,0 +1,145 @@
+"""
+Record the encoded stream of a client to MP4/MKV without decoding or re-encoding
+"""
+
+import threading
+from fractions import Fraction
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, Optional
+
+import av
+from av import Packet
+
+from .const import EVENT_INIT, EVENT_PACKET, VIDEO_CODEC_AV1, VIDEO_CODEC_H264, VIDEO_CODEC_H265
+from .nalu import is_keyframe
+
+if TYPE_CHECKING:
+    from .core import Client
+
+# Recordings keep the device clock, unit is us
+_TIME_BASE = Fraction(1, 1000000)
+# Gap inserted between two server sessions of the same recording
+_RESTART_GAP = 33333
+
+_STREAM_CODECS = {
+    VIDEO_CODEC_H264: "h264",
+    VIDEO_CODEC_H265: "hevc",
+    VIDEO_CODEC_AV1: "av1",
+}
+
+
+class Recorder:
+    def __init__(self, client: "Client", path: str, container_format: Optional[str] = None):
+        """
+        Remux the access units of a client into a file, it taps the packets before decoding
+        so the decode path is untouched when no recorder is attached
+
+        Args:
+            client: scrcpy client, may be started before or after the recorder
+            path: output file, the container is chosen from the extension (.mkv, .mp4)
+            container_format: force a container format, e.g. matroska or mp4
+        """
+        self.client = client
+        self.path = path
+        self.container_format = container_format
+        self.recording = False
+
+        # Written packets and bytes
+        self.packets = 0
+        self.bytes = 0
+
+        self.__lock = threading.Lock()
+        self.__container: Optional[Any] = None
+        self.__stream: Optional[Any] = None
+        # The file must start with a key frame, and restart on one after a server restart
+        self.__waiting_keyframe = True
+        self.__pts_base: Optional[int] = None
+        self.__pts_offset = 0
+        self.__last_pts = -1
+
+    def start(self) -> None:
+        """
+        Start recording, the file is created on the next key frame
+        """
+        assert self.recording is False
+        if not hasattr(av.container.OutputContainer, "add_mux_stream"):
+            # Older PyAV only has add_stream, which opens an encoder h265/av1 builds may lack
+            raise RuntimeError(f"Recording needs PyAV 14 or newer, found {av.__version__}")
+        self.recording = True
+        self.client.add_listener(EVENT_INIT, self.__on_init)
+        self.client.add_listener(EVENT_PACKET, self.__on_packet)
+
+    def stop(self) -> None:
+        """
+        Stop recording and write the file trailer
+        """
+        if not self.recording:
+            return
+        self.client.remove_listener(EVENT_PACKET, self.__on_packet)
+        self.client.remove_listener(EVENT_INIT, self.__on_init)
+        with self.__lock:
+            self.recording = False
+            if self.__container is not None:
+                self.__container.close()
+                self.__container = None
+
+    def __on_init(self) -> None:
+        # A new server session: timestamps start over, continue after the last packet
+        with self.__lock:
+            self.__waiting_keyframe = True
+            self.__pts_base = None
+            self.__pts_offset = self.__last_pts + _RESTART_GAP
+
+    def __on_packet(self, packet: Any) -> None:
+        data = bytes(packet)
+        with self.__lock:
+            if not self.recording:
+                return
+            keyframe = is_keyframe(data, self.client.video_codec)
+            if self.__waiting_keyframe:
+                if not keyframe:
+                    return
+                config = self.client.codec_config
+                if config and not data.startswith(config):
+                    # Only the first key frame of a session carries SPS/PPS
+                    data = config + data
+                if self.__container is None:
+                    self.__open()
+                self.__waiting_keyframe = False
+
+            out = Packet(data)
+            out.stream = self.__stream
+            out.pts = out.dts = self.__timestamp(packet.pts)
+            out.time_base = _TIME_BASE
+            out.is_keyframe = keyframe
+            self.__container.mux(out)
+            self.packets += 1
+            self.bytes += len(data)
+
+    def __timestamp(self, pts: Optional[int]) -> int:
+        """
+        Device pts with frame meta, arrival time otherwise, rebased to start at 0
+
+        Args:
+            pts: packet pts in us or None
+        """
+        if pts is None:
+            pts = int(perf_counter() * 1000000)
+        if self.__pts_base is None:
+            self.__pts_base = pts - self.__pts_offset
+        pts = max(pts - self.__pts_base, self.__last_pts + 1)
+        self.__last_pts = pts
+        return pts
+
+    def __open(self) -> None:
+        """
+        Create the container with one video stream copied as is
+        """
+        container = av.open(self.path, mode="w", format=self.container_format)
+        codec_name = _STREAM_CODECS[self.client.video_codec]
+        width, height = self.client.resolution
+        # No encoder is opened for this stream, packets are written as they are
+        stream = container.add_mux_stream(codec_name, width=width, height=height)
+        stream.time_base = _TIME_BASE
+        self.__container = container
+        self.__stream = stream
@@ -0,0 +1,453 @@
+"""
+Relay the encoded stream of clients to WebSocket viewers without decoding.
+
+Every client is a channel at ws://host:port/<name>. A viewer first gets a JSON text
+message (device name, resolution, codec and the WebCodecs codec string), then one binary
+message per access unit: a flags byte (1 for key frames) and the Annex B bytes.
+A joining viewer gets the parameter sets and the current GOP at once, so it shows the
+current picture immediately. A viewer that falls behind is flushed and resumes at the
+next key frame, the device socket never waits for a viewer.
+GET /<name> without upgrade serves a minimal WebCodecs page, GET / lists the channels.
+"""
+
+import asyncio
+import base64
+import hashlib
+import html
+import json
+import struct
+import threading
+from collections import deque
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional, Set
+from urllib.parse import quote, unquote
+
+from .const import EVENT_INIT, EVENT_PACKET, VIDEO_CODEC_H264
+from .nalu import avc_codec_string, is_keyframe
+
+if TYPE_CHECKING:
+    from .core import Client
+
+_WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_OP_TEXT = 0x1
+_OP_BINARY = 0x2
+_OP_CLOSE = 0x8
+_OP_PING = 0x9
+_OP_PONG = 0xA
+# RFC 6455 limit of control frame payloads, the only frames viewers send
+_CONTROL_MAX = 125
+
+# Bytes of the current GOP kept for joining viewers, beyond that they only get the key frame
+_GOP_LIMIT = 0x200000
+# Bytes queued or in the socket buffer of a viewer before it is flushed to the next key frame,
+# above _GOP_LIMIT so a joining viewer has time to take the GOP
+_PENDING_LIMIT = 0x400000
+
+_PAGE = """<!doctype html>
+<meta charset="utf-8"><title>{title}</title>
+<body style="margin:0;background:#000;display:flex;justify-content:center">
+<canvas id="screen" style="max-height:100vh"></canvas>
+<script>
+const canvas = document.getElementById("screen");
+const context = canvas.getContext("2d");
+const ws = new WebSocket(`ws://${location.host}${location.pathname}`);
+ws.binaryType = "arraybuffer";
+let decoder = null;
+let timestamp = 0;
+ws.onmessage = (event) => {
+  if (typeof event.data === "string") {
+    const meta = JSON.parse(event.data);
+    document.title = meta.device_name;
+    if (decoder) decoder.close();
+    decoder = null;
+    if (!meta.codec_string) return;
+    decoder = new VideoDecoder({
+      output: (frame) => {
+        canvas.width = frame.displayWidth;
+        canvas.height = frame.displayHeight;
+        context.drawImage(frame, 0, 0);
+        frame.close();
+      },
+      error: (e) => console.error(e),
+    });
+    decoder.configure({ codec: meta.codec_string, optimizeForLatency: true });
+    return;
+  }
+  if (!decoder || decoder.state !== "configured") return;
+  const data = new Uint8Array(event.data);
+  decoder.decode(new EncodedVideoChunk({
+    type: data[0] & 1 ? "key" : "delta",
+    timestamp: timestamp++,
+    data: data.subarray(1),
+  }));
+};
+</script>
+"""
+
+
+def _ws_frame(opcode: int, payload: bytes) -> bytes:
+    """
+    Unmasked server frame
+    """
+    size = len(payload)
+    if size < 126:
+        header = struct.pack(">BB", 0x80 | opcode, size)
+    elif size < 0x10000:
+        header = struct.pack(">BBH", 0x80 | opcode, 126, size)
+    else:
+        header = struct.pack(">BBQ", 0x80 | opcode, 127, size)
+    return header + payload
+
+
+class _Subscriber:
+    def __init__(self, writer: asyncio.StreamWriter, pending_limit: int):
+        self.writer = writer
+        self.pending_limit = pending_limit
+        self.queue: Deque[bytes] = deque()
+        self.pending = 0
+        self.ready = asyncio.Event()
+        self.waiting_keyframe = False
+        self.closed = False
+
+        # Sent and dropped access units
+        self.sent = 0
+        self.dropped = 0
+
+    def send(self, message: bytes) -> None:
+        """
+        Queue a WebSocket frame, never dropped
+        """
+        self.queue.append(message)
+        self.pending += len(message)
+        self.ready.set()
+
+    def drop_units(self) -> None:
+        """
+        Remove the queued access units, meta and control replies stay queued
+        """
+        kept = deque(m for m in self.queue if m[0] & 0x0F != _OP_BINARY)
+        self.dropped += len(self.queue) - len(kept)
+        self.queue = kept
+        self.pending = sum(len(m) for m in kept)
+
+    def offer(self, message: bytes, keyframe: bool) -> None:
+        """
+        Queue the frame of an access unit unless the viewer is behind, then flush and
+        wait for a key frame. The frame is shared by all viewers
+        """
+        if self.closed:
+            return
+        if not self.waiting_keyframe:
+            behind = self.pending + self.writer.transport.get_write_buffer_size()
+            if behind > self.pending_limit:
+                self.drop_units()
+                self.waiting_keyframe = True
+        if self.waiting_keyframe:
+            if not keyframe:
+                self.dropped += 1
+                return
+            self.waiting_keyframe = False
+        self.send(message)
+        self.sent += 1
+
+    async def run(self) -> None:
+        try:
+            while not self.closed:
+                await self.ready.wait()
+                self.ready.clear()
+                while self.queue:
+                    message = self.queue.popleft()
+                    self.pending -= len(message)
+                    self.writer.write(message)
+                    await self.writer.drain()
+        except ConnectionError:
+            self.closed = True
+
+
+class _Channel:
+    def __init__(self, relay: "Relay", name: str, client: "Client"):
+        self.relay = relay
+        self.name = name
+        self.client = client
+        self.meta: Dict[str, Any] = {}
+        # Frames of the key frame with parameter sets and the rest of its GOP
+        self.gop: List[bytes] = []
+        self.gop_bytes = 0
+        self.gop_complete = False
+        self.subscribers: Set[_Subscriber] = set()
+        self.packets = 0
+        # Access units dropped for viewers that left
+        self.dropped = 0
+
+    def reset(self, meta: Dict[str, Any]) -> None:
+        """
+        New server session, viewers reconfigure their decoder and wait for its first key frame
+        """
+        self.meta = meta
+        self.gop = []
+        self.gop_bytes = 0
+        message = self.__meta_message()
+        for subscriber in self.subscribers:
+            subscriber.drop_units()
+            subscriber.send(message)
+            subscriber.waiting_keyframe = True
+
+    def __meta_message(self) -> bytes:
+        return _ws_frame(_OP_TEXT, json.dumps(self.meta).encode("utf-8"))
+
+    def publish(self, data: bytes, keyframe: bool) -> None:
+        """
+        Fan out an access unit, called in the relay loop
+
+        Args:
+            data: access unit, key frames start with the parameter sets
+            keyframe: whether it is a key frame
+        """
+        self.packets += 1
+        if keyframe and self.meta.get("codec") == VIDEO_CODEC_H264:
+            # The parameter sets are only known from the first key frame of a session
+            codec_string = avc_codec_string(data)
+            if codec_string and codec_string != self.meta.get("codec_string"):
+                self.meta["codec_string"] = codec_string
+                message = self.__meta_message()
+                for subscriber in self.subscribers:
+                    subscriber.send(message)
+
+        message = _ws_frame(_OP_BINARY, (b"\x01" if keyframe else b"\x00") + data)
+        if keyframe:
+            self.gop = [message]
+            self.gop_bytes = len(message)
+            self.gop_complete = True
+        elif self.gop and self.gop_complete:
+            if self.gop_bytes + len(message) > _GOP_LIMIT:
+                self.gop_complete = False
+            else:
+                self.gop.append(message)
+                self.gop_bytes += len(message)
+        for subscriber in self.subscribers:
+            subscriber.offer(message, keyframe)
+
+    def subscribe(self, subscriber: _Subscriber) -> None:
+        if self.meta:
+            subscriber.send(self.__meta_message())
+        for message in self.gop:
+            subscriber.send(message)
+            subscriber.sent += 1
+        # Without the whole GOP the next delta frame can't be decoded
+        subscriber.waiting_keyframe = not (self.gop and self.gop_complete)
+        self.subscribers.add(subscriber)
+
+
+class Relay:
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, pending_limit: int = _PENDING_LIMIT):
+        """
+        WebSocket fan out of client packets, runs an asyncio loop in its own thread
+
+        Args:
+            host: listen address
+            port: listen port, 0 picks a free one (see port after start)
+            pending_limit: bytes a viewer may be behind before it skips to the next key frame
+        """
+        self.host = host
+        self.port = port
+        self.pending_limit = pending_limit
+        self.channels: Dict[str, _Channel] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.__server: Optional[asyncio.AbstractServer] = None
+        self.__thread: Optional[threading.Thread] = None
+        self.__listeners: Dict[str, tuple] = {}
+
+    def start(self) -> None:
+        assert self.__thread is None
+        started = threading.Event()
+        self.loop = asyncio.new_event_loop()
+
+        def run() -> None:
+            asyncio.set_event_loop(self.loop)
+            self.__server = self.loop.run_until_complete(
+                asyncio.start_server(self.__on_connection, self.host, self.port)
+            )
+            self.port = self.__server.sockets[0].getsockname()[1]
+            started.set()
+            self.loop.run_forever()
+            self.__server.close()
+            self.loop.run_until_complete(self.__server.wait_closed())
+            self.loop.close()
+
+        self.__thread = threading.Thread(target=run, name="scrcpy_relay", daemon=True)
+        self.__thread.start()
+        started.wait()
+
+    def stop(self) -> None:
+        for name in list(self.__listeners):
+            self.remove_client(name)
+        if self.__thread is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.__thread.join()
+            self.__thread = None
+
+    def add_client(self, name: str, client: "Client") -> None:
+        """
+        Relay a client as channel name, before or after it starts. The packets are tapped
+        from the parser so the decode path is untouched
+
+        Args:
+            name: channel name, usually the device serial
+            client: scrcpy client
+        """
+        assert self.loop is not None, "start the relay first"
+        assert name not in self.__listeners, f"{name} is already relayed"
+        channel = _Channel(self, name, client)
+
+        def on_init() -> None:
+            meta = self.__meta(client)
+            self.loop.call_soon_threadsafe(channel.reset, meta)
+
+        def on_packet(packet: Any) -> None:
+            data = bytes(packet)
+            keyframe = is_keyframe(data, client.video_codec)
+            if keyframe:
+                config = client.codec_config
+                if config and not data.startswith(config):
+                    data = config + data
+            self.loop.call_soon_threadsafe(channel.publish, data, keyframe)
+
+        client.add_listener(EVENT_INIT, on_init)
+        client.add_listener(EVENT_PACKET, on_packet)
+        self.__listeners[name] = (client, on_init, on_packet)
+        self.channels[name] = channel
+        if client.alive:
+            on_init()
+
+    def remove_client(self, name: str) -> None:
+        listeners = self.__listeners.pop(name, None)
+        if listeners is None:
+            return
+        client, on_init, on_packet = listeners
+        client.remove_listener(EVENT_INIT, on_init)
+        client.remove_listener(EVENT_PACKET, on_packet)
+        channel = self.channels.pop(name)
+        self.loop.call_soon_threadsafe(self.__close_channel, channel)
+
+    def stats(self) -> Dict[str, dict]:
+        """
+        Per channel packets, dropped access units of all viewers so far and
+        sent/dropped of the current viewers
+        """
+        return {
+            name: dict(
+                packets=channel.packets,
+                dropped=channel.dropped + sum(s.dropped for s in list(channel.subscribers)),
+                viewers=[dict(sent=s.sent, dropped=s.dropped) for s in list(channel.subscribers)],
+            )
+            for name, channel in list(self.channels.items())
+        }
+
+    @staticmethod
+    def __meta(client: "Client") -> Dict[str, Any]:
+        return dict(
+            device_name=client.device_name,
+            resolution=list(client.resolution) if client.resolution else None,
+            codec=client.video_codec,
+            # Filled from the SPS of the first key frame, WebCodecs only decodes h264 here
+            codec_string=None,
+        )
+
+    def __close_channel(self, channel: _Channel) -> None:
+        for subscriber in channel.subscribers:
+            subscriber.closed = True
+            subscriber.ready.set()
+            subscriber.writer.close()
+        channel.subscribers.clear()
+
+    async def __on_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        lines = request.decode("latin-1").split("\r\n")
+        parts = lines[0].split(" ")
+        path = unquote(parts[1]) if len(parts) > 1 else "/"
+        headers = {}
+        for line in lines[1:]:
+            key, _, value = line.partition(":")
+            headers[key.strip().lower()] = value.strip()
+        name = path.strip("/")
+
+        if headers.get("upgrade", "").lower() != "websocket":
+            self.__serve_page(writer, name)
+            await writer.drain()
+            writer.close()
+            return
+
+        channel = self.channels.get(name)
+        if channel is None:
+            writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n")
+            writer.close()
+            return
+        accept = base64.b64encode(
+            hashlib.sha1(headers.get("sec-websocket-key", "").encode("ascii") + _WS_GUID).digest()
+        )
+        writer.write(
+            b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n"
+        )
+
+        subscriber = _Subscriber(writer, self.pending_limit)
+        channel.subscribe(subscriber)
+        sender = asyncio.ensure_future(subscriber.run())
+        try:
+            await self.__read_viewer(reader, subscriber)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            subscriber.closed = True
+            subscriber.ready.set()
+            if subscriber in channel.subscribers:
+                channel.subscribers.discard(subscriber)
+                channel.dropped += subscriber.dropped
+            sender.cancel()
+            writer.close()
+
+    @staticmethod
+    async def __read_viewer(reader: asyncio.StreamReader, subscriber: _Subscriber) -> None:
+        """
+        Viewers only send control frames, answer pings until the close frame. Anything
+        else (data, fragments, payloads over 125 bytes) closes the connection before
+        its payload is read
+        """
+        while True:
+            head = await reader.readexactly(2)
+            opcode = head[0] & 0x0F
+            size = head[1] & 0x7F
+            if not head[0] & 0x80 or opcode < _OP_CLOSE or size > _CONTROL_MAX:
+                return
+            mask = await reader.readexactly(4) if head[1] & 0x80 else b"\x00\x00\x00\x00"
+            payload = await reader.readexactly(size)
+            if size:
+                key = int.from_bytes((mask * (size // 4 + 1))[:size], "big")
+                payload = (int.from_bytes(payload, "big") ^ key).to_bytes(size, "big")
+            if opcode == _OP_CLOSE:
+                # Written directly, the sender is cancelled when this returns
+                subscriber.writer.write(_ws_frame(_OP_CLOSE, payload[:2]))
+                return
+            if opcode == _OP_PING:
+                subscriber.send(_ws_frame(_OP_PONG, payload))
+
+    def __serve_page(self, writer: asyncio.StreamWriter, name: str) -> None:
+        if name in self.channels:
+            body = _PAGE.replace("{title}", html.escape(name))
+        elif not name:
+            links = "".join(
+                f'<li><a href="/{quote(n)}">{html.escape(n)}</a></li>' for n in self.channels
+            )
+            body = f'<!doctype html><meta charset="utf-8"><title>ccscrcpy</title><ul>{links}</ul>'
+        else:
+            writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n\r\n")
+            return
+        data = body.encode("utf-8")
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n"
+            + f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("ascii")
+            + data
+        )
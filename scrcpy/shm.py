@@ -0,0 +1,254 @@
+"""
+Shared memory ring of decoded frames: one process writes, any number of local
+processes map the slots zero copy.
+
+Layout: a 64 bytes ring header, then per slot a 64 bytes slot header followed by the pixels.
+Every slot header is a seqlock, the sequence is odd while the writer copies a frame
+"""
+
+import re
+import struct
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+MAGIC = 0x53434346  # "FCCS"
+VERSION = 1
+# Pixel format codes, only bgr24 is produced by the client
+FORMAT_BGR24 = 0x33524742  # "BGR3"
+
+# magic, version, slots, slot capacity, latest frame number, closed by the writer
+_RING = struct.Struct("<IIIQQI")
+_LATEST_OFFSET = 20
+_CLOSED_OFFSET = 28
+# sequence (seqlock), frame number, width, height, format, pts
+_SLOT = struct.Struct("<QQIIIq")
+_HEADER_SIZE = 64
+# Prefix of the rings published per device
+RING_PREFIX = "ccscrcpy_"
+
+
+def _align(size: int) -> int:
+    return (size + 63) & ~63
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """
+    Map an existing block without letting this process' resource tracker unlink it on exit
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            from multiprocessing import resource_tracker
+
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+
+def ring_name(serial: str) -> str:
+    """
+    Shared memory name of the ring a device is published to, keep serials short on macOS
+    where names are limited to 31 characters
+    """
+    return RING_PREFIX + re.sub(r"[^\w]", "_", serial)
+
+
+class FrameRing:
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        """
+        Use create or attach instead
+        """
+        self.shm = shm
+        self.owner = owner
+        magic, version, self.slots, self.capacity, _, _ = _RING.unpack_from(shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{shm.name} is not a frame ring")
+        self.slot_size = _HEADER_SIZE + _align(self.capacity)
+        self.__written = 0
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @classmethod
+    def create(cls, capacity: int, slots: int = 4, name: Optional[str] = None) -> "FrameRing":
+        """
+        Allocate a ring, the creator owns it and unlinks it on close
+
+        Args:
+            capacity: max bytes of one frame
+            slots: frames kept, readers have slots - 1 frames of time before a slot is reused
+            name: shared memory name, random if None
+        """
+        assert capacity > 0 and slots > 1
+        size = _HEADER_SIZE + slots * (_HEADER_SIZE + _align(capacity))
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[:size] = bytes(size)
+        _RING.pack_into(shm.buf, 0, MAGIC, VERSION, slots, capacity, 0, 0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def create_or_replace(cls, capacity: int, slots: int, name: str) -> "FrameRing":
+        """
+        Create a named ring, removing a block left behind by a process that did not close it
+        """
+        try:
+            return cls.create(capacity, slots, name)
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            return cls.create(capacity, slots, name)
+
+    @classmethod
+    def attach(cls, name: str) -> "FrameRing":
+        """
+        Map a ring created by another process
+
+        Args:
+            name: shared memory name
+        """
+        return cls(_attach(name), owner=False)
+
+    @classmethod
+    def attach_device(cls, serial: str) -> "FrameRing":
+        """
+        Map the ring a device is published to, raises FileNotFoundError if it is not published
+
+        Args:
+            serial: device serial
+        """
+        return cls.attach(ring_name(serial))
+
+    def __slot_offset(self, slot: int) -> int:
+        return _HEADER_SIZE + slot * self.slot_size
+
+    def write(self, frame: np.ndarray, pts: int = -1) -> int:
+        """
+        Copy a frame into the next slot
+
+        Args:
+            frame: bgr24 image, any strides
+            pts: device timestamp in us, -1 if unknown
+
+        Returns:
+            frame number, starts at 1
+        """
+        height, width = frame.shape[:2]
+        size = height * width * 3
+        if size > self.capacity:
+            raise ValueError(f"frame of {size} bytes does not fit in slots of {self.capacity}")
+
+        number = self.__written + 1
+        offset = self.__slot_offset(number % self.slots)
+        buf = self.shm.buf
+        sequence = struct.unpack_from("<Q", buf, offset)[0]
+        struct.pack_into("<Q", buf, offset, sequence + 1)
+        target = np.ndarray(
+            (height, width, 3), dtype=np.uint8, buffer=buf, offset=offset + _HEADER_SIZE
+        )
+        np.copyto(target, frame)
+        _SLOT.pack_into(buf, offset, sequence + 2, number, width, height, FORMAT_BGR24, pts)
+        struct.pack_into("<Q", buf, _LATEST_OFFSET, number)
+        self.__written = number
+        return number
+
+    def latest(self) -> int:
+        """
+        Number of the last complete frame, 0 if none
+        """
+        return struct.unpack_from("<Q", self.shm.buf, _LATEST_OFFSET)[0]
+
+    @property
+    def closed(self) -> bool:
+        """
+        The writer is gone or replaced the ring, attach again by name to follow it
+        """
+        return struct.unpack_from("<I", self.shm.buf, _CLOSED_OFFSET)[0] != 0
+
+    def info(self, number: int) -> Optional[Tuple[int, int, int, int]]:
+        """
+        (sequence, width, height, pts) of a frame still in its slot, None if it was overwritten
+        or is being written
+        """
+        sequence, slot_number, width, height, _, pts = _SLOT.unpack_from(
+            self.shm.buf, self.__slot_offset(number % self.slots)
+        )
+        if sequence & 1 or slot_number != number:
+            return None
+        return sequence, width, height, pts
+
+    def view(self, number: int) -> Optional[np.ndarray]:
+        """
+        Zero copy view of a frame, check valid after use since the writer may reuse the slot.
+        Views of an attached ring are read only
+
+        Args:
+            number: frame number from write or latest
+        """
+        info = self.info(number)
+        if info is None:
+            return None
+        _, width, height, _ = info
+        frame = np.ndarray(
+            (height, width, 3),
+            dtype=np.uint8,
+            buffer=self.shm.buf,
+            offset=self.__slot_offset(number % self.slots) + _HEADER_SIZE,
+        )
+        if not self.owner:
+            frame.flags.writeable = False
+        return frame
+
+    def valid(self, number: int, sequence: int) -> bool:
+        """
+        Whether the slot still holds the frame seen with this sequence
+        """
+        info = self.info(number)
+        return info is not None and info[0] == sequence
+
+    def read(self, number: Optional[int] = None) -> Optional[Tuple[np.ndarray, int]]:
+        """
+        Consistent copy of a frame
+
+        Args:
+            number: frame number, the latest if None
+
+        Returns:
+            (bgr24 image, pts), None if the frame is gone
+        """
+        if number is None:
+            number = self.latest()
+        for _ in range(8):
+            info = self.info(number)
+            if info is None:
+                return None
+            sequence, _, _, pts = info
+            frame = self.view(number)
+            if frame is None:
+                return None
+            frame = frame.copy()
+            if self.valid(number, sequence):
+                return frame, pts
+        return None
+
+    def close(self) -> None:
+        """
+        Unmap, the owner also removes the block
+        """
+        if self.owner:
+            struct.pack_into("<I", self.shm.buf, _CLOSED_OFFSET, 1)
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+        try:
+            self.shm.close()
+        except BufferError:
+            # A view is still alive, the mapping goes away with it
+            pass
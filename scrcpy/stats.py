@@ -0,0 +1,92 @@
+"""
+Rolling latency histograms for the video pipeline
+"""
+
+import threading
+from collections import deque
+from typing import Dict, Tuple
+
+# Pipeline stages in order, total is from recv to paint
+STAGE_RECV = "recv"
+STAGE_PARSE = "parse"
+STAGE_DECODE = "decode"
+STAGE_CONVERT = "convert"
+STAGE_DISPATCH = "dispatch"
+STAGE_SIGNAL = "signal"
+STAGE_PAINT = "paint"
+STAGE_TOTAL = "total"
+
+STAGES = (
+    STAGE_RECV,
+    STAGE_PARSE,
+    STAGE_DECODE,
+    STAGE_CONVERT,
+    STAGE_DISPATCH,
+    STAGE_SIGNAL,
+    STAGE_PAINT,
+    STAGE_TOTAL,
+)
+
+
+class RollingHistogram:
+    def __init__(self, window: int = 512):
+        """
+        Keep the last samples of one stage
+
+        Args:
+            window: number of samples kept
+        """
+        self.samples: deque = deque(maxlen=window)
+        self.count = 0
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.count += 1
+
+    def percentiles(self, *quantiles: float) -> Tuple[float, ...]:
+        """
+        Percentiles of the kept samples, unit is ms
+
+        Args:
+            quantiles: values in [0, 100]
+        """
+        samples = sorted(self.samples)
+        if not samples:
+            return tuple(0.0 for _ in quantiles)
+        last = len(samples) - 1
+        return tuple(1000 * samples[round(last * q / 100)] for q in quantiles)
+
+
+class LatencyStats:
+    def __init__(self, window: int = 512):
+        """
+        Histograms of every pipeline stage, written by the decode and GUI threads
+
+        Args:
+            window: number of samples kept per stage
+        """
+        self.window = window
+        self.lock = threading.Lock()
+        self.histograms = {stage: RollingHistogram(window) for stage in STAGES}
+
+    def record(self, stage: str, seconds: float) -> None:
+        """
+        Add one sample
+
+        Args:
+            stage: STAGE_*
+            seconds: duration, unit is s
+        """
+        with self.lock:
+            self.histograms[stage].add(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        p50/p95/p99 in ms and sample count of every stage
+        """
+        with self.lock:
+            result = {}
+            for stage, histogram in self.histograms.items():
+                p50, p95, p99 = histogram.percentiles(50, 95, 99)
+                result[stage] = dict(p50=p50, p95=p95, p99=p99, count=histogram.count)
+            return result
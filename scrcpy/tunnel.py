@@ -0,0 +1,240 @@
+"""
+Reverse tunnel: the scrcpy server connects back to the host through adb reverse,
+one acceptor thread serves every device
+"""
+
+import selectors
+import socket
+import threading
+from typing import List, Optional, Tuple
+
+from adbutils import AdbDevice
+
+# adb reverse target ports, one port per device while it is connecting
+PORT_RANGE = (27183, 27299)
+
+
+class PendingTunnel:
+    def __init__(self, serial: str, server_socket: socket.socket, count: int):
+        """
+        Listening socket of one device, closed once all its connections are accepted
+
+        Args:
+            serial: device serial
+            server_socket: bound listening socket
+            count: number of connections the server opens (video, control)
+        """
+        self.serial = serial
+        self.server_socket = server_socket
+        self.port = server_socket.getsockname()[1]
+        self.count = count
+        self.sockets: List[socket.socket] = []
+        self.event = threading.Event()
+        self.error: Optional[Exception] = None
+        # Set once the port is given back, a later close must not free it again
+        self.released = False
+
+    def wait(self, timeout: float) -> List[socket.socket]:
+        """
+        Wait for the server to connect back, sockets are returned in connection order
+
+        Args:
+            timeout: unit is s
+        """
+        if not self.event.wait(timeout):
+            raise ConnectionError(
+                f"scrcpy-server of {self.serial} did not connect back after {timeout} s"
+            )
+        if self.error is not None:
+            raise ConnectionError(f"Reverse tunnel of {self.serial} failed: {self.error}")
+        return self.sockets
+
+
+class ReverseTunnelAcceptor:
+    def __init__(self, host: str = "127.0.0.1", port_range: Tuple[int, int] = PORT_RANGE):
+        """
+        One selector thread accepting the connections of every device in reverse tunnel mode.
+        The 1.20 server always connects to the same socket name, so devices are told apart
+        by the host port their adb reverse points to
+
+        Args:
+            host: listening address
+            port_range: inclusive range of ports handed out to devices
+        """
+        self.host = host
+        self.port_range = port_range
+        self.alive = False
+
+        self.__selector = selectors.DefaultSelector()
+        self.__lock = threading.Lock()
+        self.__pending: List[PendingTunnel] = []
+        self.__ports = set()
+        self.__wakeup_r, self.__wakeup_w = socket.socketpair()
+        self.__wakeup_r.setblocking(False)
+        self.__wakeup_w.setblocking(False)
+        self.__thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        assert self.alive is False
+        self.alive = True
+        self.__selector.register(self.__wakeup_r, selectors.EVENT_READ)
+        self.__thread = threading.Thread(
+            target=self.__accept_loop, name="scrcpy_reverse_tunnel", daemon=True
+        )
+        self.__thread.start()
+
+    def stop(self) -> None:
+        if not self.alive:
+            return
+        self.alive = False
+        self.__wakeup()
+        self.__thread.join()
+
+    def open(self, serial: str, count: int = 2) -> PendingTunnel:
+        """
+        Listen on a free port for one device
+
+        Args:
+            serial: device serial
+            count: number of connections expected
+        """
+        with self.__lock:
+            for port in range(self.port_range[0], self.port_range[1] + 1):
+                if port in self.__ports:
+                    continue
+                server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                try:
+                    server_socket.bind((self.host, port))
+                except OSError:
+                    server_socket.close()
+                    continue
+                server_socket.listen(count)
+                server_socket.setblocking(False)
+                tunnel = PendingTunnel(serial, server_socket, count)
+                self.__ports.add(port)
+                self.__pending.append(tunnel)
+                break
+            else:
+                raise ConnectionError("No free port for reverse tunnel")
+        self.__wakeup()
+        return tunnel
+
+    def close(self, tunnel: PendingTunnel) -> None:
+        """
+        Give the port back, sockets not yet accepted are dropped
+
+        Args:
+            tunnel: tunnel from open
+        """
+        with self.__lock:
+            self.__pending.append(tunnel)
+            tunnel.count = -1
+        self.__wakeup()
+
+    def __wakeup(self) -> None:
+        try:
+            self.__wakeup_w.send(b"\x00")
+        except (BlockingIOError, OSError):
+            pass
+
+    def __release(self, tunnel: PendingTunnel) -> None:
+        # Accepted tunnels are released by __accept and again by close, the port
+        # may belong to a newer tunnel by then
+        if tunnel.released:
+            return
+        tunnel.released = True
+        try:
+            self.__selector.unregister(tunnel.server_socket)
+        except (KeyError, ValueError):
+            pass
+        tunnel.server_socket.close()
+        with self.__lock:
+            self.__ports.discard(tunnel.port)
+
+    def __accept_loop(self) -> None:
+        while self.alive:
+            for key, _ in self.__selector.select():
+                if key.fileobj is self.__wakeup_r:
+                    try:
+                        while self.__wakeup_r.recv(1024):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                self.__accept(key.data)
+
+            with self.__lock:
+                pending, self.__pending = self.__pending, []
+            for tunnel in pending:
+                if tunnel.count < 0:
+                    self.__release(tunnel)
+                    continue
+                self.__selector.register(
+                    tunnel.server_socket, selectors.EVENT_READ, tunnel
+                )
+
+        for key in list(self.__selector.get_map().values()):
+            if isinstance(key.data, PendingTunnel):
+                key.data.error = ConnectionError("acceptor stopped")
+                key.data.event.set()
+                self.__release(key.data)
+        self.__selector.close()
+        self.__wakeup_r.close()
+        self.__wakeup_w.close()
+
+    def __accept(self, tunnel: PendingTunnel) -> None:
+        try:
+            conn, _ = tunnel.server_socket.accept()
+        except (BlockingIOError, OSError):
+            return
+        conn.setblocking(True)
+        tunnel.sockets.append(conn)
+        if len(tunnel.sockets) >= tunnel.count:
+            self.__release(tunnel)
+            tunnel.event.set()
+
+
+_default_acceptor: Optional[ReverseTunnelAcceptor] = None
+_default_acceptor_lock = threading.Lock()
+
+
+def default_acceptor() -> ReverseTunnelAcceptor:
+    """
+    Acceptor shared by every client that does not pass its own
+    """
+    global _default_acceptor
+    with _default_acceptor_lock:
+        if _default_acceptor is None:
+            _default_acceptor = ReverseTunnelAcceptor()
+            _default_acceptor.start()
+        return _default_acceptor
+
+
+def adb_reverse(device: AdbDevice, remote: str, local: str) -> None:
+    """
+    adb reverse remote local
+
+    Args:
+        device: adb device
+        remote: device side socket, e.g. localabstract:scrcpy
+        local: host side socket, e.g. tcp:27183
+    """
+    _reverse_command(device, f"reverse:forward:{remote};{local}")
+
+
+def adb_reverse_remove(device: AdbDevice, remote: str) -> None:
+    """
+    adb reverse --remove remote
+
+    Args:
+        device: adb device
+        remote: device side socket
+    """
+    _reverse_command(device, f"reverse:killforward:{remote}")
+
+
+def _reverse_command(device: AdbDevice, command: str) -> None:
+    with device.open_transport() as c:
+        c.send_command(command)
+        c.check_okay()
+        c.check_okay()
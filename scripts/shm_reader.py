@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+读取 CCScrcpy 发布到共享内存的设备画面（设置菜单 "共享内存发布" 或 device_publish_frames）
+
+用法：
+    python scripts/shm_reader.py <序列号>            # 打印帧率和时间戳
+    python scripts/shm_reader.py <序列号> --show     # 用 OpenCV 窗口显示
+
+读取方只映射共享内存，不占用投屏的解码线程；处理慢时只会跳过中间帧
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrcpy.shm import FrameRing  # noqa: E402
+
+
+def attach(serial):
+    """等待设备开始发布"""
+    while True:
+        try:
+            return FrameRing.attach_device(serial)
+        except FileNotFoundError:
+            time.sleep(0.5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="读取共享内存中的设备画面")
+    parser.add_argument("serial", help="设备序列号")
+    parser.add_argument("--show", action="store_true", help="显示画面")
+    args = parser.parse_args()
+
+    if args.show:
+        import cv2
+
+    ring = attach(args.serial)
+    print(f"attach {ring.name} slots:{ring.slots} capacity:{ring.capacity}")
+
+    last = 0
+    frames = 0
+    skipped = 0
+    report = time.monotonic()
+    while True:
+        if ring.closed:
+            # 投屏分辨率变大或停止发布，重新映射
+            ring.close()
+            ring = attach(args.serial)
+            last = 0
+            print(f"attach {ring.name} again")
+            continue
+
+        number = ring.latest()
+        if number == last:
+            time.sleep(0.002)
+            continue
+        info = ring.info(number)
+        if info is None:
+            continue
+        sequence, width, height, pts = info
+        # 零拷贝视图，用完后检查该槽位没有被覆盖；显示时先复制，校验通过再显示，避免显示撕裂的画面
+        frame = ring.view(number)
+        if frame is None:
+            continue
+        if args.show:
+            frame = frame.copy()
+        if not ring.valid(number, sequence):
+            continue
+        if args.show:
+            cv2.imshow(args.serial, frame)
+            cv2.waitKey(1)
+
+        if last:
+            skipped += number - last - 1
+        last = number
+        frames += 1
+        now = time.monotonic()
+        if now - report >= 1:
+            print(f"{width}x{height} pts:{pts} fps:{frames / (now - report):.1f} skipped:{skipped}")
+            frames = 0
+            skipped = 0
+            report = now
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+from model.bitrate import STALL_LAG, BitrateController, stream_frame_meta
+
+
+class _Client:
+    def __init__(self, frame_meta, stream_lag):
+        self.frame_meta = frame_meta
+        self.alive = True
+        self.bytes_received = 0
+        self.bitrate = 8000000
+        self.max_fps = 0
+        # 没有帧头时 Client 无法计算 stream_lag，始终为 0
+        self.stream_lag = stream_lag if frame_meta else 0.0
+
+
+class _Device:
+    def __init__(self, client):
+        self.serial = "serial"
+        self.name = "device"
+        self.index = 0
+        self.online = True
+        self.started = True
+        self.client = client
+        self.restarts = []
+
+    def devpath(self):
+        return "usb:1-1.2"
+
+    def restart_stream(self, **kwargs):
+        self.restarts.append(kwargs)
+
+
+def test_adaptive_bitrate_enables_frame_meta():
+    assert stream_frame_meta(False, True)
+    assert stream_frame_meta(True, False)
+    assert not stream_frame_meta(False, False)
+
+
+def test_stall_detected_with_frame_meta_off_in_config():
+    # device_frame_meta 关闭、device_bitrate_adaptive 开启的组合
+    client = _Client(stream_frame_meta(False, True), STALL_LAG * 2)
+    device = _Device(client)
+    controller = BitrateController(
+        lambda: [device], budget=160000000, min_bitrate=1000000, max_bitrate=8000000, min_fps=15
+    )
+    controller.cooldown = 0
+
+    controller.sample(1.0, 0.0)
+    client.bytes_received = 125000
+    controller.sample(1.0, 1.0)
+
+    assert controller.states["serial"].stalled
+    assert device.restarts == [dict(bitrate=5600000, max_fps=0)]
@@ -1,18 +1,52 @@
+from threading import Lock
+
 from PySide6.QtCore import QObject
 from PySide6.QtCore import *
 
 
 class Frame(QObject):
-    frame_signal = Signal(object)
+    """
+    单帧信箱：解码线程覆盖写入最新帧，UI 线程只取最新的一帧，未显示就被覆盖的帧计入 dropped
+    """
+
+    frame_signal = Signal()
 
     def __init__(self) -> None:
         super(Frame, self).__init__()
 
+        self.lock = Lock()
+        self.latest = None
+        self.pending = False
+        self.dropped = 0
+        self.slot = None
+
     def set_connect(self, slot):
-        self.frame_signal.connect(slot)
+        self.slot = slot
+        self.frame_signal.connect(self.__on_frame_signal)
 
     def post(self, frame):
-        self.frame_signal.emit(frame)
+        with self.lock:
+            if self.pending:
+                self.dropped += 1
+            self.latest = frame
+            notify = not self.pending
+            self.pending = True
+
+        # 信箱已有未取的帧时不再投递信号，队列中最多一个信号
+        if notify:
+            self.frame_signal.emit()
+
+    def take(self):
+        with self.lock:
+            frame = self.latest
+            self.latest = None
+            self.pending = False
+        return frame
+
+    def __on_frame_signal(self):
+        frame = self.take()
+        if frame is not None and self.slot is not None:
+            self.slot(frame)
 
 
 class CustomEvent(QObject):
@@ -25,4 +59,4 @@ class CustomEvent(QObject):
         self.custom_signal.connect(slot)
 
     def post(self, data):
-        self.custom_signal.emit(data)
\ No newline at end of file
+        self.custom_signal.emit(data)
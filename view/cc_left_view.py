@@ -25,7 +25,7 @@ class _DeviceStatsView(QGroupBox):
     def __init__(self):
         super().__init__()
 
-        self.setFixedHeight(70)
+        self.setFixedHeight(95)
 
         main_layout = QVBoxLayout()
         self.device_num = _NormalLabel(f"连接数:")
@@ -34,11 +34,23 @@ class _DeviceStatsView(QGroupBox):
         self.cur_device = _NormalLabel(f"选中:")
         main_layout.addLayout(self.cur_device)
 
+        self.bringup = _NormalLabel(f"启动:")
+        main_layout.addLayout(self.bringup)
+
         self.setLayout(main_layout)
 
     def update_device_num(self, num):
         self.device_num.update_target_label(f"{num}")
 
+    def update_bringup_progress(self, progress):
+        text = f"{progress['done']}/{progress['total']}"
+        if progress["failed"]:
+            text += f" 失败{progress['failed']}"
+        self.bringup.update_target_label(text)
+        self.bringup.target_label.setToolTip(
+            f"连接中:{progress['running']} 等待:{progress['waiting']}"
+        )
+
     def update_cur_device(self, device: Device):
         if device is None:
             self.cur_device.update_target_label(f"")
@@ -105,8 +117,12 @@ class _DeviceNoView(QGroupBox):
         return device_label
 
     def update_device_name(self, d: Device):
+        # 附带最近一次连接各阶段耗时，方便找出启动慢的设备
+        timings = " ".join(
+            f"{k}:{v * 1000:.0f}ms" for k, v in d.client.timings.items()
+        )
         self.devices_no[d.device.serial].setToolTip(
-            f"序列号:{d.device.serial} 型号:{d.client.device_name}"
+            f"序列号:{d.device.serial} 型号:{d.client.device_name}\n{timings}"
         )
 
     # devices 是启动以来所有的设备
@@ -214,6 +230,9 @@ class LeftView(QGroupBox):
         num = len(list(filter(lambda d: d.online == True, devices)))
         self.device_stats_view.update_device_num(num)
 
+    def update_bringup_progress(self, progress):
+        self.device_stats_view.update_bringup_progress(progress)
+
     def update_cur_device(self, device: Device = None):
         self.device_stats_view.update_cur_device(device)
         self.device_cur_ctrl_view.set_cur_device(device)
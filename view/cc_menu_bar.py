@@ -86,6 +86,27 @@ class MenuBar(QMenuBar):
         self.menu_settings.addAction(settings_resize)
         settings_resize.triggered.connect(on_request_screen_resize_changed)
 
+    def add_record_all_menu(self, on_record_all: Callable[..., Any]):
+        # 所有设备录制，勾选开始，取消停止
+        record_all = QAction("全部录制", self)
+        record_all.setCheckable(True)
+        self.menu_settings.addAction(record_all)
+        record_all.toggled.connect(on_record_all)
+
+    def add_snapshot_all_menu(self, on_snapshot_all: Callable[..., Any]):
+        # 所有设备截图
+        snapshot_all = QAction("全部截图", self)
+        self.menu_settings.addAction(snapshot_all)
+        snapshot_all.triggered.connect(on_snapshot_all)
+
+    def add_publish_menu(self, on_publish: Callable[..., Any], checked: bool = False):
+        # 画面发布到共享内存，供其他进程读取
+        publish = QAction("共享内存发布", self)
+        publish.setCheckable(True)
+        publish.setChecked(checked)
+        self.menu_settings.addAction(publish)
+        publish.toggled.connect(on_publish)
+
     def add_modify_device_name_menu(self, on_device_name_modify: Callable[..., Any]):
         settings_modify_device_name = QAction("修改设备命名", self)
         self.menu_settings.addAction(settings_modify_device_name)
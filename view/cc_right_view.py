@@ -21,8 +21,9 @@ class _DeviceScreen(QGroupBox):
         keyPressEvent: Callable[..., Any],
         keyReleaseEvent: Callable[..., Any],
     ):
-        super().__init__(f"【{device.index+1:02d}】{device.name}")
+        super().__init__()
         self.device = device
+        self.update_title()
 
         layout = QVBoxLayout()
         layout.setSpacing(2)
@@ -47,7 +48,22 @@ class _DeviceScreen(QGroupBox):
         self.screen.keyPressEvent = keyPressEvent(device)
         self.screen.keyReleaseEvent = keyReleaseEvent(device)
 
-    def render_frame(self, ratio, frame):
+        # 右键菜单：录制
+        self.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.customContextMenuRequested.connect(self.__show_context_menu)
+
+    def __show_context_menu(self, pos):
+        menu = QMenu(self)
+        if self.device.recording():
+            action = menu.addAction("停止录制")
+            action.triggered.connect(self.device.stop_recording)
+        else:
+            action = menu.addAction("开始录制")
+            action.triggered.connect(self.device.start_recording)
+        action.triggered.connect(self.update_title)
+        menu.exec(self.mapToGlobal(pos))
+
+    def render_frame(self, ratio, frame, overlay=None):
         # print(f"render_frame ratio{ratio}")
         image = QImage(
             frame,
@@ -59,10 +75,29 @@ class _DeviceScreen(QGroupBox):
         # print(f"frame {frame.shape[1]} {frame.shape[0]}")
         pix = QPixmap(image)
         pix.setDevicePixelRatio(1 / ratio)
+        if overlay is not None:
+            self.__draw_overlay(pix, overlay)
         self.screen.setPixmap(pix)
 
+    def __draw_overlay(self, pix, text):
+        # 左上角叠加统计信息
+        painter = QPainter(pix)
+        rect = QRect(0, 0, pix.deviceIndependentSize().toSize().width(), 32)
+        painter.fillRect(rect, QColor(0, 0, 0, 160))
+        painter.setPen(QColor(0, 255, 0))
+        font = painter.font()
+        font.setPixelSize(11)
+        painter.setFont(font)
+        painter.drawText(rect.adjusted(2, 0, 0, 0), Qt.AlignmentFlag.AlignLeft, text)
+        painter.end()
+
     def update_title(self):
-        self.setTitle(f"【{self.device.index+1:02d}】{self.device.name}")
+        recording = " ●录制" if self.device.recording() else ""
+        rates = self.device.frame_rates_text if ui_config_show_fps else None
+        rates = f" {rates}" if rates else ""
+        title = f"【{self.device.index+1:02d}】{self.device.name}{recording}{rates}"
+        if title != self.title():
+            self.setTitle(title)
 
     def update_focused_status(self, focused):
         if focused:
@@ -187,7 +222,10 @@ class _DeviceScreenGridView(QGroupBox):
         self.devices_screen[d.device.serial].update_title()
 
     def render_device_screen(self, d: Device, frame):
-        self.devices_screen[d.device.serial].render_frame(d.ratio, frame)
+        overlay = d.latency_overlay() if ui_config_show_latency else None
+        self.devices_screen[d.device.serial].render_frame(
+            d.display_ratio(frame), frame, overlay
+        )
 
     def update_focused_status(self, d: Device, focused):
         self.devices_screen[d.device.serial].update_focused_status(focused)